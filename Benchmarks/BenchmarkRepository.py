@@ -0,0 +1,284 @@
+"""
+Times the repository functions that dominate load and generation time,
+using synthetic repositories so runs are comparable between machines and commits.
+
+Run from the root of the Genni folder:
+    python -m Benchmarks.BenchmarkRepository --output bench.json
+    python -m Benchmarks.BenchmarkRepository --dataset-sizes 1K,1M,500M --dataset-counts 1,100 --samples 1,1000
+
+Each case runs in its own process, so the peak RSS reported belongs to that case alone.
+Repositories are built before the process starts, so building them isn't measured.
+The output is JSON so that results can be diffed or tracked over time.
+"""
+
+from argparse import ArgumentParser, ArgumentTypeError
+from datetime import datetime, timedelta
+from json import dump, dumps
+from multiprocessing import get_context
+from os import cpu_count, makedirs
+from os.path import join
+from platform import platform, python_version
+from random import Random
+from shutil import rmtree
+from statistics import median
+from sys import stdout
+from tempfile import mkdtemp
+from time import perf_counter
+import sys
+
+WORDS = [
+    'the', 'of', 'and', 'a', 'to', 'in', 'is', 'you', 'that', 'it', 'he', 'was', 'for', 'on', 'are', 'as', 'with',
+    'his', 'they', 'at', 'be', 'this', 'have', 'from', 'or', 'one', 'had', 'by', 'word', 'but', 'not', 'what',
+    'all', 'were', 'we', 'when', 'your', 'can', 'said', 'there', 'use', 'an', 'each', 'which', 'she', 'do', 'how',
+    'their', 'if', 'will', 'up', 'other', 'about', 'out', 'many', 'then', 'them', 'these', 'so', 'some', 'her',
+    'would', 'make', 'like', 'him', 'into', 'time', 'has', 'look', 'two', 'more', 'write', 'go', 'see', 'number',
+    'robot', 'model', 'train', 'dataset', 'sample', 'token', 'loss', 'step', 'repository', 'generate'
+]
+
+MODES = ['longest', 'nearDuplicate', 'allSpans', 'tokens']
+
+def parseSize(size: str) -> int:
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    size = size.strip().upper()
+    if size[-1] in units: return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
+def makeText(size: int, seed: int) -> str:
+    """
+    Builds roughly `size` bytes of word salad.
+    Large sizes shuffle lines from a 1 MB base instead of drawing every word,
+    which keeps building a 500 MB corpus to a few seconds.
+    """
+    rng = Random(seed)
+
+    lines = []
+    baseSize = 0
+    while baseSize < min(size, 1024 ** 2):
+        line = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 25))) + '\n'
+        lines.append(line)
+        baseSize += len(line)
+
+    parts, total = [], 0
+    while total < size:
+        rng.shuffle(lines)
+        block = ''.join(lines)
+        parts.append(block)
+        total += len(block)
+    return ''.join(parts)[:size]
+
+def parseModes(modes: str) -> list:
+    modes = modes.split(',')
+    unknown = [mode for mode in modes if mode not in MODES]
+    if len(unknown) > 0: raise ArgumentTypeError(f"unknown mode {', '.join(unknown)} (choose from {', '.join(MODES)})")
+    return modes
+
+def writeJson(path: str, data):
+    with open(path, 'w', encoding='utf-8') as f: dump(data, f)
+
+def trainTokenizer(text: str):
+    """
+    Trains a small byte-level BPE tokenizer on `text`, like the one aitextgen trains on import,
+    but with a much smaller vocabulary so building the repository stays quick.
+    """
+    from tokenizers import ByteLevelBPETokenizer
+
+    tokenizer = ByteLevelBPETokenizer()
+    tokenizer.train_from_iterator(text.splitlines(), vocab_size=1000, min_frequency=2, special_tokens=['<|endoftext|>'], show_progress=False)
+    return tokenizer
+
+def buildRepository(path: str, datasetSize: int, datasetCount: int, modelCount: int, stepsPerModel: int, generatedCount: int, samplesPerGenerated: int, seed: int = 0, stepLogFormat: str = 'bin', tokenizer: bool = False):
+    """
+    stepLogFormat is 'bin' for the step logs models save now, or 'csv' for the steps.csv older models have.
+    Datasets get a real tokenizer (trained once, on the first 1 MB of word salad) if `tokenizer` is set,
+    as 'tokens' mode needs one, and otherwise a placeholder that only lists them in the catalog.
+    """
+    from StepLog import emptyStepColumns, writeStepLog
+
+    rng = Random(seed)
+    start = datetime(2021, 1, 1)
+    trainedTokenizer = trainTokenizer(makeText(min(datasetSize, 1024 ** 2), seed)) if tokenizer and datasetCount > 0 else None
+
+    for i in range(datasetCount):
+        folder = join(path, 'datasets', f'dataset{i:04d}')
+        makedirs(folder)
+        with open(join(folder, 'dataset'), 'w', encoding='utf-8') as f: f.write(makeText(datasetSize, seed + i))
+        if trainedTokenizer is not None: trainedTokenizer.save(join(folder, 'aitextgen.tokenizer.json'))
+        else: writeJson(join(folder, 'aitextgen.tokenizer.json'), {})
+        writeJson(join(folder, 'meta.json'), {
+            'title': f'Dataset {i}', 'comment': '', 'lineByLine': True,
+            'imported': (start + timedelta(minutes=i)).isoformat(timespec='seconds')
+        })
+
+    latest = None
+    for i in range(modelCount):
+        latest = (start + timedelta(hours=i)).strftime('%Y-%m-%dT%H-%M-%S')
+        folder = join(path, 'models', latest)
+        makedirs(folder)
+        writeJson(join(folder, 'config.json'), {})
+        open(join(folder, 'pytorch_model.bin'), 'wb').close()
+        writeJson(join(folder, 'meta.json'), {
+            'name': f'Model {i}', 'comment': '', 'datetime': (start + timedelta(hours=i)).isoformat(timespec='seconds'),
+            'duration': stepsPerModel * 0.5, 'dataset': f'dataset{i % max(1, datasetCount):04d}', 'parent': None,
+            'learningRate': 0.001, 'steps': stepsPerModel
+        })
+        with open(join(folder, 'samples.jsonl'), 'w', encoding='utf-8') as f:
+            for step in range(0, stepsPerModel, max(1, stepsPerModel // 10)): f.write(dumps({'step': step, 'samples': [makeText(200, seed + step)]}) + '\n')
+
+        avgLoss = 5.0
+        steps = emptyStepColumns()
+        for step in range(1, stepsPerModel + 1):
+            loss = 5.0 * rng.random()
+            avgLoss = avgLoss * 0.99 + loss * 0.01
+            for column, value in zip(steps, (step * 0.5, step, loss, avgLoss)): column.append(value)
+
+        if stepLogFormat == 'csv':
+            with open(join(folder, 'steps.csv'), 'w', encoding='utf-8', newline='') as f:
+                for row in zip(*steps): f.write(','.join(str(value) for value in row) + '\n')
+        else:
+            writeStepLog(join(folder, 'steps.bin'), steps)
+
+    for i in range(generatedCount):
+        folder = join(path, 'generated', (start + timedelta(minutes=i)).strftime('%Y-%m-%dT%H-%M-%S'))
+        makedirs(folder)
+        writeJson(join(folder, 'meta.json'), {
+            'n': samplesPerGenerated, 'prompt': '', 'minLength': 1, 'maxLength': 256, 'temperature': 0.7,
+            'topP': 0, 'topK': 0, 'seed': i, 'datetime': (start + timedelta(minutes=i)).isoformat(timespec='seconds')
+        })
+        writeJson(join(folder, 'texts.json'), [{'text': makeText(1000, seed + i * 1000 + j), 'datasetMatches': None} for j in range(samplesPerGenerated)])
+
+    writeJson(join(path, 'info.json'), {'title': 'Benchmark Repository', 'latest': latest})
+
+def peakRssBytes() -> int:
+    try:
+        from resource import getrusage, RUSAGE_SELF
+    except ImportError:
+        return None
+
+    # ru_maxrss is in kilobytes on Linux but bytes on macOS
+    maxRss = getrusage(RUSAGE_SELF).ru_maxrss
+    return maxRss if sys.platform == 'darwin' else maxRss * 1024
+
+def runCase(case: dict, repoPath: str, connection):
+    """
+    Runs in a fresh process, against a repository main() has already built, so the peak RSS
+    doesn't include building it. Times the benchmark `repeats` times and sends the result through `connection`.
+    """
+    import ModelRepo
+
+    params = case['params']
+    benchmark = case['benchmark']
+    if benchmark == 'processGeneratedSamples':
+        samples = [makeText(params['sampleLength'], 10 ** 6 + i) for i in range(params['samples'])]
+        call = lambda: ModelRepo.processGeneratedSamples(repoPath, samples, '', True, params['workers'], params['mode'], useCache=False)
+        if params['warm']: call()
+    elif benchmark == 'getModelStepData':
+        modelName = ModelRepo.getModelsInRepository(repoPath)[0]['filePath']
+        call = lambda: ModelRepo.getModelStepData(repoPath, modelName)
+    else:
+        call = lambda: getattr(ModelRepo, benchmark)(repoPath)
+
+    # The peak before the timed calls, which is the imports (and warm-up), so the difference is the calls themselves
+    baselineRss = peakRssBytes()
+
+    timings = []
+    for _ in range(case['repeats']):
+        start = perf_counter()
+        call()
+        timings.append(perf_counter() - start)
+
+    connection.send({
+        'benchmark': benchmark,
+        'repository': case['repository'],
+        'params': params,
+        'seconds': timings,
+        'medianSeconds': median(timings),
+        'baselineRssBytes': baselineRss,
+        'peakRssBytes': peakRssBytes()
+    })
+    connection.close()
+
+def measureCase(context, case: dict) -> dict:
+    """
+    Builds the case's repository, then runs it in a plain (non-daemonic) process,
+    so cases that start worker processes of their own can.
+    """
+    repoPath = mkdtemp(prefix='genni-bench-')
+    try:
+        buildRepository(repoPath, **case['repository'])
+
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=runCase, args=(case, repoPath, sender))
+        process.start()
+        sender.close()
+        try:
+            result = receiver.recv()
+        except EOFError:
+            result = None
+        process.join()
+
+        if result is None: raise RuntimeError(f"{case['benchmark']} exited with code {process.exitcode}")
+        return result
+    finally:
+        rmtree(repoPath, ignore_errors=True)
+
+def makeCases(args) -> list:
+    cases = []
+    for datasetSize in args.dataset_sizes:
+        for datasetCount in args.dataset_counts:
+            for samples in args.samples:
+                for mode in args.modes:
+                    for warm in [False, True]:
+                        cases.append({
+                            'benchmark': 'processGeneratedSamples',
+                            'repository': {'datasetSize': datasetSize, 'datasetCount': datasetCount, 'modelCount': 0, 'stepsPerModel': 0, 'generatedCount': 0, 'samplesPerGenerated': 0, 'tokenizer': mode == 'tokens'},
+                            # Cold runs include building the dataset indexes, so they're only run once
+                            'repeats': args.repeats if warm else 1,
+                            'params': {'samples': samples, 'sampleLength': args.sample_length, 'workers': args.workers, 'mode': mode, 'warm': warm}
+                        })
+
+    for modelCount in args.model_counts:
+        repository = {'datasetSize': 1024, 'datasetCount': args.dataset_counts[0], 'modelCount': modelCount, 'stepsPerModel': args.steps, 'generatedCount': args.generated_count, 'samplesPerGenerated': args.samples[0]}
+        for benchmark in ['getModelsInRepository', 'getDatasetsInRepository', 'getGeneratedTextsInRepository']:
+            cases.append({'benchmark': benchmark, 'repository': repository, 'repeats': args.repeats, 'params': {}})
+        for stepLogFormat in ['csv', 'bin']:
+            cases.append({'benchmark': 'getModelStepData', 'repository': repository | {'stepLogFormat': stepLogFormat}, 'repeats': args.repeats, 'params': {}})
+
+    return cases
+
+def main():
+    parser = ArgumentParser(description='Benchmark Genni repository operations on synthetic repositories.')
+    sizeList = lambda s: [parseSize(i) for i in s.split(',')]
+    intList = lambda s: [int(i) for i in s.split(',')]
+    parser.add_argument('--dataset-sizes', type=sizeList, default=sizeList('1K,1M'), help='comma-separated dataset sizes, e.g. 1K,1M,500M')
+    parser.add_argument('--dataset-counts', type=intList, default=[1, 10], help='comma-separated numbers of datasets')
+    parser.add_argument('--samples', type=intList, default=[1, 100], help='comma-separated numbers of generated samples to check')
+    parser.add_argument('--sample-length', type=int, default=1000, help='characters per generated sample')
+    parser.add_argument('--modes', type=parseModes, default=['longest'], help=f"comma-separated check modes, from {', '.join(MODES)}")
+    parser.add_argument('--workers', type=int, default=1, help='worker processes for processGeneratedSamples')
+    parser.add_argument('--model-counts', type=intList, default=[10, 500], help='comma-separated numbers of models for the scan benchmarks')
+    parser.add_argument('--steps', type=int, default=10000, help='training steps recorded per model')
+    parser.add_argument('--generated-count', type=int, default=100, help='generated sets for the scan benchmarks')
+    parser.add_argument('--repeats', type=int, default=3, help='timed runs per case')
+    parser.add_argument('--output', default=None, help='write JSON results here instead of stdout')
+    args = parser.parse_args()
+
+    results = []
+    context = get_context('spawn')
+    for case in makeCases(args):
+        result = measureCase(context, case)
+        print(f"{result['benchmark']:32} {result['medianSeconds']:10.4f}s  {dumps(result['params'])} {dumps(result['repository'])}", file=sys.stderr)
+        results.append(result)
+
+    report = {
+        'datetime': datetime.now().isoformat(timespec='seconds'),
+        'machine': {'platform': platform(), 'python': python_version(), 'cpuCount': cpu_count()},
+        'results': results
+    }
+
+    if args.output is None:
+        dump(report, stdout, indent=4)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f: dump(report, f, indent=4)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import sys
+from functools import lru_cache
+from hashlib import sha256
+from os import remove, replace, stat
+from os.path import exists, realpath, splitdrive
+from subprocess import run
+from uuid import uuid4
+
+# Filesystem types (as /proc/mounts and mount name them) whose locking SQLite's WAL mode can't rely on
+networkFileSystems = {'nfs', 'nfs4', 'cifs', 'smb', 'smbfs', 'smb3', 'afpfs', 'webdav', 'fuse.sshfs', 'sshfs', '9p', 'afs', 'ceph', 'glusterfs', 'fuse.glusterfs'}
+
+def listMounts() -> list:
+    """
+    Returns (mount point, filesystem type) for each mounted filesystem, on Linux and macOS.
+    """
+    if sys.platform.startswith('linux'):
+        with open('/proc/mounts', encoding='utf-8') as f:
+            # Spaces in mount points are escaped as \040
+            return [(fields[1].replace('\\040', ' '), fields[2]) for fields in (line.split() for line in f) if len(fields) >= 3]
+
+    # macOS prints "device on /mount/point (type, options...)"
+    mounts = []
+    for line in run(['mount'], capture_output=True, text=True, check=True).stdout.splitlines():
+        if ' on ' not in line or ' (' not in line: continue
+        mountPoint, options = line.split(' on ', 1)[1].rsplit(' (', 1)
+        mounts.append((mountPoint, options.split(',')[0].strip(')')))
+    return mounts
+
+@lru_cache(maxsize=None)
+def isNetworkPath(path: str) -> bool:
+    """
+    Whether `path` is on a network filesystem. Paths that can't be checked count as network paths,
+    since that's the safe assumption. The answer is remembered for each path.
+    """
+    path = realpath(path)
+    try:
+        if sys.platform == 'win32':
+            from ctypes import windll
+            drive = splitdrive(path)[0]
+            # UNC paths (\\server\share) are always remote, as are mapped drives
+            return drive.startswith('\\\\') or windll.kernel32.GetDriveTypeW(drive + '\\') == 4
+
+        mountPoint, fileSystem = max(
+            ((mountPoint, fileSystem) for mountPoint, fileSystem in listMounts() if path == mountPoint or path.startswith(mountPoint.rstrip('/') + '/')),
+            key=lambda mount: len(mount[0])
+        )
+        return fileSystem in networkFileSystems
+    except Exception as e:
+        print(f'Could not tell whether {path} is on a network filesystem: {e}')
+        return True
+
+def sqliteJournalMode(path: str) -> str:
+    """
+    The journal mode for an SQLite database at `path`. WAL lets readers carry on while
+    the database is written, but relies on shared memory that network filesystems don't share
+    between machines, so databases on those use the default rollback journal.
+    """
+    return 'DELETE' if isNetworkPath(path) else 'WAL'
+
+def fileHash(path: str) -> str:
+    """
+    Returns the SHA-256 of a file's contents. The hash is saved next to the file (as <path>.sha256)
+    along with its size and mtime, and only recomputed when those change.
+    """
+    fileStat = stat(path)
+    signature = f'{fileStat.st_size} {fileStat.st_mtime_ns}'
+    hashPath = f'{path}.sha256'
+    try:
+        with open(hashPath, encoding='utf-8') as f: savedSignature, _, digest = f.read().strip().rpartition(' ')
+        if savedSignature == signature: return digest
+    except (OSError, ValueError):
+        pass
+
+    h = sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''): h.update(chunk)
+    digest = h.hexdigest()
+
+    # Written under a unique temporary name, so processes hashing the same file at once don't clash
+    tempPath = f'{hashPath}.{uuid4().hex}.incomplete'
+    try:
+        with open(tempPath, 'w', encoding='utf-8') as f: f.write(f'{signature} {digest}')
+        replace(tempPath, hashPath)
+    except OSError as e:
+        print(f'Couldn\'t save the hash of {path}: {e}')
+    finally:
+        if exists(tempPath): remove(tempPath)
+    return digest
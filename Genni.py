@@ -1,11 +1,14 @@
 from traceback import format_exception
-from PyQt6.QtCore import QCoreApplication, Qt
-from PyQt6.QtGui import QAction, QIcon
-from PyQt6.QtWidgets import QMainWindow, QApplication, QMenuBar, QSplitter, QStackedWidget, QTabBar, QToolBar, QVBoxLayout, QWidget
+from PyQt6.QtCore import QCoreApplication, QThreadPool, Qt
+from PyQt6.QtGui import QAction, QCloseEvent, QIcon
+from PyQt6.QtWidgets import QDockWidget, QMainWindow, QApplication, QMenuBar, QMessageBox, QSplitter, QStackedWidget, QTabBar, QToolBar, QVBoxLayout, QWidget
 import sys
 
-from ModelRepo import getRepoMetadata
+from ModelRepo import rebuildCatalog
 from Preferences import initializeSettings
+from RepositoryWatcher import RepositoryWatcher
+from TrainingScheduler import TrainingScheduler
+from Threads.RepositoryLoader import RepositoryLoader
 from Views.Generation.GeneratingView import GeneratingModal
 from Views.ImportDatasetView import ImportDatasetModal
 from Views.Preferences.PreferencesView import PreferencesView
@@ -14,6 +17,7 @@ from Views.RepositoryGeneratedListView import RepositoryGeneratedListView
 from Views.RepositoryListView import RepositoryListView
 from Views.RepositoryModelHistoryView import RepositoryModelHistoryView
 from Views.Training.TrainingView import TrainingModal
+from Views.TrainingQueueView import TrainingQueueView
 
 class RepositoryWindow(QMainWindow):
     def __init__(self):
@@ -73,6 +77,24 @@ class RepositoryWindow(QMainWindow):
 
         self.setCentralWidget(self.sidebarSplitter)
 
+        # Keeps the lists up to date as the repository changes, one row at a time
+        self.watcher = RepositoryWatcher(self)
+        self.repoLoader = None
+        self.watcher.modelsChanged.connect(self.modelHistoryView.applyChanges)
+        self.watcher.datasetsChanged.connect(self.datasetsView.applyChanges)
+        self.watcher.generatedChanged.connect(self.genTextsView.applyChanges)
+        self.watcher.repoMetadataChanged.connect(self.onRepoMetadataChanged)
+
+        # Queued training jobs run in the background, whichever repository is open
+        self.trainingScheduler = TrainingScheduler(self)
+        self.trainingScheduler.jobFinished.connect(self.onTrainingJobFinished)
+        self.trainingQueueView = TrainingQueueView(self, self.trainingScheduler)
+        self.trainingQueueDock = QDockWidget('Training Queue', self)
+        self.trainingQueueDock.setObjectName('trainingQueueDock')
+        self.trainingQueueDock.setWidget(self.trainingQueueView)
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.trainingQueueDock)
+        self.trainingQueueDock.setVisible(len(self.trainingScheduler.jobs()) > 0)
+
         self.prefsWindow = PreferencesView()
         self.prefsWindow.prefsModified.connect(self.refreshContent)
 
@@ -84,33 +106,80 @@ class RepositoryWindow(QMainWindow):
         self.prefsAction = menuBar.addMenu("config").addAction("config")
         self.prefsAction.triggered.connect(self.prefsWindow.show)
 
+        self.rebuildCatalogAction = menuBar.addMenu("Repository").addAction("Rebuild Catalog")
+        self.rebuildCatalogAction.setEnabled(False)
+        self.rebuildCatalogAction.triggered.connect(self.rebuildCatalog)
+
+        menuBar.addMenu("View").addAction(self.trainingQueueDock.toggleViewAction())
+
     def loadRepository(self, repoName: str):
         self.setRepositoryName(repoName)
-        repoData: dict = getRepoMetadata(repoName)
-        self.setWindowTitle(repoData.get('title', 'Untitled Repository'))
-
         self.trainAction.setEnabled(True)
-        self.genAction.setEnabled(repoData.get('latest') is not None)
+        self.genAction.setEnabled(False)
         self.addDatasetAction.setEnabled(True)
+        self.rebuildCatalogAction.setEnabled(True)
+
+        # Stop loading whatever repository was open before
+        if self.repoLoader is not None: self.repoLoader.cancel()
+        self.watcher.setRepository(None)
 
         self.modelHistoryView.loadRepository(repoName)
         self.datasetsView.loadRepository(repoName)
         self.genTextsView.loadRepository(repoName)
 
+        # Scanning the repository happens on a pool thread, and the lists fill in as rows arrive
+        loader = RepositoryLoader(repoName)
+        loader.signals.repoMetadataLoaded.connect(lambda repoData: self.onRepoMetadataChanged(repoData) if loader is self.repoLoader else None)
+        loader.signals.catalogSynced.connect(lambda latestChange: self.watcher.setRepository(repoName, latestChange) if loader is self.repoLoader else None)
+        loader.signals.rowsLoaded.connect(lambda table, rows, hasMoreRows: self.onRowsLoaded(table, rows, hasMoreRows) if loader is self.repoLoader else None)
+        loader.signals.failed.connect(lambda message: self.onRepositoryLoadFailed(repoName, message) if loader is self.repoLoader else None)
+        self.repoLoader = loader
+        QThreadPool.globalInstance().start(loader)
+
+    def onRowsLoaded(self, table: str, rows: list, hasMoreRows: bool):
+        view = {'models': self.modelHistoryView, 'datasets': self.datasetsView, 'generated': self.genTextsView}[table]
+        view.appendRows(rows, hasMoreRows)
+
+    def onRepositoryLoadFailed(self, repoName: str, message: str):
+        self.trainAction.setEnabled(False)
+        self.genAction.setEnabled(False)
+        self.addDatasetAction.setEnabled(False)
+        self.rebuildCatalogAction.setEnabled(False)
+
+        unavailableMessage = f'This repository is unavailable.\n{message}'
+        for view in [self.modelHistoryView, self.datasetsView, self.genTextsView]: view.setUnavailable(unavailableMessage)
+
+        # Checks the repositories again, so one that's gone is marked as missing
+        self.repoListWidget.populateList()
+
+    def onRepoMetadataChanged(self, repoData: dict):
+        self.setWindowTitle(repoData.get('title', 'Untitled Repository'))
+        self.genAction.setEnabled(repoData.get('latest') is not None)
+        self.modelHistoryView.setHeadModel(repoData.get('latest'))
+
     def openTrainingModal(self):
-        self.trainingModal = TrainingModal(self, self.repositoryName())
+        self.trainingModal = TrainingModal(self, self.repositoryName(), self.trainingScheduler)
+        self.trainingModal.trainingView.trainingQueued.connect(self.trainingQueueDock.show)
         self.trainingModal.exec()
-        self.refreshContent()
+        self.watcher.update()
+
+    def onTrainingJobFinished(self, jobId: str, repoPath: str):
+        # Models from other repositories show up when those are opened
+        if repoPath == self.repositoryName(): self.watcher.update()
 
     def openGenModal(self):
         self.genModal = GeneratingModal(self, self.repositoryName())
         self.genModal.exec()
-        self.refreshContent()
+        self.watcher.update()
 
     def openAddDatasetModal(self):
         self.addDatasetModal = ImportDatasetModal(self, self.repositoryName())
         self.addDatasetModal.exec()
-        self.refreshContent()
+        self.watcher.update()
+
+    def rebuildCatalog(self):
+        rebuildCatalog(self.repositoryName())
+        self.loadRepository(self.repositoryName())
 
     def refreshContent(self):
         try:
@@ -121,6 +190,18 @@ class RepositoryWindow(QMainWindow):
             tracebackString = ''.join(format_exception(etype=type(e), value=e, tb=e.__traceback__))
             print(f'Error trying to refresh content:\n{tracebackString}')
 
+    def closeEvent(self, event: QCloseEvent) -> None:
+        if not self.trainingScheduler.hasRunningJobs(): return
+
+        result = QMessageBox.question(self, 'Training in Progress',
+            'Training jobs are still running. If you quit, they will start over the next time Genni opens.\n\nQuit anyway?',
+            defaultButton=QMessageBox.StandardButton.No)
+        if result != QMessageBox.StandardButton.Yes:
+            event.ignore()
+            return
+
+        self.trainingScheduler.shutdown()
+
     __repositoryName: str = None
     def repositoryName(self) -> str: return self.__repositoryName
     def setRepositoryName(self, repositoryName: str): self.__repositoryName = repositoryName
@@ -0,0 +1,256 @@
+from hashlib import blake2b
+from itertools import chain
+from os import stat
+from os.path import exists
+from random import Random
+from re import compile
+from struct import Struct
+from typing import Dict, List
+
+# magic, version, permutations, bands, window size (words), window count, dataset size, dataset mtime (ns)
+indexHeader = Struct('<4sHIIIQQQ')
+indexMagic = b'GMHX'
+indexVersion = 2
+
+# Signature values are taken modulo a prime under 2^32, so with 32-bit
+# hashes and coefficients, a * h + b always fits in 64 bits
+minHashPrime = (1 << 32) - 5
+wordPattern = compile(r'\w+')
+
+# Shingles are hashed this many at a time, which keeps each (shingles, permutations) table to a few MB
+hashChunkShingles = 1 << 14
+
+def makePermutations(numPerm: int):
+    """
+    Returns the (a, b) coefficients of each permutation as two arrays.
+    """
+    import numpy as np
+
+    # Seeded so that signatures written at import time stay comparable forever
+    rng = Random(0x67656E6E69)
+    coefficients = [(rng.randrange(1, minHashPrime), rng.randrange(0, minHashPrime)) for _ in range(numPerm)]
+    return np.array([a for a, _ in coefficients], dtype=np.uint64), np.array([b for _, b in coefficients], dtype=np.uint64)
+
+def wordHash(word: str) -> int:
+    return int.from_bytes(blake2b(word.lower().encode('utf-8'), digest_size=4).digest(), 'little')
+
+def mixHashes(h):
+    """
+    Scrambles an array of 64-bit values (the splitmix64 finalizer), wrapping on overflow.
+    """
+    import numpy as np
+
+    h = h ^ (h >> np.uint64(30))
+    h = h * np.uint64(0xBF58476D1CE4E5B9)
+    h = h ^ (h >> np.uint64(27))
+    h = h * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+def shingleHashes(wordHashes, shingleSize: int = 3):
+    """
+    Returns a 32-bit hash for the shingle starting at each word, from the hashes of its words.
+    Shingles at the end of the text have fewer words.
+    """
+    import numpy as np
+
+    h = np.zeros(len(wordHashes), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for i in range(shingleSize):
+            h[:len(h) - i] = mixHashes(h[:len(h) - i] + wordHashes[i:])
+    return h & np.uint64(0xFFFFFFFF)
+
+def computeWindows(text: str, windowWords: int, numPerm: int, shingleSize: int = 3):
+    """
+    Splits `text` into windows of `windowWords` words, each overlapping the next by half,
+    and returns the (start, end) character spans and MinHash signatures of the windows
+    as (windows, 2) and (windows, numPerm) arrays.
+    Signatures are computed per half-window block and combined, so every
+    shingle is only hashed once, and the hashing is done a chunk of shingles at a time.
+    """
+    import numpy as np
+
+    words = wordPattern.findall(text)
+    if len(words) == 0: return np.zeros((0, 2), dtype=np.uint64), np.zeros((0, numPerm), dtype=np.uint64)
+
+    # Each distinct word is only hashed once
+    vocabulary = {word: wordHash(word) for word in set(words)}
+    wordHashes = np.fromiter(map(vocabulary.__getitem__, words), dtype=np.uint64, count=len(words))
+    wordSpans = np.fromiter(chain.from_iterable(m.span() for m in wordPattern.finditer(text)), dtype=np.uint64, count=len(words) * 2).reshape(-1, 2)
+    del words, vocabulary
+
+    hashes = shingleHashes(wordHashes, shingleSize)
+    a, b = makePermutations(numPerm)
+    stride = max(1, windowWords // 2)
+
+    # Chunks hold whole blocks, so no block's minimum is split across two of them
+    chunkSize = max(1, hashChunkShingles // stride) * stride
+    blockSignatures = []
+    for chunkStart in range(0, len(hashes), chunkSize):
+        chunk = hashes[chunkStart:chunkStart + chunkSize]
+        values = (chunk[:, None] * a[None, :] + b[None, :]) % np.uint64(minHashPrime)
+        blockSignatures.append(np.minimum.reduceat(values, np.arange(0, len(chunk), stride), axis=0))
+    blockSignatures = np.concatenate(blockSignatures)
+
+    if len(blockSignatures) > 1: signatures = np.minimum(blockSignatures[:-1], blockSignatures[1:])
+    else: signatures = blockSignatures
+
+    blockIndices = np.arange(len(signatures))
+    firstWords = blockIndices * stride
+    lastWords = np.minimum((blockIndices + 2) * stride, len(wordHashes)) - 1
+    spans = np.stack([wordSpans[firstWords, 0], wordSpans[lastWords, 1]], axis=1)
+
+    return spans, signatures
+
+def computeBandKeys(signatures, bands: int):
+    """
+    Hashes each band of rows of each signature to one 64-bit key, as a (windows, bands) array.
+    """
+    import numpy as np
+
+    rows = signatures.shape[1] // bands
+    keys = np.zeros((len(signatures), bands), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for band in range(bands):
+            for row in range(band * rows, (band + 1) * rows):
+                keys[:, band] = mixHashes(keys[:, band] + signatures[:, row])
+    return keys
+
+def buildBandTables(signatures, bands: int):
+    """
+    For each band, sorts the windows by their key for that band, so the windows sharing a key
+    can be found with a binary search. Returns the sorted keys and the matching window indices, both (bands, windows).
+    """
+    import numpy as np
+
+    keys = computeBandKeys(signatures, bands)
+    order = np.argsort(keys, axis=0, kind='stable').T
+    return np.take_along_axis(keys.T, order, axis=1), order.astype(np.uint64)
+
+def writeMinHashIndex(dataPath: str, indexPath: str, windowWords: int = 32, numPerm: int = 64, bands: int = 16):
+    """
+    Computes MinHash signatures for every window of the file at `dataPath`, and the LSH table over them,
+    and saves them to `indexPath` for MinHashIndex.load().
+    """
+    with open(dataPath, encoding='utf-8') as f: text = f.read()
+    spans, signatures = computeWindows(text, windowWords, numPerm)
+    del text
+    bandKeys, bandWindows = buildBandTables(signatures, bands)
+
+    dataStat = stat(dataPath)
+    with open(indexPath, 'wb') as f:
+        f.write(indexHeader.pack(indexMagic, indexVersion, numPerm, bands, windowWords, len(spans), dataStat.st_size, dataStat.st_mtime_ns))
+        for table in [spans, signatures, bandKeys, bandWindows]: f.write(table.astype('<u8').tobytes())
+
+
+class MinHashIndex:
+    """
+    Locality-sensitive hashing table over the MinHash signatures of a dataset's windows.
+    Windows whose signatures agree on every row of at least one band become candidates,
+    so only a small part of the dataset is compared against each query.
+    Each band's windows are kept sorted by their key for that band, so finding the windows
+    that share a key is a binary search, and a saved index is used straight from a memory map.
+    """
+    def __init__(self, spans, signatures, bandKeys, bandWindows, windowWords: int):
+        self.spans = spans
+        self.signatures = signatures
+        self.bandKeys = bandKeys
+        self.bandWindows = bandWindows
+        self.windowWords = windowWords
+        self.numPerm = signatures.shape[1]
+        self.bands = bandKeys.shape[0]
+
+    @classmethod
+    def fromText(cls, text: str, windowWords: int = 32, numPerm: int = 64, bands: int = 16) -> 'MinHashIndex':
+        spans, signatures = computeWindows(text, windowWords, numPerm)
+        bandKeys, bandWindows = buildBandTables(signatures, bands)
+        return cls(spans, signatures, bandKeys, bandWindows, windowWords)
+
+    @classmethod
+    def load(cls, dataPath: str, indexPath: str) -> 'MinHashIndex':
+        """
+        Memory-maps an index saved by writeMinHashIndex().
+        Returns None if the index is missing, unreadable or older than the dataset.
+        """
+        import numpy as np
+
+        if not exists(dataPath) or not exists(indexPath): return None
+
+        dataStat = stat(dataPath)
+        with open(indexPath, 'rb') as f:
+            try:
+                magic, version, numPerm, bands, windowWords, windowCount, size, mtime = indexHeader.unpack(f.read(indexHeader.size))
+            except Exception:
+                return None
+
+        if magic != indexMagic or version != indexVersion: return None
+        if size != dataStat.st_size or mtime != dataStat.st_mtime_ns: return None
+
+        shapes = [(windowCount, 2), (windowCount, numPerm), (bands, windowCount), (bands, windowCount)]
+        expectedSize = indexHeader.size + 8 * sum(rows * columns for rows, columns in shapes)
+        if stat(indexPath).st_size != expectedSize: return None
+        if windowCount == 0:
+            return cls(*[np.zeros(shape, dtype=np.uint64) for shape in shapes], windowWords)
+
+        tables, offset = [], indexHeader.size
+        for shape in shapes:
+            tables.append(np.memmap(indexPath, dtype='<u8', mode='r', offset=offset, shape=shape))
+            offset += 8 * shape[0] * shape[1]
+
+        return cls(*tables, windowWords)
+
+    def close(self):
+        # numpy closes a memory map once nothing refers to it any more
+        self.spans = self.signatures = self.bandKeys = self.bandWindows = None
+
+    def __enter__(self): return self
+    def __exit__(self, *args): self.close()
+
+    def wordCount(self, text: str) -> int:
+        return len(wordPattern.findall(text))
+
+    def candidates(self, bandKeys) -> set:
+        """
+        Returns the windows that share at least one band key with `bandKeys`.
+        """
+        import numpy as np
+
+        found = set()
+        for band in range(self.bands):
+            keys = self.bandKeys[band]
+            key = np.uint64(bandKeys[band])
+            lo, hi = np.searchsorted(keys, key, 'left'), np.searchsorted(keys, key, 'right')
+            found.update(self.bandWindows[band][lo:hi].tolist())
+        return found
+
+    def estimateJaccard(self, a, b) -> float:
+        import numpy as np
+        return int(np.count_nonzero(a == b)) / self.numPerm
+
+    def nearest(self, query: str, limit: int = 5) -> List[dict]:
+        """
+        Returns up to `limit` dataset spans most similar to any window of `query`,
+        best first, each with the estimated Jaccard similarity of their shingles.
+        'size' is the length of the span of `query`, as in the other match modes,
+        and 'datasetMatchSize' the length of the dataset span, which can differ.
+        Queries shorter than a window can't score highly against any window,
+        so check those some other way (see wordCount()).
+        """
+        querySpans, querySignatures = computeWindows(query, self.windowWords, self.numPerm)
+        queryBandKeys = computeBandKeys(querySignatures, self.bands)
+
+        best: Dict[int, dict] = {}
+        for querySpan, querySignature, bandKeys in zip(querySpans.tolist(), querySignatures, queryBandKeys):
+            for windowIndex in self.candidates(bandKeys):
+                jaccard = self.estimateJaccard(querySignature, self.signatures[windowIndex])
+                if windowIndex in best and best[windowIndex]['jaccard'] >= jaccard: continue
+
+                datasetStart, datasetEnd = self.spans[windowIndex].tolist()
+                best[windowIndex] = {
+                    'datasetMatchIndex': datasetStart,
+                    'datasetMatchSize': datasetEnd - datasetStart,
+                    'genTextMatchIndex': querySpan[0],
+                    'size': querySpan[1] - querySpan[0],
+                    'jaccard': jaccard
+                }
+
+        return sorted(best.values(), key=lambda m: (-m['jaccard'], m['datasetMatchIndex']))[:limit]
@@ -0,0 +1,74 @@
+import sqlite3
+from hashlib import sha256
+from json import dumps, loads
+from os.path import join
+from time import time
+from typing import Dict, List
+
+from FileSystems import sqliteJournalMode
+
+class MatchResultCache:
+    """
+    On-disk cache of memorization check results, stored in the repository.
+    Entries are keyed by the hash of the dataset's contents, the sample and
+    the check settings, so editing a dataset changes every key that used it
+    and the stale entries simply age out.
+    Once the cache grows past `maxBytes`, the least recently used entries are evicted.
+    """
+    def __init__(self, repoPath: str, maxBytes: int = 64 * 1024 * 1024):
+        self.maxBytes = maxBytes
+        self.db = sqlite3.connect(join(repoPath, 'matchcache.sqlite'), timeout=30)
+        self.db.execute(f'PRAGMA journal_mode={sqliteJournalMode(repoPath)}')
+        self.db.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, lastUsed REAL NOT NULL)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS resultsByLastUsed ON results (lastUsed)')
+        self.db.commit()
+
+    def close(self): self.db.close()
+    def __enter__(self): return self
+    def __exit__(self, *args): self.close()
+
+    @staticmethod
+    def makeKey(datasetHash: str, sample: str, prompt: str, settings: str) -> str:
+        sampleHash = sha256(sample.encode('utf-8')).hexdigest()
+        promptHash = sha256(prompt.encode('utf-8')).hexdigest()
+        return sha256(f'{datasetHash}:{sampleHash}:{promptHash}:{settings}'.encode('utf-8')).hexdigest()
+
+    def getMany(self, keys: List[str]) -> Dict[str, dict]:
+        found = {}
+        uniqueKeys = list(set(keys))
+
+        # Stay under SQLite's limit on the number of query parameters
+        for start in range(0, len(uniqueKeys), 500):
+            batch = uniqueKeys[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            for key, value in self.db.execute(f'SELECT key, value FROM results WHERE key IN ({placeholders})', batch):
+                found[key] = loads(value)
+
+        now = time()
+        self.db.executemany('UPDATE results SET lastUsed = ? WHERE key = ?', [(now, key) for key in found])
+        self.db.commit()
+        return found
+
+    def putMany(self, entries: Dict[str, dict]):
+        now = time()
+        rows = []
+        for key, value in entries.items():
+            encoded = dumps(value)
+            rows.append((key, encoded, len(encoded), now))
+
+        self.db.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)', rows)
+        self.evict()
+        self.db.commit()
+
+    def evict(self):
+        totalSize = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        excess = totalSize - self.maxBytes
+        if excess <= 0: return
+
+        toDelete = []
+        for key, size in self.db.execute('SELECT key, size FROM results ORDER BY lastUsed'):
+            toDelete.append((key,))
+            excess -= size
+            if excess <= 0: break
+
+        self.db.executemany('DELETE FROM results WHERE key = ?', toDelete)
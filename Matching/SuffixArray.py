@@ -0,0 +1,371 @@
+from array import array
+from mmap import mmap, ACCESS_READ
+from os import stat
+from os.path import exists
+from struct import Struct
+from typing import List, Sequence, Tuple
+
+# magic, version, typecode, dataset size, dataset mtime (ns), indexed text offset, indexed text size, checkpoint table offset
+indexHeader = Struct('<4sH2sQQQQQ')
+indexMagic = b'GSAX'
+indexVersion = 3
+
+# The character offset of every this-many bytes of the text is saved with the index,
+# so a byte offset is turned into a character offset by decoding at most this much
+charCheckpointInterval = 64 * 1024
+
+# mmap offsets have to be a multiple of the allocation granularity,
+# which is 64 KiB on Windows and smaller elsewhere
+textAlignment = 64 * 1024
+
+def normalizeNewlines(data: bytes) -> bytes:
+    """
+    Turns \\r\\n and \\r into \\n, the way Python reads text files,
+    so offsets into the index line up with offsets into the text the rest of the app reads.
+    """
+    if b'\r' not in data: return data
+    return data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+
+def suffixArrayValues(data):
+    """
+    Returns `data` (bytes, a memory map, or a sequence of ints such as an array of token IDs) as a numpy array.
+    """
+    import numpy as np
+    if isinstance(data, (bytes, bytearray, memoryview)) or hasattr(data, 'madvise'): return np.frombuffer(data, dtype=np.uint8)
+    return np.asarray(data)
+
+def buildSuffixArray(data):
+    """
+    Builds the suffix array of `data` (bytes, or any sequence of ints) as a numpy array.
+    With pydivsufsort installed, this is a C implementation that needs about
+    4 bytes of memory per input byte. Otherwise it falls back to prefix doubling in numpy.
+    """
+    import numpy as np
+
+    values = suffixArrayValues(data)
+    if len(values) == 0: return np.zeros(0, dtype=np.uint32)
+
+    try:
+        from pydivsufsort import divsufsort
+    except ImportError:
+        return prefixDoubling(values)
+
+    # divsufsort takes bytes, writable byte arrays, or integer arrays (which it sorts as big-endian bytes)
+    if isinstance(data, bytes): return divsufsort(data)
+    if values.dtype == np.uint8 and not values.flags.writeable: values = values.copy()
+    return divsufsort(values)
+
+def prefixDoubling(values):
+    """
+    Builds a suffix array by sorting the suffixes on their first k values, for k = 1, 2, 4...,
+    using the ranks from the last round to rank the pairs for the next. Each round is one argsort,
+    and ranking stops as soon as every suffix has a unique rank, which for natural-language text happens
+    well before the log2(n) worst case. Peak memory is around 30 bytes per value.
+    """
+    import numpy as np
+
+    n = len(values)
+    rankType = np.int32 if n < 2 ** 31 else np.int64
+
+    # Ranks must stay below n + 1 for the packed sort keys to work,
+    # so compress the values down to dense ranks first
+    if values.dtype == np.uint8: rank = values.astype(rankType)
+    else: rank = np.unique(values, return_inverse=True)[1].reshape(-1).astype(rankType)
+    maxRank = int(rank.max())
+
+    k = 1
+    while True:
+        # Pack (rank[i], rank[i + k]) into one integer, with suffixes that end first sorting first
+        keys = rank.astype(np.int64) * (maxRank + 2)
+        if k < n: keys[:n - k] += rank[k:] + 1
+        sa = np.argsort(keys, kind='stable')
+
+        keys = keys[sa]
+        newRanks = np.empty(n, dtype=rankType)
+        newRanks[0] = 0
+        np.cumsum(keys[1:] != keys[:-1], out=newRanks[1:])
+        del keys
+
+        rank[sa] = newRanks
+        maxRank = int(newRanks[-1])
+        del newRanks
+
+        if maxRank == n - 1 or k >= n: return sa
+        k <<= 1
+
+
+def buildCharCheckpoints(data):
+    """
+    Returns how many characters of UTF-8 `data` start before each multiple of charCheckpointInterval bytes,
+    and in the whole of it, as a numpy array. Every byte but a continuation byte starts a character.
+    """
+    import numpy as np
+
+    values = suffixArrayValues(data)
+    counts = []
+    # A chunk at a time, so the flags never take a byte per byte of the whole text
+    chunkSize = 1024 * charCheckpointInterval
+    for chunkStart in range(0, len(values), chunkSize):
+        starts = ((values[chunkStart:chunkStart + chunkSize] & 0xC0) != 0x80).view(np.uint8)
+        counts.append(np.add.reduceat(starts, np.arange(0, len(starts), charCheckpointInterval), dtype=np.uint64))
+
+    counts = np.concatenate(counts) if len(counts) > 0 else np.zeros(0, dtype=np.uint64)
+    return np.concatenate([np.zeros(1, dtype=np.uint64), np.cumsum(counts, dtype=np.uint64)])
+
+def arrayView(values) -> memoryview:
+    # Arrays built through ctypes report an explicit byte order ('<i'), which memoryviews can't index
+    return memoryview(values).cast('B').cast(values.dtype.char)
+
+def writeSuffixArray(dataPath: str, indexPath: str):
+    """
+    Builds the suffix array for the file at `dataPath` and saves it to `indexPath`,
+    so that it can be memory-mapped later with SuffixArrayIndex.load().
+    The character checkpoints (see buildCharCheckpoints()) are saved straight after the suffix array.
+    If the file has \\r newlines, the text is indexed with them normalized, and that copy of the text is saved after those.
+    """
+    import numpy as np
+
+    with open(dataPath, 'rb') as f: rawData = f.read()
+    data = normalizeNewlines(rawData)
+
+    # Halve the file size for anything under 4 GB
+    typecode = 'I' if len(data) < 2 ** 32 else 'q'
+    sa = buildSuffixArray(data).astype(np.uint32 if typecode == 'I' else np.int64, copy=False)
+    checkpoints = buildCharCheckpoints(data)
+
+    checkpointOffset = indexHeader.size + sa.nbytes
+    textOffset = 0
+    if data is not rawData:
+        end = checkpointOffset + checkpoints.nbytes
+        textOffset = -(-end // textAlignment) * textAlignment
+
+    dataStat = stat(dataPath)
+    with open(indexPath, 'wb') as f:
+        f.write(indexHeader.pack(indexMagic, indexVersion, typecode.encode('ascii').ljust(2), dataStat.st_size, dataStat.st_mtime_ns, textOffset, len(data), checkpointOffset))
+        sa.tofile(f)
+        checkpoints.tofile(f)
+        if textOffset > 0:
+            f.write(bytes(textOffset - f.tell()))
+            f.write(data)
+
+
+def isContinuationByte(b: int) -> bool:
+    return 0x80 <= b < 0xC0
+
+
+class SuffixArrayIndex:
+    """
+    Longest-common-substring engine over a UTF-8 encoded text.
+    A match is found by extending it a byte at a time, and each extension is a binary search
+    (within the previous range) comparing slices as long as the match so far.
+    So a query of m bytes costs O(m + total extensions) binary searches of O(log n) comparisons
+    of up to L bytes each, where L is the longest match - far less than the O(n * m) of
+    difflib.SequenceMatcher, since L is normally much smaller than n.
+
+    With utf8=False, `data` can be any sliceable sequence of ints (such as an
+    array of token IDs) and queries must be the same kind of sequence.
+    """
+    def __init__(self, data: bytes, sa: Sequence[int] = None, utf8: bool = True, checkpoints: Sequence[int] = None):
+        self.data = data
+        self.sa = arrayView(buildSuffixArray(data)) if sa is None else sa
+        self.utf8 = utf8
+        self.checkpoints = arrayView(buildCharCheckpoints(data)) if checkpoints is None and utf8 else checkpoints
+        self.__openFiles = []
+
+    @classmethod
+    def fromText(cls, text: str) -> 'SuffixArrayIndex':
+        return cls(text.encode('utf-8'))
+
+    @classmethod
+    def load(cls, dataPath: str, indexPath: str) -> 'SuffixArrayIndex':
+        """
+        Memory-maps a dataset and the index saved for it by writeSuffixArray().
+        Returns None if the index is missing, unreadable or older than the dataset.
+        """
+        if not exists(dataPath) or not exists(indexPath): return None
+
+        dataStat = stat(dataPath)
+        with open(indexPath, 'rb') as f:
+            try:
+                magic, version, typecode, size, mtime, textOffset, textSize, checkpointOffset = indexHeader.unpack(f.read(indexHeader.size))
+            except Exception:
+                return None
+
+        if magic != indexMagic or version != indexVersion: return None
+        if size != dataStat.st_size or mtime != dataStat.st_mtime_ns: return None
+        if textSize == 0: return cls(b'', array('q'), checkpoints=array('Q', [0]))
+
+        typecode = typecode.decode('ascii').strip()
+        indexFile = open(indexPath, 'rb')
+        indexMap = mmap(indexFile.fileno(), 0, access=ACCESS_READ)
+        if textOffset > 0:
+            # The text was indexed with its newlines normalized, so that copy is used instead of the dataset
+            dataMap = mmap(indexFile.fileno(), textSize, access=ACCESS_READ, offset=textOffset)
+            openFiles = [dataMap, indexMap, indexFile]
+        else:
+            dataFile = open(dataPath, 'rb')
+            dataMap = mmap(dataFile.fileno(), 0, access=ACCESS_READ)
+            openFiles = [dataMap, indexMap, dataFile, indexFile]
+
+        saBytes = textSize * array(typecode).itemsize
+        checkpointCount = -(-textSize // charCheckpointInterval) + 1
+        index = cls(
+            dataMap,
+            memoryview(indexMap)[indexHeader.size:indexHeader.size + saBytes].cast(typecode),
+            checkpoints=memoryview(indexMap)[checkpointOffset:checkpointOffset + checkpointCount * 8].cast('Q')
+        )
+        index.__openFiles = openFiles
+        return index
+
+    def close(self):
+        for view in [self.sa, self.checkpoints]:
+            if isinstance(view, memoryview): view.release()
+        for f in self.__openFiles: f.close()
+        self.__openFiles = []
+
+    def __enter__(self): return self
+    def __exit__(self, *args): self.close()
+
+    def __len__(self) -> int: return len(self.data)
+
+    def findRange(self, pattern: bytes, lo: int = 0, hi: int = None) -> Tuple[int, int]:
+        """
+        Returns the [lo, hi) range of the suffix array whose suffixes start with `pattern`.
+        The search can be narrowed to a range already known to hold them, such as the range of a prefix of `pattern`.
+        """
+        # bisect only takes a key function from Python 3.10, so the searches are written out
+        data, sa, length = self.data, self.sa, len(pattern)
+        if hi is None: hi = len(sa)
+
+        start, end = lo, hi
+        while start < end:
+            mid = (start + end) // 2
+            if data[sa[mid]:sa[mid] + length] < pattern: start = mid + 1
+            else: end = mid
+        lo = start
+
+        end = hi
+        while start < end:
+            mid = (start + end) // 2
+            if pattern < data[sa[mid]:sa[mid] + length]: end = mid
+            else: start = mid + 1
+        return lo, start
+
+    def longestMatchBytes(self, query: bytes) -> Tuple[int, int, int]:
+        """
+        Returns (datasetIndex, queryIndex, size) in bytes for the longest
+        substring of `query` that appears in the indexed data.
+        Ties are broken in favour of the earliest position in `query`.
+        """
+        bestA, bestB, bestSize = 0, 0, 0
+        m = len(query)
+
+        for j in range(m):
+            if m - j <= bestSize: break
+            if self.utf8 and isContinuationByte(query[j]): continue
+
+            # Only try to beat the current best - if query[j:j + bestSize + 1]
+            # doesn't occur, no match starting at j can be longer than bestSize
+            size = bestSize + 1
+            lo, hi = self.findRange(query[j:j + size])
+            if lo == hi: continue
+
+            while j + size < m:
+                nextLo, nextHi = self.findRange(query[j:j + size + 1], lo, hi)
+                if nextLo == nextHi: break
+                lo, hi, size = nextLo, nextHi, size + 1
+
+            bestA, bestB, bestSize = self.sa[lo], j, size
+
+        return bestA, bestB, bestSize
+
+    def maximalMatchesBytes(self, query: bytes, minSize: int = 1) -> List[Tuple[int, int, int]]:
+        """
+        Returns (datasetIndex, queryIndex, size) in bytes for every maximal match of
+        at least `minSize` bytes - that is, every substring of `query` that occurs in
+        the data and can't be extended on either side while still occurring.
+
+        The longest match starting at j + 1 reaches at least as far as the one starting at j,
+        so the end of the match never moves backwards and the whole scan only
+        extends O(m) times (each one a binary search, as in findRange()).
+        """
+        matches = []
+        m = len(query)
+        prevEnd = 0
+
+        for j in range(m):
+            if self.utf8 and isContinuationByte(query[j]): continue
+            if prevEnd == m: break
+
+            # query[j:prevEnd] is part of the previous match, so it's known to occur
+            size = max(0, prevEnd - j)
+            lo, hi = (0, len(self.sa)) if size == 0 else self.findRange(query[j:j + size])
+
+            while j + size < m:
+                nextLo, nextHi = self.findRange(query[j:j + size + 1], lo, hi)
+                if nextLo == nextHi: break
+                lo, hi, size = nextLo, nextHi, size + 1
+
+            # Anything that doesn't reach past the previous match is contained in it
+            if j + size > prevEnd:
+                if size >= minSize: matches.append((self.sa[lo], j, size))
+                prevEnd = j + size
+
+        return matches
+
+    def maximalMatches(self, query: str, minSize: int = 1) -> List[Tuple[int, int, int]]:
+        """
+        Same as maximalMatchesBytes, but takes a string and returns character offsets,
+        with minSize in characters too.
+        """
+        queryBytes = query.encode('utf-8')
+        matches = []
+        # A character is at least one byte, so anything shorter than minSize bytes can be skipped straight away
+        for a, b, size in self.maximalMatchesBytes(queryBytes, minSize):
+            if self.charLength(queryBytes, b, size) < minSize: continue
+            matches.append(self.toCharOffsets(queryBytes, a, b, size))
+        return matches
+
+    def longestMatch(self, query: str) -> Tuple[int, int, int]:
+        """
+        Returns (datasetIndex, queryIndex, size) in characters for the longest
+        substring of `query` that appears in the indexed data, so that results
+        line up with the strings the UI slices.
+        The longest match in characters is always part of one of the maximal matches,
+        so those are compared by their length in characters (which for non-ASCII text
+        can put them in a different order than their length in bytes).
+        Ties are broken in favour of the earliest position in `query`.
+        """
+        queryBytes = query.encode('utf-8')
+        best, bestSize = (0, 0, 0), 0
+        for a, b, size in self.maximalMatchesBytes(queryBytes):
+            charSize = self.charLength(queryBytes, b, size)
+            if charSize > bestSize: best, bestSize = (a, b, size), charSize
+        return self.toCharOffsets(queryBytes, *best)
+
+    def trimmedEnd(self, queryBytes: bytes, b: int, size: int) -> int:
+        # Trim the match so it doesn't end partway through a character (matches never begin partway through one)
+        end = b + size
+        while end > b and end < len(queryBytes) and isContinuationByte(queryBytes[end]): end -= 1
+        return end
+
+    def charLength(self, queryBytes: bytes, b: int, size: int) -> int:
+        return len(queryBytes[b:self.trimmedEnd(queryBytes, b, size)].decode('utf-8'))
+
+    def toCharOffsets(self, queryBytes: bytes, a: int, b: int, size: int) -> Tuple[int, int, int]:
+        end = self.trimmedEnd(queryBytes, b, size)
+        if end == b: return 0, 0, 0
+        return self.datasetCharOffset(a), self.charOffset(queryBytes, b), len(queryBytes[b:end].decode('utf-8'))
+
+    def datasetCharOffset(self, byteOffset: int) -> int:
+        """
+        Turns a byte offset into the data into a character offset, decoding only from the checkpoint before it.
+        """
+        checkpoint = byteOffset // charCheckpointInterval
+        start = checkpoint * charCheckpointInterval
+        # A character that starts before the checkpoint was already counted, so its remaining bytes are ignored
+        return self.checkpoints[checkpoint] + self.charOffset(self.data[start:byteOffset], byteOffset - start)
+
+    @staticmethod
+    def charOffset(data: bytes, byteOffset: int) -> int:
+        return len(bytes(data[:byteOffset]).decode('utf-8', errors='ignore'))
@@ -0,0 +1,194 @@
+from array import array
+from mmap import ACCESS_READ, mmap
+from os import stat
+from os.path import exists
+from re import compile
+from struct import Struct
+from typing import List, Sequence, Tuple
+
+from Matching.SuffixArray import SuffixArrayIndex, buildSuffixArray
+
+# magic, version, (padding), dataset size, dataset mtime (ns), tokenizer size, tokenizer mtime (ns), token count.
+# The padding keeps the columns after it 8-byte aligned
+indexHeader = Struct('<4sH2xQQQQQ')
+indexMagic = b'GTKX'
+indexVersion = 2
+
+runPattern = compile(r'\s+|\S+')
+
+# Text is encoded in pieces of about this many characters, split on whitespace
+encodeChunkSize = 1024 * 1024
+
+def normalizeText(text: str) -> Tuple[str, array]:
+    """
+    Lowercases `text` and collapses each run of whitespace into a single space,
+    so that casing and spacing differences don't break up a match.
+    Also returns, for every character of the normalized text (plus one past the end),
+    the index of the character in `text` it came from.
+    """
+    pieces = []
+    positions = array('I')
+    for run in runPattern.finditer(text):
+        start, end = run.span()
+        if text[start].isspace():
+            pieces.append(' ')
+            positions.append(start)
+            continue
+
+        lowered = run.group().lower()
+        pieces.append(lowered)
+        if len(lowered) == end - start:
+            positions.extend(range(start, end))
+        else:
+            # A few characters lowercase to more than one character
+            for i, c in enumerate(run.group()):
+                positions.extend([start + i] * len(c.lower()))
+
+    positions.append(len(text))
+    return ''.join(pieces), positions
+
+def encodeText(tokenizer, text: str) -> Tuple[array, array, array]:
+    """
+    Encodes `text` with the dataset's tokenizer and returns the token IDs, plus the
+    start and end of each token as character offsets into the original text.
+    """
+    normalized, positions = normalizeText(text)
+
+    chunks, chunkStarts = [], []
+    start = 0
+    while start < len(normalized):
+        end = normalized.find(' ', start + encodeChunkSize)
+        end = len(normalized) if end == -1 else end
+        chunks.append(normalized[start:end])
+        chunkStarts.append(start)
+        start = end
+
+    import numpy as np
+
+    # Offsets into the normalized text are mapped back to the original text a chunk at a time
+    positions = np.frombuffer(positions, dtype=np.uint32)
+    tokens, starts, ends = array('I'), array('I'), array('I')
+    for chunkStart, encoding in zip(chunkStarts, tokenizer.encode_batch(chunks, add_special_tokens=False)):
+        if len(encoding.ids) == 0: continue
+        tokens.extend(encoding.ids)
+
+        offsets = np.array(encoding.offsets, dtype=np.int64) + chunkStart
+        tokenStarts, tokenEnds = offsets[:, 0], offsets[:, 1]
+        # An empty token (if a tokenizer makes one) ends where it starts
+        lastChars = np.maximum(tokenEnds - 1, tokenStarts)
+        starts.frombytes(positions[tokenStarts].tobytes())
+        ends.frombytes(np.where(tokenEnds > tokenStarts, positions[lastChars] + 1, positions[tokenStarts]).astype(np.uint32).tobytes())
+
+    return tokens, starts, ends
+
+def loadTokenizer(tokenizerPath: str):
+    from tokenizers import Tokenizer
+    return Tokenizer.from_file(tokenizerPath)
+
+def fileSignature(path: str) -> Tuple[int, int]:
+    fileStat = stat(path)
+    return fileStat.st_size, fileStat.st_mtime_ns
+
+def writeTokenMatchIndex(dataPath: str, tokenizerPath: str, indexPath: str):
+    """
+    Encodes the file at `dataPath` with the tokenizer at `tokenizerPath`, and saves
+    the token IDs, their character offsets and their suffix array to `indexPath`,
+    so that they can be memory-mapped later with TokenMatchIndex.load().
+    """
+    import numpy as np
+
+    with open(dataPath, encoding='utf-8') as f: text = f.read()
+    tokens, starts, ends = encodeText(loadTokenizer(tokenizerPath), text)
+    del text
+    sa = buildSuffixArray(tokens).astype(np.uint32, copy=False)
+
+    with open(indexPath, 'wb') as f:
+        f.write(indexHeader.pack(indexMagic, indexVersion, *fileSignature(dataPath), *fileSignature(tokenizerPath), len(tokens)))
+        for column in [tokens, starts, ends]: column.tofile(f)
+        sa.tofile(f)
+
+
+class TokenColumn:
+    """
+    A memory-mapped column of token IDs. Memoryviews can't be compared with each other,
+    so slices come out as lists, which compare the way SuffixArrayIndex's searches need.
+    """
+    def __init__(self, view: memoryview):
+        self.view = view
+
+    def __len__(self) -> int: return len(self.view)
+
+    def __getitem__(self, key):
+        return self.view[key].tolist() if isinstance(key, slice) else self.view[key]
+
+
+class TokenMatchIndex:
+    """
+    Longest-match search over a dataset's token IDs instead of its characters.
+    Token sequences are several times shorter than the text they encode,
+    and matching normalized tokens ignores differences in case and spacing.
+    Results are mapped back to character offsets so the UI can show them.
+    """
+    def __init__(self, tokenizer, tokens: Sequence[int], starts: Sequence[int], ends: Sequence[int], sa: Sequence[int]):
+        self.tokenizer = tokenizer
+        self.starts = starts
+        self.ends = ends
+        self.index = SuffixArrayIndex(tokens, sa, utf8=False)
+        self.__views = []
+        self.__openFiles = []
+
+    @classmethod
+    def load(cls, dataPath: str, tokenizerPath: str, indexPath: str) -> 'TokenMatchIndex':
+        """
+        Memory-maps an index saved by writeTokenMatchIndex().
+        Returns None if it is missing, unreadable, or older than the dataset or tokenizer.
+        """
+        if not exists(dataPath) or not exists(tokenizerPath) or not exists(indexPath): return None
+
+        with open(indexPath, 'rb') as f:
+            try:
+                magic, version, dataSize, dataMtime, tokenizerSize, tokenizerMtime, tokenCount = indexHeader.unpack(f.read(indexHeader.size))
+            except Exception:
+                return None
+
+        if magic != indexMagic or version != indexVersion: return None
+        if (dataSize, dataMtime) != fileSignature(dataPath): return None
+        if (tokenizerSize, tokenizerMtime) != fileSignature(tokenizerPath): return None
+        if stat(indexPath).st_size < indexHeader.size + 16 * tokenCount: return None
+        if tokenCount == 0: return cls(loadTokenizer(tokenizerPath), [], array('I'), array('I'), array('I'))
+
+        indexFile = open(indexPath, 'rb')
+        indexMap = mmap(indexFile.fileno(), 0, access=ACCESS_READ)
+        # The tokens, their starts, their ends and the suffix array, one after another
+        columnBytes = 4 * tokenCount
+        tokens, starts, ends, sa = [
+            memoryview(indexMap)[indexHeader.size + i * columnBytes:indexHeader.size + (i + 1) * columnBytes].cast('I')
+            for i in range(4)
+        ]
+
+        index = cls(loadTokenizer(tokenizerPath), TokenColumn(tokens), starts, ends, sa)
+        index.__views = [tokens, starts, ends, sa]
+        index.__openFiles = [indexMap, indexFile]
+        return index
+
+    def close(self):
+        for view in self.__views: view.release()
+        self.__views = []
+        for f in self.__openFiles: f.close()
+        self.__openFiles = []
+
+    def __enter__(self): return self
+    def __exit__(self, *args): self.close()
+
+    def longestMatch(self, query: str) -> Tuple[int, int, int, int]:
+        """
+        Returns (datasetIndex, queryIndex, size, tokenCount) for the longest run
+        of tokens `query` shares with the dataset.
+        The first three are in characters of the original (unnormalized) texts.
+        """
+        queryTokens, queryStarts, queryEnds = encodeText(self.tokenizer, query)
+        a, b, size = self.index.longestMatchBytes(queryTokens.tolist())
+        if size == 0: return 0, 0, 0, 0
+
+        queryStart, queryEnd = queryStarts[b], queryEnds[b + size - 1]
+        return self.starts[a], queryStart, queryEnd - queryStart, size
@@ -1,35 +1,123 @@
 
-from difflib import SequenceMatcher
 from json.decoder import JSONDecodeError
-from typing import List
+from typing import Any, Callable, Dict, List, Tuple
 
 from shutil import rmtree
 from os.path import join, isdir, exists
-from os import listdir
-from json import dump, load
+from os import listdir, stat
+from collections import OrderedDict
+from contextlib import ExitStack
+from copy import deepcopy
+from threading import Lock
+from json import dump, dumps, load, loads
 from datetime import datetime, timedelta
-from csv import reader
-
-__datasetTexts = {}
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+from math import ceil
+
+from FileSystems import fileHash
+from Matching.MinHash import MinHashIndex, writeMinHashIndex
+from Matching.ResultCache import MatchResultCache
+from Matching.SuffixArray import SuffixArrayIndex, writeSuffixArray
+from Matching.TokenMatch import TokenMatchIndex, writeTokenMatchIndex
+from RepoCatalog import closeCatalog, useCatalog
+from StepLog import StepColumns, loadStepCsv, loadStepLog
+
+# Training samples and their matches are appended here rather than saved in meta.json (see appendModelSampleLog())
+sampleLogFileName = 'samples.jsonl'
+__sampleLogLock = Lock()
+
+# Contents of recently read files, keyed by path (see readCachedFile())
+__fileCache = OrderedDict()
+__fileCacheBytes = 0
+__fileCacheLock = Lock()
+fileCacheMaxBytes = 64 * 1024 * 1024
+
+__datasetMetadataMaps = {}
+
+# Recently viewed sets of generated texts, keyed by the path of their texts.json (see getGeneratedTexts())
+__generatedTextsCache = OrderedDict()
+__generatedTextsCacheBytes = 0
+__generatedTextsCacheLock = Lock()
+generatedTextsCacheMaxBytes = 256 * 1024 * 1024
 
 knownReposPath = join('knownRepos.json')
 
+# The last metadata read for each known repository, so the list can be shown
+# before the repositories themselves are looked at (see getKnownReposSnapshot())
+knownReposSnapshotPath = join('knownReposSnapshot.json')
+
+# How many repositories getKnownRepos() looks at at once
+knownReposMaxWorkers = 8
+
 def getDurationString(passed: timedelta):
     hours, rem = divmod(passed.seconds, 3600)
     minutes, seconds = divmod(rem, 60)
     passedStr = f'{hours:02d}:{minutes:02d}:{seconds:02d}'
     return passedStr
 
+def readCachedFile(path: str, parse: Callable[[str], Any]) -> Any:
+    """
+    Reads the file at `path` and returns parse() of its text.
+    The result is kept in a process-wide cache and reused until the file's size or mtime changes.
+    Files bigger than a quarter of fileCacheMaxBytes aren't cached, and once the cache is full,
+    the least recently read files are dropped.
+    """
+    global __fileCacheBytes
+
+    fileStat = stat(path)
+    signature = (fileStat.st_size, fileStat.st_mtime_ns)
+
+    with __fileCacheLock:
+        cached = __fileCache.get(path)
+        if cached is not None and cached[0] == signature:
+            __fileCache.move_to_end(path)
+            return cached[1]
+
+    with open(path, encoding='utf-8') as f: value = parse(f.read())
+
+    # Another thread may have cached the file meanwhile, so whatever is there is replaced under the same lock,
+    # and the byte count always matches the entries
+    with __fileCacheLock:
+        stale = __fileCache.pop(path, None)
+        if stale is not None: __fileCacheBytes -= stale[0][0]
+
+        if fileStat.st_size <= fileCacheMaxBytes // 4:
+            __fileCache[path] = (signature, value)
+            __fileCacheBytes += fileStat.st_size
+            while __fileCacheBytes > fileCacheMaxBytes:
+                _, ((evictedSize, _), _) = __fileCache.popitem(last=False)
+                __fileCacheBytes -= evictedSize
+
+    return value
+
+def invalidateCachedFile(path: str):
+    """
+    Call after writing to a file that may have been read with readCachedFile().
+    Changes are noticed anyway, but a rewrite within the filesystem's mtime
+    resolution that keeps the same size wouldn't be.
+    """
+    global __fileCacheBytes
+
+    with __fileCacheLock:
+        cached = __fileCache.pop(path, None)
+        if cached is not None: __fileCacheBytes -= cached[0][0]
+
+def loadJsonFile(path: str) -> Any:
+    """
+    Reads a JSON file through the file cache. The caller gets its own copy, so it's free to modify it.
+    """
+    return deepcopy(readCachedFile(path, loads))
+
 def getRepoMetadata(repoPath: str) -> dict:
     infoFilePath = join(repoPath, 'info.json')
 
     repoMetadata: dict = {}
     if exists(infoFilePath):
-        with open(infoFilePath, encoding='utf-8') as f:
-            try:
-                repoMetadata = load(f)
-            except JSONDecodeError:
-                repoMetadata = {}
+        try:
+            repoMetadata = loadJsonFile(infoFilePath)
+        except JSONDecodeError:
+            repoMetadata = {}
 
     repoMetadata['path'] = repoPath
     return repoMetadata
@@ -37,149 +125,522 @@ def getRepoMetadata(repoPath: str) -> dict:
 def getRepoHeadModel(repoPath: str) -> str:
     return getRepoMetadata(repoPath).get('latest', None)
     
-def getModelsInRepository(repoPath: str) -> List[dict]:
-    allModelsFolder = join(repoPath, 'models')
-    
-    if not exists(allModelsFolder): return []
+# How each kind of catalog item is handed to the views
+catalogRowShapes = {
+    'models': lambda name, meta: meta | {'filePath': name},
+    'datasets': lambda name, meta: {'pathName': name, 'meta': meta},
+    'generated': lambda name, meta: {'meta': meta, 'path': name}
+}
+
+def getModelsInRepository(repoPath: str, sortBy: str = 'datetime', descending: bool = True, limit: int = None, offset: int = 0) -> List[dict]:
+    """
+    Lists the models in the repository from its catalog, a page at a time if limit is given.
+    sortBy is one of title, datetime, datasetTitle, duration, learningRate or steps.
+    """
+    with useCatalog(repoPath) as catalog:
+        rows = [] if catalog is None else catalog.query('models', sortBy, descending, limit, offset)
+    return [catalogRowShapes['models'](name, meta) for name, meta in rows]
 
-    allPotentialModels = listdir(allModelsFolder)
+def getDatasetsInRepository(repoPath: str, sortBy: str = 'imported', descending: bool = True, limit: int = None, offset: int = 0) -> List[dict]:
+    """
+    Lists the datasets in the repository from its catalog, a page at a time if limit is given.
+    sortBy is one of title, lineByLine or imported.
+    """
+    with useCatalog(repoPath) as catalog:
+        rows = [] if catalog is None else catalog.query('datasets', sortBy, descending, limit, offset)
+    return [catalogRowShapes['datasets'](name, meta) for name, meta in rows]
 
-    validModels = []
-    for dir in allPotentialModels:
-        configPath = join(allModelsFolder, dir, 'config.json')
-        metaPath = join(allModelsFolder, dir, 'meta.json')
-        modelBinPath = join(allModelsFolder, dir, 'pytorch_model.bin')
+def getGeneratedTextsInRepository(repoPath: str, sortBy: str = 'datetime', descending: bool = True, limit: int = None, offset: int = 0) -> List[dict]:
+    """
+    Lists the sets of generated texts in the repository from its catalog, a page at a time if limit is given.
+    sortBy is one of datetime, n, minLength, maxLength or temperature.
+    Only the metadata is listed - use getGeneratedTexts() to load the texts themselves.
+    """
+    with useCatalog(repoPath) as catalog:
+        rows = [] if catalog is None else catalog.query('generated', sortBy, descending, limit, offset)
+    return [catalogRowShapes['generated'](name, meta) for name, meta in rows]
 
-        if exists(configPath) and exists(metaPath) and exists(modelBinPath):
-            with open(metaPath, encoding='utf-8') as f:
-                data = load(f)
-                data['filePath'] = dir
-                validModels.append(data)
+def getGeneratedTexts(repoPath: str, genTextPath: str) -> List[dict]:
+    """
+    Loads the texts of one set of generated texts.
+    Recently viewed sets are kept in memory, up to generatedTextsCacheMaxBytes of texts.json,
+    and are reloaded if their texts.json has changed since.
+    """
+    global __generatedTextsCacheBytes
 
-    validModels.sort(key=lambda i: datetime.fromisoformat(i.get('datetime', '1970-01-01T00:00:00')), reverse=True)
-    return validModels
+    textsPath = join(repoPath, 'generated', genTextPath, 'texts.json')
+    if not exists(textsPath): return []
 
-def getDatasetsInRepository(repoPath: str) -> List[dict]:
+    fileStat = stat(textsPath)
+    signature = (fileStat.st_size, fileStat.st_mtime_ns)
 
-    allDatasetsFolder = join(repoPath, 'datasets')
-    if not exists(allDatasetsFolder): return []
+    with __generatedTextsCacheLock:
+        cached = __generatedTextsCache.get(textsPath)
+        if cached is not None and cached[0] == signature:
+            __generatedTextsCache.move_to_end(textsPath)
+            return cached[1]
 
-    allPotentialDatasets = listdir(allDatasetsFolder)
+    texts = loadGeneratedTextsFile(textsPath)
 
-    validDatasets = []
-    for dir in allPotentialDatasets:
-        datasetPath = join(allDatasetsFolder, dir, 'dataset')
-        metaPath = join(allDatasetsFolder, dir, 'meta.json')
-        tokenizerPath = join(allDatasetsFolder, dir, 'aitextgen.tokenizer.json')
+    # As in readCachedFile(), whatever another thread cached meanwhile is replaced under the lock
+    with __generatedTextsCacheLock:
+        stale = __generatedTextsCache.pop(textsPath, None)
+        if stale is not None: __generatedTextsCacheBytes -= stale[0][0]
 
-        if exists(datasetPath) and exists(metaPath) and exists(tokenizerPath):
-            with open(metaPath, encoding='utf-8') as f: meta = load(f)
-            validDatasets.append({
-                'pathName': dir,
-                'meta': meta
-            })
-            
-    validDatasets.sort(key=lambda i: i['meta']['imported'], reverse=True)
-    return validDatasets
+        __generatedTextsCache[textsPath] = (signature, texts)
+        __generatedTextsCacheBytes += fileStat.st_size
 
-def getGeneratedTextsInRepository(repoPath: str) -> List[dict]:
-    allGensFolder = join(repoPath, 'generated')
+        # Drop the least recently viewed sets, but always keep the one just loaded
+        while len(__generatedTextsCache) > 1 and __generatedTextsCacheBytes > generatedTextsCacheMaxBytes:
+            _, ((evictedSize, _), _) = __generatedTextsCache.popitem(last=False)
+            __generatedTextsCacheBytes -= evictedSize
 
-    if not exists(allGensFolder): return []
+    return texts
 
-    allPotentialGens = listdir(allGensFolder)
+def syncCatalog(repoPath: str):
+    """
+    Picks up changes made to the repository outside of Genni.
+    """
+    with useCatalog(repoPath) as catalog:
+        if catalog is not None: catalog.sync()
+    invalidateDatasetMetadataMap(repoPath)
 
-    validGens = []
-    for dir in allPotentialGens:
-        metaPath = join(allGensFolder, dir, 'meta.json')
-        textsPath = join(allGensFolder, dir, 'texts.json')
+def rebuildCatalog(repoPath: str):
+    with useCatalog(repoPath) as catalog:
+        if catalog is not None: catalog.rebuild()
+    invalidateDatasetMetadataMap(repoPath)
 
-        if exists(metaPath) and exists(textsPath):
-            with open(metaPath, encoding='utf-8') as f: meta = load(f)
-            with open(textsPath, encoding='utf-8') as f: texts = load(f)
-            validGens.append({
-                'texts': texts,
-                'meta': meta,
-                'path': dir
-            })
+def getLatestCatalogChange(repoPath: str) -> int:
+    with useCatalog(repoPath) as catalog:
+        return 0 if catalog is None else catalog.latestChange()
+
+def getCatalogRows(repoPath: str, table: str, limit: int = None, offset: int = 0) -> List[tuple]:
+    """
+    Returns a page of the lightweight rows list views show for models, datasets or generated.
+    Use getCatalogItem() for an item's full metadata.
+    """
+    with useCatalog(repoPath) as catalog:
+        return [] if catalog is None else catalog.queryRows(table, limit, offset)
+
+def getCatalogItem(repoPath: str, table: str, name: str) -> dict:
+    """
+    Returns one item in the same form as get...InRepository() does, or None if it's not in the catalog.
+    """
+    with useCatalog(repoPath) as catalog:
+        meta = None if catalog is None else catalog.get(table, name)
+    return None if meta is None else catalogRowShapes[table](name, meta)
 
-    validGens.sort(key=lambda i: i['meta']['datetime'], reverse=True)
-    return validGens
+def getCatalogChanges(repoPath: str, sinceChange: int) -> Tuple[int, Dict[str, Tuple[List[tuple], List[str]]]]:
+    """
+    Returns the latest change number, and for each of models, datasets and generated,
+    the rows (as from getCatalogRows()) that were added or modified after change number
+    sinceChange and the names of the ones that were removed.
+    """
+    with useCatalog(repoPath) as catalog:
+        if catalog is None: return sinceChange, {table: ([], []) for table in catalogRowShapes}
+
+        latest, changed = catalog.changesSince(sinceChange)
+        changes = {}
+        for table, names in changed.items():
+            rows = catalog.getRows(table, names)
+            found = {row.name for row in rows}
+            changes[table] = (rows, [name for name in names if name not in found])
+
+    if len(changed['datasets']) > 0: invalidateDatasetMetadataMap(repoPath)
+    return latest, changes
+
+def updateCatalog(repoPath: str, table: str, name: str):
+    """
+    Call after writing an item's files, so the catalog reflects them.
+    table is one of models, datasets or generated.
+    """
+    with useCatalog(repoPath) as catalog:
+        if catalog is not None: catalog.put(table, name)
+    if table == 'datasets': invalidateDatasetMetadataMap(repoPath)
     
-def getDatasetMetadata(repoPath: str, datasetName: str) -> dict:
-    allDatasets = getDatasetsInRepository(repoPath)
+def loadGeneratedTextsFile(textsPath: str) -> List[dict]:
+    with open(textsPath, encoding='utf-8') as f: rawTexts = f.read()
     try:
-        thisDataset = [i for i in allDatasets if i['pathName'] == datasetName][0]
-        return thisDataset.get('meta', {})
-    except IndexError:
-        return {}
+        return loads(rawTexts)
+    except JSONDecodeError:
+        # Streamed generation writes texts.json an item at a time, so if it was
+        # cut short the array just needs closing
+        try:
+            return loads(rawTexts.rstrip().removesuffix(',') + '\n]')
+        except JSONDecodeError as e:
+            print(f'Could not read {textsPath}: {e}')
+            return []
+
+def getDatasetMetadataMap(repoPath: str) -> Dict[str, dict]:
+    """
+    Returns every dataset's metadata keyed by its pathName.
+    The map is built with one catalog query and shared by every caller until the
+    repository's datasets change (see invalidateDatasetMetadataMap()).
+    """
+    datasetMetadataMap = __datasetMetadataMaps.get(repoPath)
+    if datasetMetadataMap is None:
+        datasetMetadataMap = {dataset['pathName']: dataset['meta'] for dataset in getDatasetsInRepository(repoPath)}
+        __datasetMetadataMaps[repoPath] = datasetMetadataMap
+    return datasetMetadataMap
 
-def getDatasetText(repoPath: str, datasetName: str) -> str:
-    name = f'{repoPath}/{datasetName}'
-    # if name in __datasetTexts: return __datasetTexts[name]
+def invalidateDatasetMetadataMap(repoPath: str):
+    __datasetMetadataMaps.pop(repoPath, None)
+
+def getDatasetMetadata(repoPath: str, datasetName: str) -> dict:
+    return getDatasetMetadataMap(repoPath).get(datasetName, {})
 
+def getDatasetText(repoPath: str, datasetName: str) -> str:
     targetDataset = join(repoPath, 'datasets', datasetName, 'dataset')
     text = None
     if exists(targetDataset):
-        with open(targetDataset, encoding='utf-8') as f:
-            text = f.read()
+        text = readCachedFile(targetDataset, str)
 
     print(f'look for {targetDataset}')
-    # __datasetTexts[name] = text
     return text
 
-def getModelStepData(repoPath: str, modelName: str):
-    modelLossDataPath = join(repoPath, 'models', modelName, 'steps.csv')
+def getModelStepData(repoPath: str, modelName: str) -> StepColumns:
+    """
+    Returns a model's training steps as columns (elapsed, step, loss, avgLoss), or None if it has none.
+    Models saved before step logs existed have a steps.csv instead, which is read the slow way.
+    """
+    modelPath = join(repoPath, 'models', modelName)
 
-    if not exists(modelLossDataPath): return None
+    steps = loadStepLog(join(modelPath, 'steps.bin'))
+    if steps is None: steps = loadStepCsv(join(modelPath, 'steps.csv'))
+    return steps
 
-    rows = []
-    with open(modelLossDataPath, encoding='utf-8', newline='') as f:
-        r = reader(f)
-        for row in r:
-            try:
-                rows.append((float(row[0]), int(row[1]), float(row[2]), float(row[3])))
-            except IndexError:
-                pass
-                
-    return rows
-
-def processGeneratedSamples(repoPath: str, genTexts: List[str], prompt: str, checkAgainstDatasets: bool = True) -> List[dict]:
+def appendModelSampleLog(modelPath: str, record: dict):
     """
-    We want to check each of the generated samples against the training data
-    to see if there's overtraining going on.
+    Appends a record to a model's sample log: {'step', 'samples'} when samples are generated during training,
+    and {'step', 'sampleMatches'} once they've been checked against the dataset.
+    Each record is a line of JSON, so saving the model never rewrites the samples from earlier steps.
     """
+    # Samples and their matches are written from different threads
+    with __sampleLogLock:
+        with open(join(modelPath, sampleLogFileName), 'a', encoding='utf-8') as f: f.write(dumps(record) + '\n')
 
-    output = [{ 'text': text, 'datasetMatches': None} for text in genTexts]
-
-    if checkAgainstDatasets:
-        for i in output: i['datasetMatches'] = []
-        for datasetMeta in getDatasetsInRepository(repoPath):
-            datasetPath = join(repoPath, 'datasets', datasetMeta['pathName'], 'dataset')
-            with open(datasetPath, encoding='utf-8') as f: datasetText = f.read()
-            seqMatcher = SequenceMatcher(
-                isjunk=lambda x: x == prompt, 
-                a=datasetText
-            )
+def getModelSamples(repoPath: str, modelName: str) -> Tuple[Dict[str, list], Dict[str, list]]:
+    """
+    Returns the samples generated while training a model and their dataset matches, each keyed by step.
+    Models saved before sample logs existed have them in meta.json instead.
+    """
+    modelPath = join(repoPath, 'models', modelName)
+    logPath = join(modelPath, sampleLogFileName)
+    if not exists(logPath):
+        metaPath = join(modelPath, 'meta.json')
+        meta = readCachedFile(metaPath, loads) if exists(metaPath) else {}
+        return meta.get('samples', {}), meta.get('sampleMatches', {})
+
+    samples, sampleMatches = {}, {}
+    with open(logPath, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = loads(line)
+            except JSONDecodeError:
+                # The last line can be cut off if the app crashed while writing it
+                continue
+            if 'samples' in record: samples[str(record['step'])] = record['samples']
+            if 'sampleMatches' in record: sampleMatches[str(record['step'])] = record['sampleMatches']
+    return samples, sampleMatches
+
+def getDatasetMatchIndex(repoPath: str, datasetName: str) -> SuffixArrayIndex:
+    datasetFolderPath = join(repoPath, 'datasets', datasetName)
+    datasetPath = join(datasetFolderPath, 'dataset')
+    indexPath = join(datasetFolderPath, 'matchindex.bin')
+
+    matchIndex = SuffixArrayIndex.load(datasetPath, indexPath)
+    if matchIndex is None:
+        # Datasets imported before indexing existed (or changed since) get indexed once here
+        print(f'Building match index for {datasetPath}')
+        writeSuffixArray(datasetPath, indexPath)
+        matchIndex = SuffixArrayIndex.load(datasetPath, indexPath)
+    return matchIndex
+
+def getDatasetMinHashIndex(repoPath: str, datasetName: str) -> MinHashIndex:
+    datasetFolderPath = join(repoPath, 'datasets', datasetName)
+    datasetPath = join(datasetFolderPath, 'dataset')
+    indexPath = join(datasetFolderPath, 'minhash.bin')
+
+    minHashIndex = MinHashIndex.load(datasetPath, indexPath)
+    if minHashIndex is None:
+        print(f'Building MinHash index for {datasetPath}')
+        writeMinHashIndex(datasetPath, indexPath)
+        minHashIndex = MinHashIndex.load(datasetPath, indexPath)
+    return minHashIndex
+
+def getDatasetTokenMatchIndex(repoPath: str, datasetName: str) -> TokenMatchIndex:
+    datasetFolderPath = join(repoPath, 'datasets', datasetName)
+    datasetPath = join(datasetFolderPath, 'dataset')
+    tokenizerPath = join(datasetFolderPath, 'aitextgen.tokenizer.json')
+    indexPath = join(datasetFolderPath, 'tokenindex.bin')
+
+    tokenMatchIndex = TokenMatchIndex.load(datasetPath, tokenizerPath, indexPath)
+    if tokenMatchIndex is None:
+        print(f'Building token index for {datasetPath}')
+        writeTokenMatchIndex(datasetPath, tokenizerPath, indexPath)
+        tokenMatchIndex = TokenMatchIndex.load(datasetPath, tokenizerPath, indexPath)
+    return tokenMatchIndex
+
+def longestMatchRecords(genTexts: List[str], minSpanLength: int, matchIndex: SuffixArrayIndex) -> List[dict]:
+    records = []
+    for genText in genTexts:
+        datasetMatchIndex, genTextMatchIndex, size = matchIndex.longestMatch(genText)
+        records.append({
+            'datasetMatchIndex': datasetMatchIndex,
+            'genTextMatchIndex': genTextMatchIndex,
+            'size': size,
+            'ratio': (size / len(genText)) if len(genText) > 0 else 0
+        })
+    return records
+
+def nearDuplicateRecords(genTexts: List[str], minSpanLength: int, minHashIndex: MinHashIndex, matchIndex: SuffixArrayIndex) -> List[dict]:
+    records = []
+    for genText in genTexts:
+        if minHashIndex.wordCount(genText) < minHashIndex.windowWords:
+            # Too short to share many shingles with any window, so look for it word for word instead
+            datasetMatchIndex, genTextMatchIndex, size = matchIndex.longestMatch(genText)
+            records.append({
+                'datasetMatchIndex': datasetMatchIndex,
+                'datasetMatchSize': size,
+                'genTextMatchIndex': genTextMatchIndex,
+                'size': size,
+                'ratio': (size / len(genText)) if len(genText) > 0 else 0,
+                'jaccard': None,
+                'nearest': []
+            })
+            continue
+
+        nearest = minHashIndex.nearest(genText)
+        if len(nearest) == 0:
+            records.append({'datasetMatchIndex': 0, 'datasetMatchSize': 0, 'genTextMatchIndex': 0, 'size': 0, 'ratio': 0, 'jaccard': 0, 'nearest': []})
+            continue
+
+        # The closest span goes in the usual fields, so existing views can show it
+        records.append(nearest[0] | {'ratio': nearest[0]['jaccard'], 'nearest': nearest})
+    return records
+
+def tokenMatchRecords(genTexts: List[str], minSpanLength: int, tokenMatchIndex: TokenMatchIndex) -> List[dict]:
+    records = []
+    for genText in genTexts:
+        datasetMatchIndex, genTextMatchIndex, size, tokenCount = tokenMatchIndex.longestMatch(genText)
+        records.append({
+            'datasetMatchIndex': datasetMatchIndex,
+            'genTextMatchIndex': genTextMatchIndex,
+            'size': size,
+            'tokens': tokenCount,
+            'ratio': (size / len(genText)) if len(genText) > 0 else 0
+        })
+    return records
+
+def allSpansRecords(genTexts: List[str], minSpanLength: int, matchIndex: SuffixArrayIndex) -> List[dict]:
+    records = []
+    for genText in genTexts:
+        spans = matchIndex.maximalMatches(genText, minSpanLength)
+
+        # Maximal matches can overlap each other, so merge them before measuring coverage
+        covered, coveredUntil = 0, 0
+        for _, start, size in sorted(spans, key=lambda span: span[1]):
+            covered += max(0, start + size - max(start, coveredUntil))
+            coveredUntil = max(coveredUntil, start + size)
+        coverage = (covered / len(genText)) if len(genText) > 0 else 0
+
+        longest = max(spans, key=lambda span: span[2], default=(0, 0, 0))
+        records.append({
+            'datasetMatchIndex': longest[0],
+            'genTextMatchIndex': longest[1],
+            'size': longest[2],
+            'ratio': coverage,
+            'coverage': coverage,
+            'spans': [{'datasetMatchIndex': a, 'genTextMatchIndex': b, 'size': size} for a, b, size in spans]
+        })
+    return records
+
+# Ways of checking generated samples against datasets
+matchModes = {
+    'longest': longestMatchRecords,
+    'nearDuplicate': nearDuplicateRecords,
+    'allSpans': allSpansRecords,
+    'tokens': tokenMatchRecords
+}
+
+def matchScoreText(match: dict) -> str:
+    """
+    Formats a match's 'ratio' for display, saying what it measures: how much of the sample
+    the spans cover in 'allSpans' mode, estimated similarity in 'nearDuplicate' mode,
+    and otherwise how much of the sample the longest match makes up.
+    """
+    ratio = match.get('ratio', 0)
+    if 'coverage' in match: return f'{ratio * 100:.01f}% covered'
+    if match.get('jaccard') is not None: return f'{ratio * 100:.01f}% similar'
+    return f'{ratio * 100:.01f}% matched'
+
+# Starting a process pool and having each process open the indexes costs more than checking a few samples,
+# so each process gets at least this many samples to check, and small batches are checked in this process
+minSamplesPerMatchWorker = 32
+
+# The dataset indexes each match mode uses
+matchModeIndexes = {
+    'longest': [getDatasetMatchIndex],
+    'nearDuplicate': [getDatasetMinHashIndex, getDatasetMatchIndex],
+    'allSpans': [getDatasetMatchIndex],
+    'tokens': [getDatasetTokenMatchIndex]
+}
+
+def openDatasetIndexes(stack: ExitStack, repoPath: str, datasetName: str, mode: str) -> list:
+    """
+    Opens the indexes `mode` uses for a dataset (building any that don't exist yet, or are out of date),
+    in the order its records function takes them. They stay open until `stack` closes.
+    """
+    return [stack.enter_context(getIndex(repoPath, datasetName)) for getIndex in matchModeIndexes[mode]]
 
-            for genTextIndex, genText in enumerate(genTexts):
-                genText = genText.removeprefix(prompt)
-                seqMatcher.set_seq2(genText)
-                longestMatch = seqMatcher.find_longest_match()
+def matchSamplesAgainstDataset(repoPath: str, datasetName: str, genTexts: List[str], prompt: str, mode: str = 'longest', minSpanLength: int = 16) -> List[dict]:
+    """
+    Checks each of the samples against one dataset.
+    This is the unit of work handed to each worker process.
+    """
+    with ExitStack() as stack:
+        indexes = openDatasetIndexes(stack, repoPath, datasetName, mode)
+        return matchModes[mode]([genText.removeprefix(prompt) for genText in genTexts], minSpanLength, *indexes)
 
-                ratioMatchToGenerated = (longestMatch.size / len(genText)) if len(genText) > 0 else 0
+class SampleMatcher:
+    """
+    Checks samples against a repository's datasets (see processGeneratedSamples()).
+    The result cache and each dataset's indexes are opened once and kept open until close(),
+    so samples can be checked a few at a time as they're generated without reloading everything for each one.
+    """
+    def __init__(self, repoPath: str, prompt: str, mode: str = 'longest', minSpanLength: int = 16, useCache: bool = True, datasetNames: List[str] = None):
+        self.repoPath = repoPath
+        self.prompt = prompt
+        self.mode = mode
+        self.minSpanLength = minSpanLength
+        self.datasetNames = datasetNames if datasetNames is not None else [datasetMeta['pathName'] for datasetMeta in getDatasetsInRepository(repoPath)]
+        self.indexes = {}
+
+        # Everything opened is closed along with the matcher, or straight away if opening something else fails
+        self.stack = ExitStack()
+        try:
+            self.cache = self.stack.enter_context(MatchResultCache(repoPath)) if useCache else None
+            self.datasetHashes = {}
+            if self.cache is not None:
+                self.datasetHashes = {datasetName: fileHash(join(repoPath, 'datasets', datasetName, 'dataset')) for datasetName in self.datasetNames}
+        except BaseException:
+            self.stack.close()
+            raise
+
+    def close(self): self.stack.close()
+    def __enter__(self): return self
+    def __exit__(self, *args): self.close()
+
+    def datasetIndexes(self, datasetName: str) -> list:
+        if datasetName not in self.indexes:
+            self.indexes[datasetName] = openDatasetIndexes(self.stack, self.repoPath, datasetName, self.mode)
+        return self.indexes[datasetName]
+
+    def match(self, genTexts: List[str], workers: int = 1) -> List[dict]:
+        """
+        Returns each sample with its 'datasetMatches', one record per dataset.
+        If workers is more than 1, the (dataset, chunk of samples) pairs are spread
+        across a process pool, as long as each process gets at least minSamplesPerMatchWorker
+        samples to check. The output is the same either way.
+        """
+        output = [{'text': text, 'datasetMatches': []} for text in genTexts]
+        allMatches = {datasetName: [None] * len(genTexts) for datasetName in self.datasetNames}
+
+        # Pull whatever has already been worked out from the cache,
+        # so only the rest needs checking
+        cacheKeys = {}
+        if self.cache is not None:
+            settings = f'{self.mode}:{self.minSpanLength}'
+            for datasetName in self.datasetNames:
+                cacheKeys[datasetName] = [MatchResultCache.makeKey(self.datasetHashes[datasetName], genText.removeprefix(self.prompt), self.prompt, settings) for genText in genTexts]
+                cached = self.cache.getMany(cacheKeys[datasetName])
+                for genTextIndex, key in enumerate(cacheKeys[datasetName]):
+                    allMatches[datasetName][genTextIndex] = cached.get(key)
+
+        pending = {datasetName: [i for i, record in enumerate(allMatches[datasetName]) if record is None] for datasetName in self.datasetNames}
+        pending = {datasetName: indices for datasetName, indices in pending.items() if len(indices) > 0}
+
+        totalPending = sum(len(indices) for indices in pending.values())
+        workers = min(workers, totalPending // minSamplesPerMatchWorker)
+        if workers > 1:
+            # Make sure every index exists up front, so workers don't all try to build the same one
+            for datasetName in pending: self.datasetIndexes(datasetName)
+
+            # A few chunks per worker keeps them all busy when some samples are slower than others
+            chunkSize = max(1, ceil(totalPending / (workers * 4)))
+            workUnits = [(datasetName, indices[start:start + chunkSize]) for datasetName, indices in pending.items() for start in range(0, len(indices), chunkSize)]
+
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunkResults = pool.map(
+                    matchSamplesAgainstDataset,
+                    repeat(self.repoPath),
+                    [datasetName for datasetName, _ in workUnits],
+                    [[genTexts[i] for i in indices] for _, indices in workUnits],
+                    repeat(self.prompt),
+                    repeat(self.mode),
+                    repeat(self.minSpanLength)
+                )
+
+                # pool.map yields results in submission order, so this is deterministic
+                computed = {datasetName: [] for datasetName in pending}
+                for (datasetName, _), chunkResult in zip(workUnits, chunkResults):
+                    computed[datasetName].extend(chunkResult)
+        else:
+            computed = {
+                datasetName: matchModes[self.mode]([genTexts[i].removeprefix(self.prompt) for i in indices], self.minSpanLength, *self.datasetIndexes(datasetName))
+                for datasetName, indices in pending.items()
+            }
+
+        for datasetName, indices in pending.items():
+            for genTextIndex, record in zip(indices, computed[datasetName]):
+                allMatches[datasetName][genTextIndex] = record
+
+            if self.cache is not None:
+                self.cache.putMany({cacheKeys[datasetName][genTextIndex]: record for genTextIndex, record in zip(indices, computed[datasetName])})
+
+        for datasetName in self.datasetNames:
+            for genTextIndex, record in enumerate(allMatches[datasetName]):
+                output[genTextIndex]['datasetMatches'].append({'dataset': datasetName} | record)
+
+        return output
+
+def processGeneratedSamples(repoPath: str, genTexts: List[str], prompt: str, checkAgainstDatasets: bool = True, workers: int = 1, mode: str = 'longest', minSpanLength: int = 16, useCache: bool = True, datasetNames: List[str] = None) -> List[dict]:
+    """
+    We want to check each of the generated samples against the training data
+    to see if there's overtraining going on.
 
-                outputItem = {
-                    'dataset': datasetMeta['pathName'],
-                    'datasetMatchIndex': longestMatch.a,
-                    'genTextMatchIndex': longestMatch.b,
-                    'size': longestMatch.size,
-                    'ratio': ratioMatchToGenerated
-                }
+    mode 'longest' reports the longest exact substring shared with each dataset.
+    mode 'nearDuplicate' reports the dataset spans with the most similar word
+    shingles, so lightly reworded text is caught too; 'ratio' is then the
+    estimated Jaccard similarity. Samples shorter than one of the index's windows
+    are checked as in 'longest' mode instead, with 'jaccard' set to None.
+    mode 'allSpans' lists every maximal exact match of at least minSpanLength
+    characters under 'spans'; 'ratio' is then the fraction of the sample
+    covered by them.
+    mode 'tokens' finds the longest match over the dataset's token IDs, ignoring
+    case and spacing; offsets and sizes are still in characters.
+
+    In every mode, 'size' is the length of the matched part of the sample,
+    starting at 'genTextMatchIndex'. The matched part of the dataset starts at
+    'datasetMatchIndex' and is the same length, except in 'nearDuplicate' mode,
+    where its length is given as 'datasetMatchSize'.
+
+    If workers is more than 1, the (dataset, chunk of samples) pairs are spread
+    across a process pool, when there are enough of them (see minSamplesPerMatchWorker).
+    The output is the same either way.
+
+    Results are cached in the repository (see MatchResultCache), so samples
+    that have been checked before with the same settings are skipped.
+
+    If datasetNames is given, only those datasets are checked; otherwise every
+    dataset in the repository is.
+    """
 
-                output[genTextIndex]['datasetMatches'].append(outputItem)
+    if not checkAgainstDatasets: return [{'text': text, 'datasetMatches': None} for text in genTexts]
 
-    return output
+    # The cache and indexes are closed however matching ends, so an error can't leave them open
+    with SampleMatcher(repoPath, prompt, mode, minSpanLength, useCache, datasetNames) as matcher:
+        return matcher.match(genTexts, workers)
 
 def initKnownRepos():
     # check if the knownRepos.json file exists
@@ -188,25 +649,69 @@ def initKnownRepos():
         with open(knownReposPath, 'w', encoding='utf-8') as f:
             dump([], f)
 
-def getKnownRepos():
+def getKnownRepoPaths() -> List[str]:
     initKnownRepos()
     
     # It does exist, so let's read from it
     knownReposRaw = []
     try:
-        with open(knownReposPath, encoding='utf-8') as f:
-            knownReposRaw = load(f)
+        knownReposRaw = loadJsonFile(knownReposPath)
     except IOError as e:
         print(e.strerror())
     except JSONDecodeError as e:
         print(e)
 
     # knownReposRaw is just a list of paths to repo folders
+    return knownReposRaw
+
+def getKnownRepoMetadata(repoPath: str) -> dict:
+    """
+    Like getRepoMetadata(), but marks the repository with 'missing': True
+    if its folder is gone or can't be read, e.g. on a network drive that isn't mounted.
+    """
+    try:
+        if not isdir(repoPath): return {'path': repoPath, 'missing': True}
+        return getRepoMetadata(repoPath)
+    except OSError as e:
+        print(f'Couldn\'t read repository {repoPath}: {e}')
+        return {'path': repoPath, 'missing': True}
+
+def getKnownReposSnapshot() -> List[dict]:
+    """
+    Returns the known repositories as they were the last time getKnownRepos() ran,
+    without touching the repositories themselves, so it's fast even when they're on slow storage.
+    Repositories added since then only have their path.
+    """
+    snapshot = {}
+    if exists(knownReposSnapshotPath):
+        try:
+            snapshot = loadJsonFile(knownReposSnapshotPath)
+        except (IOError, JSONDecodeError) as e:
+            print(f'Error reading {knownReposSnapshotPath}: {e}')
+
+    return [snapshot.get(repoPath, {'path': repoPath}) for repoPath in getKnownRepoPaths()]
+
+def writeKnownReposSnapshot(knownRepos: List[dict]):
+    try:
+        with open(knownReposSnapshotPath, 'w', encoding='utf-8') as f:
+            dump({repo['path']: repo for repo in knownRepos}, f)
+    except IOError as e:
+        print(f'IO error: {e}')
+    invalidateCachedFile(knownReposSnapshotPath)
+
+def getKnownRepos() -> List[dict]:
+    """
+    Reads the metadata of every known repository, several at once since each one may be on slow storage.
+    Repositories that can't be reached are marked with 'missing': True.
+    The result is saved for getKnownReposSnapshot().
+    """
+    knownReposRaw = getKnownRepoPaths()
+
     # We need to check each repo and get its metadata
-    knownRepos = []
-    for repoPath in knownReposRaw:
-        knownRepos.append(getRepoMetadata(repoPath))
+    with ThreadPoolExecutor(max_workers=max(1, min(knownReposMaxWorkers, len(knownReposRaw)))) as executor:
+        knownRepos = list(executor.map(getKnownRepoMetadata, knownReposRaw))
 
+    writeKnownReposSnapshot(knownRepos)
     return knownRepos
 
 
@@ -215,8 +720,7 @@ def addKnownRepo(repoPath: str):
 
     knownReposRaw = []
     try:
-        with open(knownReposPath, encoding='utf-8') as f:
-            knownReposRaw = load(f)
+        knownReposRaw = loadJsonFile(knownReposPath)
     except IOError as e:
         print(f'IO error: {e}')
     except JSONDecodeError as e:
@@ -229,6 +733,7 @@ def addKnownRepo(repoPath: str):
             dump(knownReposRaw, f)
     except IOError as e:
         print(f'IO error: {e}')
+    invalidateCachedFile(knownReposPath)
     
 def renameRepo(repoPath: str, title: str):
     infoFilePath = join(repoPath, 'info.json')
@@ -243,6 +748,10 @@ def renameRepo(repoPath: str, title: str):
             dump(existingMeta, f)
     except IOError as e:
         print(f'IO error while trying to rename repo: {e}')
+    invalidateCachedFile(infoFilePath)
+
+    # So the new title shows up straight away next time the list is shown
+    writeKnownReposSnapshot([getRepoMetadata(repoPath) if repo['path'] == repoPath else repo for repo in getKnownReposSnapshot()])
 
 
 def removeRepo(repoPath: str):
@@ -250,8 +759,7 @@ def removeRepo(repoPath: str):
 
     knownReposRaw = []
     try:
-        with open(knownReposPath, encoding='utf-8') as f:
-            knownReposRaw = load(f)
+        knownReposRaw = loadJsonFile(knownReposPath)
     except IOError as e:
         print(e.strerror())
     except JSONDecodeError as e:
@@ -268,8 +776,51 @@ def removeRepo(repoPath: str):
             dump(knownReposRaw, f)
     except IOError as e:
         print(f'Error writing knownRepos.json when attempting to remove a repo: {e}')
+    invalidateCachedFile(knownReposPath)
+
+    # Let go of the GUI thread's catalog connection, so the repository's folder can be moved or deleted.
+    # Other threads only hold one while they're using it
+    closeCatalog(repoPath)
 
 
 def deleteTexts(repoPath: str, genTextPath: str):
+    global __generatedTextsCacheBytes
+
     fullTextsPath = join(repoPath, 'generated', genTextPath)
-    rmtree(fullTextsPath)
\ No newline at end of file
+    rmtree(fullTextsPath)
+    with __generatedTextsCacheLock:
+        cached = __generatedTextsCache.pop(join(fullTextsPath, 'texts.json'), None)
+        if cached is not None: __generatedTextsCacheBytes -= cached[0][0]
+    with useCatalog(repoPath) as catalog:
+        if catalog is not None: catalog.remove('generated', genTextPath)
+
+def deleteModel(repoPath: str, modelName: str):
+    """
+    Deletes a model's folder. If it was the head model, the model it was trained from becomes the head again.
+    """
+    modelPath = join(repoPath, 'models', modelName)
+    metaPath = join(modelPath, 'meta.json')
+
+    parent = None
+    if exists(metaPath):
+        try:
+            parent = loadJsonFile(metaPath).get('parent')
+        except (IOError, JSONDecodeError) as e:
+            print(f'Could not read {metaPath}: {e}')
+
+    rmtree(modelPath, ignore_errors=True)
+    invalidateCachedFile(metaPath)
+    with useCatalog(repoPath) as catalog:
+        if catalog is not None: catalog.remove('models', modelName)
+
+    if getRepoHeadModel(repoPath) != modelName: return
+
+    infoFilePath = join(repoPath, 'info.json')
+    repoMetadata = getRepoMetadata(repoPath)
+    del repoMetadata['path']
+    repoMetadata['latest'] = parent
+    try:
+        with open(infoFilePath, 'w', encoding='utf-8') as f: dump(repoMetadata, f)
+    except IOError as e:
+        print(f'IO error while trying to reset the head model: {e}')
+    invalidateCachedFile(infoFilePath)
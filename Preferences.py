@@ -1,3 +1,4 @@
+from typing import Tuple
 from PyQt6.QtCore import QSettings
 
 settings = None
@@ -24,4 +25,31 @@ def getDateTimeFormatString() -> str:
     output = dateFormats.get(settings.value('datetime/dateFormat', 'ddmmyy'), 'ddmmyy')
     output += ', '
     output += use24HourTimeFormats.get(settings.value('datetime/use24HourTime', False), False)
-    return output
\ No newline at end of file
+    return output
+
+def getThreadSettings(kind: str) -> Tuple[int, int]:
+    """
+    Returns the (intra-op threads, inter-op threads) calibrated for training or generation,
+    or None if they haven't been calibrated or set.
+    """
+    intraOp = int(settings.value(f'threads/{kind}/intraOp', 0))
+    interOp = int(settings.value(f'threads/{kind}/interOp', 0))
+    if intraOp <= 0 or interOp <= 0: return None
+    return intraOp, interOp
+
+def setThreadSettings(kind: str, threads: Tuple[int, int]):
+    """
+    Saves the thread counts for training or generation. None goes back to torch's defaults.
+    """
+    intraOp, interOp = threads if threads is not None else (0, 0)
+    settings.setValue(f'threads/{kind}/intraOp', intraOp)
+    settings.setValue(f'threads/{kind}/interOp', interOp)
+
+def getMaxConcurrentTrainingJobs() -> int:
+    """
+    Returns how many queued training jobs may run at once.
+    """
+    return max(1, int(settings.value('training/maxConcurrentJobs', 1)))
+
+def setMaxConcurrentTrainingJobs(count: int):
+    settings.setValue('training/maxConcurrentJobs', max(1, count))
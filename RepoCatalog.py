@@ -0,0 +1,286 @@
+import sqlite3
+from collections import namedtuple
+from contextlib import contextmanager
+from json import JSONDecodeError, dumps, load, loads
+from os import listdir, stat
+from os.path import exists, isdir, join
+from threading import current_thread, main_thread
+from typing import Dict, Iterator, List, Tuple
+
+from FileSystems import sqliteJournalMode
+
+catalogVersion = 2
+
+# How many entries of the change log are kept for watchers to catch up on
+changeLogLength = 10000
+
+# For each kind of item: the folder it lives in, the files that make an entry valid,
+# and the meta.json fields copied into columns so they can be sorted on.
+catalogTables = {
+    'models': {
+        'folder': 'models',
+        'requiredFiles': ['config.json', 'meta.json', 'pytorch_model.bin'],
+        'columns': {
+            'title': lambda meta: meta.get('name', ''),
+            'datetime': lambda meta: meta.get('datetime', '1970-01-01T00:00:00'),
+            'dataset': lambda meta: meta.get('dataset'),
+            'duration': lambda meta: meta.get('duration'),
+            'learningRate': lambda meta: meta.get('learningRate'),
+            'steps': lambda meta: meta.get('steps')
+        },
+        'defaultSort': 'datetime'
+    },
+    'datasets': {
+        'folder': 'datasets',
+        'requiredFiles': ['dataset', 'meta.json', 'aitextgen.tokenizer.json'],
+        'columns': {
+            'title': lambda meta: meta.get('title', ''),
+            'lineByLine': lambda meta: meta.get('lineByLine', False),
+            'imported': lambda meta: meta.get('imported', '1970-01-01T00:00:00')
+        },
+        'defaultSort': 'imported'
+    },
+    'generated': {
+        'folder': 'generated',
+        'requiredFiles': ['meta.json', 'texts.json'],
+        'columns': {
+            'datetime': lambda meta: meta.get('datetime', '1970-01-01T00:00:00'),
+            'n': lambda meta: meta.get('n'),
+            'minLength': lambda meta: meta.get('minLength'),
+            'maxLength': lambda meta: meta.get('maxLength'),
+            'temperature': lambda meta: meta.get('temperature')
+        },
+        'defaultSort': 'datetime'
+    }
+}
+
+# Lightweight rows for list views, holding only an item's name and columns
+catalogRowTypes = {table: namedtuple(f'{table.capitalize()}Row', ['name'] + list(spec['columns'])) for table, spec in catalogTables.items()}
+
+# Sort keys that aren't plain columns
+extraSortKeys = {
+    'models': {
+        'datasetTitle': '(SELECT datasets.title FROM datasets WHERE datasets.name = models.dataset)'
+    }
+}
+
+class RepoCatalog:
+    """
+    Index of a repository's models, datasets and generated texts, stored in the
+    repository as catalog.sqlite. It holds each item's meta.json along with the
+    fields the list views sort on, so listing a repository is a single query
+    instead of a directory scan and a JSON parse per item.
+
+    The trainer, generator and dataset builders update it as they write to the
+    repository. sync() picks up anything changed behind their backs, and
+    rebuild() recreates the whole catalog from the files on disk.
+
+    Every item that put(), remove() or sync() touches is also appended to a
+    change log, so views can update just those rows (see changesSince()).
+    """
+    def __init__(self, repoPath: str):
+        self.repoPath = repoPath
+        self.db = sqlite3.connect(join(repoPath, 'catalog.sqlite'), timeout=30)
+        self.db.execute(f'PRAGMA journal_mode={sqliteJournalMode(repoPath)}')
+
+        if self.db.execute('PRAGMA user_version').fetchone()[0] != catalogVersion:
+            self.createTables()
+            self.rebuild()
+
+    def close(self): self.db.close()
+    def __enter__(self): return self
+    def __exit__(self, *args): self.close()
+
+    def createTables(self):
+        with self.db:
+            for table, spec in catalogTables.items():
+                self.db.execute(f'DROP TABLE IF EXISTS {table}')
+                columns = ''.join(f', {column}' for column in spec['columns'])
+                self.db.execute(f'CREATE TABLE {table} (name TEXT PRIMARY KEY, metaMtime INTEGER NOT NULL, meta TEXT NOT NULL{columns})')
+                self.db.execute(f"CREATE INDEX {table}By{spec['defaultSort']} ON {table} ({spec['defaultSort']})")
+            self.db.execute('DROP TABLE IF EXISTS changes')
+            self.db.execute('CREATE TABLE changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, tableName TEXT NOT NULL, name TEXT NOT NULL)')
+            self.db.execute(f'PRAGMA user_version = {catalogVersion}')
+
+    def readEntry(self, table: str, name: str) -> tuple:
+        """
+        Returns the row for one item as it is on disk, or None if it isn't a valid item.
+        """
+        spec = catalogTables[table]
+        folderPath = join(self.repoPath, spec['folder'], name)
+        if not all(exists(join(folderPath, requiredFile)) for requiredFile in spec['requiredFiles']): return None
+
+        metaPath = join(folderPath, 'meta.json')
+        try:
+            metaMtime = stat(metaPath).st_mtime_ns
+            with open(metaPath, encoding='utf-8') as f: meta = load(f)
+        except (IOError, JSONDecodeError) as e:
+            print(f'Could not read {metaPath}: {e}')
+            return None
+
+        return (name, metaMtime, dumps(meta)) + tuple(getColumn(meta) for getColumn in spec['columns'].values())
+
+    def writeEntries(self, table: str, rows: List[tuple]):
+        placeholders = ','.join('?' * (3 + len(catalogTables[table]['columns'])))
+        self.db.executemany(f'INSERT OR REPLACE INTO {table} VALUES ({placeholders})', rows)
+
+    def put(self, table: str, name: str):
+        """
+        (Re)reads one item from disk into the catalog, or removes it if it's no longer valid.
+        """
+        row = self.readEntry(table, name)
+        with self.db:
+            if row is None:
+                self.db.execute(f'DELETE FROM {table} WHERE name = ?', (name,))
+            else:
+                self.writeEntries(table, [row])
+            self.logChanges(table, [name])
+
+    def remove(self, table: str, name: str):
+        with self.db:
+            self.db.execute(f'DELETE FROM {table} WHERE name = ?', (name,))
+            self.logChanges(table, [name])
+
+    def logChanges(self, table: str, names: List[str]):
+        self.db.executemany('INSERT INTO changes (tableName, name) VALUES (?, ?)', [(table, name) for name in names])
+
+    def latestChange(self) -> int:
+        return self.db.execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0]
+
+    def changesSince(self, seq: int) -> Tuple[int, Dict[str, List[str]]]:
+        """
+        Returns the latest change number, and the names of the items in each table
+        that have been added, modified or removed after change number `seq`.
+        Whether an item was removed can be told by it no longer being in the catalog.
+        """
+        changed = {table: [] for table in catalogTables}
+        latest = seq
+        for changeSeq, table, name in self.db.execute('SELECT seq, tableName, name FROM changes WHERE seq > ? ORDER BY seq', (seq,)):
+            if name not in changed[table]: changed[table].append(name)
+            latest = changeSeq
+        return latest, changed
+
+    def listFolder(self, table: str) -> List[str]:
+        folderPath = join(self.repoPath, catalogTables[table]['folder'])
+        return listdir(folderPath) if exists(folderPath) else []
+
+    def rebuild(self):
+        """
+        Throws away everything in the catalog and reads it all again from disk.
+        """
+        with self.db:
+            for table in catalogTables:
+                self.db.execute(f'DELETE FROM {table}')
+                rows = [self.readEntry(table, name) for name in self.listFolder(table)]
+                self.writeEntries(table, [row for row in rows if row is not None])
+
+    def sync(self):
+        """
+        Brings the catalog in line with the disk, only rereading items that were added,
+        removed, or had their meta.json modified since they were cataloged.
+        """
+        with self.db:
+            for table, spec in catalogTables.items():
+                cataloged = dict(self.db.execute(f'SELECT name, metaMtime FROM {table}'))
+                onDisk = self.listFolder(table)
+
+                changed = []
+                for name in onDisk:
+                    try:
+                        metaMtime = stat(join(self.repoPath, spec['folder'], name, 'meta.json')).st_mtime_ns
+                    except OSError:
+                        metaMtime = None
+                    if name not in cataloged or cataloged[name] != metaMtime: changed.append(name)
+
+                removed = set(cataloged) - set(onDisk)
+                self.db.executemany(f'DELETE FROM {table} WHERE name = ?', [(name,) for name in removed | set(changed)])
+
+                rows = [self.readEntry(table, name) for name in changed]
+                rows = [row for row in rows if row is not None]
+                self.writeEntries(table, rows)
+
+                # Folders that aren't valid items yet are seen as changed on every sync,
+                # so only log the ones that were or now are in the catalog
+                self.logChanges(table, sorted(removed | {name for name in changed if name in cataloged} | {row[0] for row in rows}))
+
+            self.db.execute('DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?', (changeLogLength,))
+
+    def query(self, table: str, sortBy: str = None, descending: bool = True, limit: int = None, offset: int = 0) -> List[tuple]:
+        """
+        Returns (name, meta) for a page of items, sorted by one of the table's columns.
+        """
+        sortExpression = self.sortExpression(table, sortBy)
+        direction = 'DESC' if descending else 'ASC'
+        rows = self.db.execute(
+            f'SELECT name, meta FROM {table} ORDER BY {sortExpression} {direction}, name {direction} LIMIT ? OFFSET ?',
+            (-1 if limit is None else limit, offset)
+        )
+        return [(name, loads(meta)) for name, meta in rows]
+
+    def sortExpression(self, table: str, sortBy: str) -> str:
+        spec = catalogTables[table]
+        sortBy = spec['defaultSort'] if sortBy is None else sortBy
+        if sortBy not in spec['columns'] and sortBy not in extraSortKeys.get(table, {}):
+            raise ValueError(f'Cannot sort {table} by {sortBy}')
+        return extraSortKeys.get(table, {}).get(sortBy, sortBy)
+
+    def queryRows(self, table: str, limit: int = None, offset: int = 0) -> List[tuple]:
+        """
+        Returns a page of items as catalogRowTypes[table] tuples - just the name and
+        sortable columns, without the rest of the metadata - in the table's default order.
+        """
+        spec = catalogTables[table]
+        columns = ''.join(f', {column}' for column in spec['columns'])
+        rows = self.db.execute(
+            f"SELECT name{columns} FROM {table} ORDER BY {spec['defaultSort']} DESC, name DESC LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset)
+        )
+        return [catalogRowTypes[table]._make(row) for row in rows]
+
+    def getRows(self, table: str, names: List[str]) -> List[tuple]:
+        columns = ''.join(f', {column}' for column in catalogTables[table]['columns'])
+        rows = []
+        for name in names:
+            row = self.db.execute(f'SELECT name{columns} FROM {table} WHERE name = ?', (name,)).fetchone()
+            if row is not None: rows.append(catalogRowTypes[table]._make(row))
+        return rows
+
+    def get(self, table: str, name: str) -> Dict:
+        row = self.db.execute(f'SELECT meta FROM {table} WHERE name = ?', (name,)).fetchone()
+        return None if row is None else loads(row[0])
+
+# The GUI thread's open catalogs, keyed by repository path (see useCatalog())
+__mainThreadCatalogs = {}
+
+@contextmanager
+def useCatalog(repoPath: str) -> Iterator[RepoCatalog]:
+    """
+    Gives a connection to a repository's catalog for the length of a with block,
+    or None if the repository's folder doesn't exist (so there's nothing to list).
+
+    The GUI thread keeps its connection open between calls, so listing and updating a repository
+    doesn't open the database and check its version every time; closeCatalog() lets go of it.
+    SQLite connections can only be used by the thread that opened them, and nothing would close
+    one kept for a worker thread when it finishes, so other threads get a connection that's closed
+    at the end of the block.
+    """
+    if not isdir(repoPath):
+        yield None
+        return
+
+    if current_thread() is not main_thread():
+        with RepoCatalog(repoPath) as catalog: yield catalog
+        return
+
+    catalog = __mainThreadCatalogs.get(repoPath)
+    if catalog is None:
+        catalog = RepoCatalog(repoPath)
+        __mainThreadCatalogs[repoPath] = catalog
+    yield catalog
+
+def closeCatalog(repoPath: str):
+    """
+    Closes the GUI thread's connection to a repository's catalog, if it has one.
+    """
+    catalog = __mainThreadCatalogs.pop(repoPath, None)
+    if catalog is not None: catalog.close()
@@ -0,0 +1,108 @@
+from os.path import exists, join
+from PyQt6.QtCore import QFileSystemWatcher, QObject, QThreadPool, QTimer, pyqtSignal
+
+from ModelRepo import getLatestCatalogChange, getRepoMetadata
+from Threads.CatalogSyncer import CatalogSyncer
+
+class RepositoryWatcher(QObject):
+    """
+    Watches the open repository's models, datasets and generated folders and its info.json.
+    When something changes, the catalog is synced and only the rows that changed are sent out,
+    as (added or modified rows, names of removed rows).
+    Syncing happens on a pool thread (see CatalogSyncer), and one sync runs at a time.
+    """
+    modelsChanged = pyqtSignal(list, list)
+    datasetsChanged = pyqtSignal(list, list)
+    generatedChanged = pyqtSignal(list, list)
+    repoMetadataChanged = pyqtSignal(dict)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.__repoPath = None
+        self.__lastChange = 0
+        self.__repoMetadata = {}
+        self.__syncer = None
+        self.__updatePending = False
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.scheduleUpdate)
+        self.watcher.fileChanged.connect(self.scheduleUpdate)
+
+        # A training or generation run touches the repository many times in a row,
+        # so wait for things to settle before updating
+        self.updateTimer = QTimer(self, singleShot=True, interval=250)
+        self.updateTimer.timeout.connect(self.update)
+
+    def setRepository(self, repoPath: str, lastChange: int = None):
+        """
+        Starts watching a repository, or stops watching if repoPath is None.
+        Only changes after catalog change number lastChange are reported
+        (by default, changes from here on).
+        """
+        self.updateTimer.stop()
+        # A sync still running for the previous repository is ignored when it finishes
+        self.__syncer = None
+        self.__updatePending = False
+        if len(self.watcher.files()) > 0: self.watcher.removePaths(self.watcher.files())
+        if len(self.watcher.directories()) > 0: self.watcher.removePaths(self.watcher.directories())
+
+        self.__repoPath = repoPath
+        if repoPath is None: return
+
+        self.__lastChange = getLatestCatalogChange(repoPath) if lastChange is None else lastChange
+        self.__repoMetadata = getRepoMetadata(repoPath)
+        self.watchPaths()
+
+    def watchPaths(self):
+        # The folders may not exist yet, and editors often replace info.json
+        # rather than writing to it, which drops the watch - so this is redone after every update
+        paths = [self.__repoPath] + [join(self.__repoPath, folder) for folder in ['models', 'datasets', 'generated', 'info.json']]
+        watched = set(self.watcher.files() + self.watcher.directories())
+        toWatch = [path for path in paths if exists(path) and path not in watched]
+        if len(toWatch) > 0: self.watcher.addPaths(toWatch)
+
+    def scheduleUpdate(self, path: str = None):
+        self.updateTimer.start()
+
+    def update(self):
+        """
+        Sends out everything that has changed since the last update, once the catalog has synced.
+        Call this directly after something in the app has written to the repository,
+        since changes inside existing folders (e.g. a model's meta.json) aren't watched.
+        """
+        if self.__repoPath is None: return
+
+        # Changes made while a sync is running may have been missed by it, so sync again once it's done
+        if self.__syncer is not None:
+            self.__updatePending = True
+            return
+
+        syncer = CatalogSyncer(self.__repoPath, self.__lastChange)
+        syncer.signals.synced.connect(lambda latestChange, changes, repoMetadata: self.onSynced(syncer, latestChange, changes, repoMetadata))
+        syncer.signals.failed.connect(lambda: self.onSyncFailed(syncer))
+        self.__syncer = syncer
+        QThreadPool.globalInstance().start(syncer)
+
+    def onSyncFailed(self, syncer: CatalogSyncer):
+        if syncer is not self.__syncer: return
+        self.__syncer = None
+        self.__updatePending = False
+
+    def onSynced(self, syncer: CatalogSyncer, latestChange: int, changes: dict, repoMetadata: dict):
+        if syncer is not self.__syncer: return
+        self.__syncer = None
+        self.__lastChange = latestChange
+
+        for signal, table in [(self.modelsChanged, 'models'), (self.datasetsChanged, 'datasets'), (self.generatedChanged, 'generated')]:
+            rows, removed = changes[table]
+            if len(rows) > 0 or len(removed) > 0: signal.emit(rows, removed)
+
+        if repoMetadata != self.__repoMetadata:
+            self.__repoMetadata = repoMetadata
+            self.repoMetadataChanged.emit(repoMetadata)
+
+        self.watchPaths()
+
+        if self.__updatePending:
+            self.__updatePending = False
+            self.update()
@@ -0,0 +1,158 @@
+from array import array
+from collections import namedtuple
+from csv import reader
+from os import fsync
+from os.path import exists, getsize
+from struct import Struct
+from sys import byteorder
+from time import monotonic
+
+# magic, version, record size
+stepLogHeader = Struct('<4sHH')
+stepLogMagic = b'GSTP'
+stepLogVersion = 1
+
+# One fixed-size record per training step: elapsed seconds, step, loss, average loss.
+# The file is the header followed by these records, so it can also be opened with
+# numpy.memmap(path, dtype=[('elapsed', '<f8'), ('step', '<i8'), ('loss', '<f8'), ('avgLoss', '<f8')], offset=stepLogHeader.size)
+stepRecord = Struct('<dqdd')
+
+StepColumns = namedtuple('StepColumns', ['elapsed', 'step', 'loss', 'avgLoss'])
+
+# Typecode of each column, in record order
+stepColumnTypes = 'dqdd'
+
+def emptyStepColumns() -> StepColumns:
+    return StepColumns(*[array(typecode) for typecode in stepColumnTypes])
+
+def packStepRecords(columns: StepColumns, start: int = 0) -> bytes:
+    """
+    Packs the rows of `columns` from `start` on into records, a whole column at a time.
+    """
+    n = len(columns.step) - start
+    records = bytearray(n * stepRecord.size)
+    if n <= 0: return bytes(records)
+
+    fields = len(stepColumnTypes)
+    views = {typecode: memoryview(records).cast(typecode) for typecode in set(stepColumnTypes)}
+    for i, (column, typecode) in enumerate(zip(columns, stepColumnTypes)):
+        column = column[start:]
+        if byteorder == 'big': column.byteswap()
+        views[typecode][i::fields] = column
+    return bytes(records)
+
+def unpackStepRecords(records: bytes) -> StepColumns:
+    """
+    Splits packed records back into one array per column.
+    A partial record at the end, e.g. from being cut off mid-write, is ignored.
+    """
+    n = len(records) // stepRecord.size
+    records = memoryview(records)[:n * stepRecord.size]
+
+    fields = len(stepColumnTypes)
+    views = {typecode: records.cast(typecode) for typecode in set(stepColumnTypes)}
+
+    columns = []
+    for i, typecode in enumerate(stepColumnTypes):
+        column = array(typecode, bytes(n * stepRecord.size // fields))
+        memoryview(column)[:] = views[typecode][i::fields]
+        if byteorder == 'big': column.byteswap()
+        columns.append(column)
+    return StepColumns(*columns)
+
+def writeStepLog(path: str, columns: StepColumns):
+    with open(path, 'wb') as f:
+        f.write(stepLogHeader.pack(stepLogMagic, stepLogVersion, stepRecord.size))
+        f.write(packStepRecords(columns))
+
+class StepLogWriter:
+    """
+    Appends steps to a step log as training runs, so nothing is rewritten when the model saves
+    and a crash loses at most the last few steps.
+    Up to bufferSize steps are held in memory before being written, and the file is
+    fsynced at least every syncInterval seconds, as well as on sync() and close().
+    """
+    def __init__(self, path: str, bufferSize: int = 256, syncInterval: float = 30.0):
+        self.path = path
+        self.bufferSize = bufferSize
+        self.syncInterval = syncInterval
+        self.buffer = bytearray()
+        self.bufferedSteps = 0
+        self.lastSync = monotonic()
+
+        self.f = open(path, 'ab')
+        size = getsize(path)
+        if size < stepLogHeader.size:
+            # Empty, or cut off before the header was all written
+            self.f.truncate(0)
+            self.f.write(stepLogHeader.pack(stepLogMagic, stepLogVersion, stepRecord.size))
+        else:
+            # Drop a step that was cut off mid-write, so new steps line up with the records
+            self.f.truncate(size - (size - stepLogHeader.size) % stepRecord.size)
+
+    def append(self, elapsed: float, step: int, loss: float, avgLoss: float):
+        self.buffer += stepRecord.pack(elapsed, step, loss, avgLoss)
+        self.bufferedSteps += 1
+
+        if monotonic() - self.lastSync >= self.syncInterval: self.sync()
+        elif self.bufferedSteps >= self.bufferSize: self.flush()
+
+    def flush(self):
+        """
+        Hands the buffered steps to the OS. They survive the app crashing, but not the machine.
+        """
+        if self.bufferedSteps > 0:
+            self.f.write(self.buffer)
+            self.buffer = bytearray()
+            self.bufferedSteps = 0
+        self.f.flush()
+
+    def sync(self):
+        """
+        Writes the buffered steps and waits for them to reach the disk.
+        """
+        self.flush()
+        fsync(self.f.fileno())
+        self.lastSync = monotonic()
+
+    def close(self):
+        if self.f.closed: return
+        self.sync()
+        self.f.close()
+
+    def __enter__(self): return self
+    def __exit__(self, *args): self.close()
+
+def loadStepLog(path: str) -> StepColumns:
+    """
+    Reads a step log written by writeStepLog(). Returns None if it's missing or not a step log.
+    """
+    if not exists(path): return None
+
+    with open(path, 'rb') as f:
+        try:
+            magic, version, recordSize = stepLogHeader.unpack(f.read(stepLogHeader.size))
+        except Exception:
+            return None
+
+        if magic != stepLogMagic or version != stepLogVersion or recordSize != stepRecord.size: return None
+        return unpackStepRecords(f.read())
+
+def loadStepCsv(path: str) -> StepColumns:
+    """
+    Reads the steps.csv that models saved before step logs existed.
+    """
+    if not exists(path): return None
+
+    columns = emptyStepColumns()
+    with open(path, encoding='utf-8', newline='') as f:
+        r = reader(f)
+        for row in r:
+            try:
+                values = (float(row[0]), int(row[1]), float(row[2]), float(row[3]))
+            except IndexError:
+                continue
+
+            for column, value in zip(columns, values): column.append(value)
+
+    return columns
@@ -0,0 +1,190 @@
+from multiprocessing import get_context
+from os import cpu_count, environ
+from time import perf_counter
+from typing import Callable, Dict, List, Tuple
+
+# Only some platforms (e.g. Linux) let a process pick its cores
+try:
+    from os import sched_getaffinity, sched_setaffinity
+except ImportError:
+    sched_getaffinity = sched_setaffinity = None
+
+# Kinds of job that get their own thread settings, since training is throughput-bound
+# and generation mostly runs small batches where extra threads stop paying off sooner
+jobKinds = ['training', 'generation']
+
+# Seconds each thread count is timed for during calibration
+calibrationSeconds = 1.0
+
+def intraOpCandidates() -> List[int]:
+    """
+    Thread counts tried for work within an operation: powers of two up to the number of cores, and the number of cores.
+    """
+    cores = cpu_count() or 1
+    candidates = {cores}
+    n = 1
+    while n < cores:
+        candidates.add(n)
+        n *= 2
+    return sorted(candidates)
+
+def interOpCandidates() -> List[int]:
+    """
+    Thread counts tried for running independent operations at once. GPT-2's layers run
+    one after another, so only a few are worth trying.
+    """
+    return [n for n in [1, 2, 4] if n <= (cpu_count() or 1)]
+
+def makeWorkload(kind: str) -> Callable[[], None]:
+    """
+    Returns one step of a small GPT-2-shaped transformer: forward and backward over a batch for training,
+    and a forward pass over a single short sequence for generation.
+    """
+    import torch
+
+    torch.manual_seed(0)
+    layer = torch.nn.TransformerEncoderLayer(d_model=256, nhead=4, dim_feedforward=1024, batch_first=True)
+
+    if kind == 'training':
+        x = torch.randn(8, 128, 256)
+        optimizer = torch.optim.SGD(layer.parameters(), lr=0.001)
+
+        def step():
+            optimizer.zero_grad()
+            layer(x).sum().backward()
+            optimizer.step()
+        return step
+
+    layer.eval()
+    x = torch.randn(1, 32, 256)
+
+    def step():
+        with torch.no_grad(): layer(x)
+    return step
+
+def timeIntraOpCandidates(kind: str, interOp: int, candidates: List[int]) -> Dict[int, float]:
+    """
+    Runs in a fresh process, since torch only lets the inter-op thread count be set once.
+    Returns the seconds per step for each intra-op thread count.
+    """
+    import torch
+    torch.set_num_interop_threads(interOp)
+
+    step = makeWorkload(kind)
+    timings = {}
+    for intraOp in candidates:
+        torch.set_num_threads(intraOp)
+        step()
+
+        steps, start = 0, perf_counter()
+        while perf_counter() - start < calibrationSeconds:
+            step()
+            steps += 1
+        timings[intraOp] = (perf_counter() - start) / steps
+
+    return timings
+
+def calibrateThreads(kind: str, progress: Callable[[int, int], None] = None) -> Tuple[int, int]:
+    """
+    Times a short workload for `kind` (training or generation) with each combination of
+    thread counts, and returns the fastest as (intra-op threads, inter-op threads).
+    progress, if given, is called with (combinations timed, total combinations).
+    """
+    intraOps, interOps = intraOpCandidates(), interOpCandidates()
+    total = len(intraOps) * len(interOps)
+
+    best, bestTime = (1, 1), None
+    context = get_context('spawn')
+    for i, interOp in enumerate(interOps):
+        with context.Pool(1) as pool:
+            timings = pool.apply(timeIntraOpCandidates, (kind, interOp, intraOps))
+
+        for intraOp, seconds in timings.items():
+            if bestTime is None or seconds < bestTime:
+                best, bestTime = (intraOp, interOp), seconds
+
+        if progress is not None: progress((i + 1) * len(intraOps), total)
+
+    return best
+
+def applyThreadSettings(threads: Tuple[int, int]):
+    """
+    Applies (intra-op threads, inter-op threads) to torch, as a job starts. torch's thread counts
+    are process-wide, not per thread: a training job runs in its own process, so they're its own,
+    but generation runs in the app's process, so they apply to everything using torch there until changed.
+    The inter-op count can only be set once per process, so only the first call's is used. None leaves torch's defaults.
+    """
+    import torch
+
+    # Tokenizers would otherwise start their own thread pool on top of torch's
+    environ['TOKENIZERS_PARALLELISM'] = 'false'
+
+    if threads is None: return
+    intraOp, interOp = threads
+
+    torch.set_num_threads(intraOp)
+    try:
+        torch.set_num_interop_threads(interOp)
+    except RuntimeError:
+        pass
+
+def availableCores() -> List[int]:
+    """
+    Returns the CPU cores this process may run on.
+    """
+    if sched_getaffinity is not None: return sorted(sched_getaffinity(0))
+    return list(range(cpu_count() or 1))
+
+def partitionCores(slots: int, cores: List[int] = None) -> List[List[int]]:
+    """
+    Splits `cores` (by default, the available cores) into `slots` groups of (nearly) equal size, one per job that runs at once,
+    so concurrent jobs don't fight over the same cores. With more slots than cores, cores are shared.
+    """
+    if cores is None: cores = availableCores()
+    slots = max(1, slots)
+    if slots > len(cores): return [[cores[i % len(cores)]] for i in range(slots)]
+
+    size, extra = divmod(len(cores), slots)
+    groups, start = [], 0
+    for i in range(slots):
+        end = start + size + (1 if i < extra else 0)
+        groups.append(cores[start:end])
+        start = end
+    return groups
+
+def allocateCores(slots: int, heldCores: List[List[int]]) -> List[int]:
+    """
+    Picks the cores for a job starting alongside jobs that hold `heldCores`, one list per running job,
+    out of `slots` jobs at once. The cores no running job holds are shared out among the slots still free,
+    so the running jobs keep theirs even if `slots` has changed since they started.
+    Only once every core is held does the new job share the least used ones.
+    """
+    cores = availableCores()
+    held = [core for jobCores in heldCores for core in jobCores]
+    freeCores = [core for core in cores if core not in held]
+    freeSlots = max(1, slots - len(heldCores))
+
+    if len(freeCores) > 0: return partitionCores(freeSlots, freeCores)[0]
+
+    share = max(1, len(cores) // max(1, slots))
+    return sorted(sorted(cores, key=lambda core: (held.count(core), core))[:share])
+
+def fitThreadsToCores(threads: Tuple[int, int], cores: List[int]) -> Tuple[int, int]:
+    """
+    Caps (intra-op threads, inter-op threads) to a job's share of the cores.
+    Without calibrated settings the job gets one thread per core.
+    """
+    if threads is None: return len(cores), 1
+    intraOp, interOp = threads
+    return max(1, min(intraOp, len(cores))), max(1, min(interOp, len(cores)))
+
+def applyCoreAffinity(cores: List[int]):
+    """
+    Keeps this process on `cores`. Only some platforms (e.g. Linux) support this; elsewhere, and for None, it does nothing
+    and the job relies on its thread counts alone.
+    """
+    if cores is None or sched_setaffinity is None: return
+    try:
+        sched_setaffinity(0, cores)
+    except OSError as e:
+        print(f'Couldn\'t set CPU affinity to {cores}: {e}')
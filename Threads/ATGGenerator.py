@@ -1,22 +1,21 @@
+from contextlib import ExitStack
 from datetime import datetime
 from difflib import SequenceMatcher
 from json import dump, load
 from typing import List
 from PyQt6.QtCore import QThread, pyqtSignal
-from os.path import join, exists
+from os.path import basename, join, exists
 from os import mkdir
-from os import environ
 
-from ModelRepo import getDatasetsInRepository, processGeneratedSamples
+from ModelRepo import SampleMatcher, getDatasetsInRepository, loadJsonFile, processGeneratedSamples, updateCatalog
+from ThreadTuning import applyThreadSettings
 
 # TODO: top_p and top_k
 
-environ["TOKENIZERS_PARALLELISM"] = "false"
-environ["OMP_NUM_THREADS"] = "1"
-
 class ATGGenerator(QThread):
     processingStarted = pyqtSignal()
     processingFinished = pyqtSignal(list)
+    sampleProcessed = pyqtSignal(int, dict)
 
     def __init__(self, parent=None, repoName=None):
         super().__init__(parent)
@@ -58,26 +57,50 @@ class ATGGenerator(QThread):
     def checkAgainstDatasets(self) -> bool: return self.__checkAgainstDatasets
     def setCheckAgainstDatasets(self, check: bool): self.__checkAgainstDatasets = check
 
+    __matchWorkers: int = 1
+    def matchWorkers(self) -> int: return self.__matchWorkers
+    def setMatchWorkers(self, workers: int): self.__matchWorkers = workers
+
+    __matchMode: str = 'longest'
+    def matchMode(self) -> str: return self.__matchMode
+    def setMatchMode(self, mode: str): self.__matchMode = mode
+
+    __minSpanLength: int = 16
+    def minSpanLength(self) -> int: return self.__minSpanLength
+    def setMinSpanLength(self, length: int): self.__minSpanLength = length
+
+    __streamResults: bool = False
+    def streamResults(self) -> bool: return self.__streamResults
+    def setStreamResults(self, stream: bool): self.__streamResults = stream
+
+    __streamBatchSize: int = 1
+    def streamBatchSize(self) -> int: return self.__streamBatchSize
+    def setStreamBatchSize(self, batchSize: int): self.__streamBatchSize = max(1, batchSize)
+
+    # (intra-op threads, inter-op threads) for torch, or None for its defaults
+    __threads = None
+    def threads(self) -> tuple: return self.__threads
+    def setThreads(self, threads: tuple): self.__threads = threads
+
     def run(self):
         from aitextgen_dev.aitextgen.utils import GPT2ConfigCPU
         from aitextgen_dev.aitextgen import aitextgen
 
+        applyThreadSettings(self.threads())
+
         repoFolderPath = self.__repoName
 
         # Get the latest model folder path
         infoFilePath = join(repoFolderPath, 'info.json')
 
-        jsonInfo: dict = {}
-        with open(infoFilePath, encoding='utf-8') as f:
-            jsonInfo = load(f)
+        jsonInfo: dict = loadJsonFile(infoFilePath)
 
         latestModelName = jsonInfo.get('latest')
         latestModelPath = join(repoFolderPath, 'models', latestModelName)
 
         # Find out what dataset this model was finetuned on, and grab its tokenizer
         latestModelMetaPath = join(latestModelPath, 'meta.json')
-        with open(latestModelMetaPath, encoding='utf-8') as f:
-            modelMeta = load(f)
+        modelMeta = loadJsonFile(latestModelMetaPath)
 
         datasetName = modelMeta['dataset']
 
@@ -94,8 +117,18 @@ class ATGGenerator(QThread):
             # config=GPT2ConfigCPU()
         )
 
-        self.samples = self.ai.generate(
-            n=self.n(),
+        generatedSubfolderPath = self.makeOutputFolder(repoFolderPath)
+
+        if self.streamResults():
+            self.runStreaming(generatedSubfolderPath)
+        else:
+            self.runBatch(generatedSubfolderPath)
+
+        updateCatalog(repoFolderPath, 'generated', basename(generatedSubfolderPath))
+
+    def generate(self, n: int, seed: int) -> List[str]:
+        return self.ai.generate(
+            n=n,
             prompt=self.prompt(),
             min_length=self.minLength(),
             max_length=self.maxLength(),
@@ -103,15 +136,77 @@ class ATGGenerator(QThread):
             return_as_list=True,
             top_k=self.topK(),
             top_p=self.topP(),
-            seed=self.seed()
+            seed=seed
         )
 
+    def processSamples(self, samples: List[str], workers: int) -> List[dict]:
+        return processGeneratedSamples(self.__repoName, samples, self.prompt(), self.checkAgainstDatasets(), workers, self.matchMode(), self.minSpanLength())
+
+    def runBatch(self, generatedSubfolderPath: str):
+        self.samples = self.generate(self.n(), self.seed())
+
         self.processingStarted.emit()
 
         print(f'{datetime.now()} - Processing started')
-        self.samplesWithDatasetMatches = processGeneratedSamples(self.__repoName, self.samples, self.prompt(), self.checkAgainstDatasets())
+        self.samplesWithDatasetMatches = self.processSamples(self.samples, self.matchWorkers())
         print(f'{datetime.now()} - Processing complete')
 
+        dataJsonPath = join(generatedSubfolderPath, 'texts.json')
+        with open(dataJsonPath, 'w', encoding='utf-8') as f:
+            dump(self.samplesWithDatasetMatches, f, indent=4)
+
+        print(f'{datetime.now()} - Generation data saved')
+        self.processingFinished.emit(self.samplesWithDatasetMatches)
+
+    def runStreaming(self, generatedSubfolderPath: str):
+        """
+        Generates samples a mini-batch at a time, checking and saving each sample
+        as soon as it exists. texts.json is written as a JSON array one item at a
+        time, so it is readable as far as it got even if generation is aborted.
+        The datasets' indexes and the result cache are opened once for the whole run.
+        """
+        from transformers import set_seed
+
+        self.samplesWithDatasetMatches = []
+
+        # Seeded once for the whole run rather than per batch, so every batch carries on from the same random state.
+        # Samples in a batch are drawn together, so a seed gives the same samples for the same batch size (saved in meta.json).
+        # Like aitextgen, a seed of 0 means no seed
+        if self.seed(): set_seed(self.seed())
+
+        dataJsonPath = join(generatedSubfolderPath, 'texts.json')
+        with ExitStack() as stack:
+            matcher = None
+            if self.checkAgainstDatasets():
+                matcher = stack.enter_context(SampleMatcher(self.__repoName, self.prompt(), self.matchMode(), self.minSpanLength()))
+
+            f = stack.enter_context(open(dataJsonPath, 'w', encoding='utf-8'))
+            f.write('[')
+
+            while len(self.samplesWithDatasetMatches) < self.n():
+                batchSize = min(self.streamBatchSize(), self.n() - len(self.samplesWithDatasetMatches))
+                samples = self.generate(batchSize, None)
+
+                # A mini-batch is too small to be worth spreading across processes
+                for sample in samples:
+                    processed = matcher.match([sample])[0] if matcher is not None else {'text': sample, 'datasetMatches': None}
+                    index = len(self.samplesWithDatasetMatches)
+                    self.samplesWithDatasetMatches.append(processed)
+
+                    if index > 0: f.write(',')
+                    f.write('\n')
+                    dump(processed, f, indent=4)
+                    f.flush()
+
+                    self.sampleProcessed.emit(index, processed)
+
+            f.write('\n]')
+
+        self.samples = [i['text'] for i in self.samplesWithDatasetMatches]
+        print(f'{datetime.now()} - Generation data saved')
+        self.processingFinished.emit(self.samplesWithDatasetMatches)
+
+    def makeOutputFolder(self, repoFolderPath: str) -> str:
         # make generated folder
         generatedFolderPath = join(repoFolderPath, 'generated')
         if not exists(generatedFolderPath): mkdir(generatedFolderPath)
@@ -132,14 +227,10 @@ class ATGGenerator(QThread):
                 'topP': self.topP(),
                 'topK': self.topK(),
                 'seed': self.seed(),
+                'matchMode': self.matchMode(),
+                'minSpanLength': self.minSpanLength(),
+                'streamBatchSize': self.streamBatchSize() if self.streamResults() else None,
                 'datetime': datetime.now().isoformat(timespec='seconds')
             }, f, indent=4)
 
-        dataJsonPath = join(generatedSubfolderPath, 'texts.json')
-        with open(dataJsonPath, 'w', encoding='utf-8') as f:
-            dump(self.samplesWithDatasetMatches, f, indent=4)
-
-        print(f'{datetime.now()} - Generation data saved')
-        self.processingFinished.emit(self.samplesWithDatasetMatches)
-        
-
+        return generatedSubfolderPath
@@ -1,12 +1,14 @@
-import csv
 from json.decoder import JSONDecodeError
+from multiprocessing import Pipe, get_context
+from os import makedirs, mkdir
 from os.path import exists, join
-from PyQt6.QtCore import QThread, QTimer, pyqtSignal
+from PyQt6.QtCore import Qt, QThread, QTimer, pyqtSignal
 from datetime import datetime, timedelta
-from os import environ
 from json import dump, load
 
-from ModelRepo import getRepoHeadModel
+from ModelRepo import appendModelSampleLog, getRepoHeadModel, invalidateCachedFile, updateCatalog
+from Threads.SampleChecker import SampleChecker
+from Threads.TrainingProcess import runTraining
 
 canDoNotifications = True
 try:
@@ -17,15 +19,27 @@ except ImportError as e:
     canDoNotifications = False
 
 
-environ["TOKENIZERS_PARALLELISM"] = "false"
-environ["OMP_NUM_THREADS"] = "1"
-        
+class TrainingProcessError(Exception):
+    """
+    Training failed in the training process. The message holds its traceback.
+    """
+    pass
+
 class ATGTrainer(QThread):
+    """
+    Runs a training session in its own process (see Threads/TrainingProcess.py), so training
+    doesn't hold the GIL the UI needs and a crash in training doesn't take down the app.
+    This thread relays the process's events to the signals below, checks samples as they
+    come in and saves the model's metadata each time the process saves the model.
+    Samples and their matches are appended to the model's sample log as they come in, rather than saved with the metadata.
+    """
     trainingStarted = pyqtSignal()
     trainingEnded = pyqtSignal()
     batchEnded = pyqtSignal(int, int, float, float)
     sampleTextGenerated = pyqtSignal(int, list)
+    samplesChecked = pyqtSignal(int, list)
     modelSaved = pyqtSignal(int, int, str)
+    modelFolderCreated = pyqtSignal(str)
     errorOccurred = pyqtSignal(Exception)
     stopTriggered = pyqtSignal()
 
@@ -37,7 +51,7 @@ class ATGTrainer(QThread):
 
     __samples = {}
 
-    __dataRows = []
+    __latestModel = None
 
     __avgLoss = None
 
@@ -50,6 +64,11 @@ class ATGTrainer(QThread):
         self.timePassedTimer.setInterval(1000)
         self.timePassedTimer.timeout.connect(self.onTimePassed)
 
+        self.sampleChecker = None
+        self.__control = None
+        self.__process = None
+        self.startTime = datetime.now()
+
         self.trainingStarted.connect(self.onTrainingStarted_main)
         self.trainingEnded.connect(self.onTrainingEnded_main)
 
@@ -58,15 +77,30 @@ class ATGTrainer(QThread):
 
     def currentStep(self) -> int: return self.__currentStep
 
+    # Configs saved before these were settable trained one sample at a time
+    def batchSize(self) -> int: return self.__config.get('batchSize', 1)
+    def gradientAccumulation(self) -> int: return self.__config.get('gradientAccumulation', 1)
+    def samplesPerStep(self) -> int: return self.batchSize() * self.gradientAccumulation()
+
     def trainingSamples(self) -> dict: return self.__samples
 
     def triggerStop(self):
         self.__shouldStop = True
+        if self.__control is not None:
+            try:
+                self.__control.send(('stop',))
+            except (BrokenPipeError, OSError):
+                pass
         self.stopTriggered.emit()
 
+    def killProcess(self):
+        """
+        Ends the training process straight away, without saving. Only for when the app is quitting.
+        """
+        if self.__process is not None and self.__process.is_alive(): self.__process.kill()
+
     def onTrainingStarted_main(self):
         print('training started was emitted')
-        self.startTime = datetime.now()
         self.timePassedTimer.start()
 
     def onTrainingEnded_main(self):
@@ -77,107 +111,144 @@ class ATGTrainer(QThread):
         elapsed = currentTime - self.startTime
         self.timePassed.emit(elapsed)
 
-    def run(self):
-        from aitextgen_dev.aitextgen.utils import GPT2Config
-        from aitextgen_dev.aitextgen import aitextgen
-
-        self.__shouldStop = False
-        self.__dataRows = []
-
+    def makeJob(self) -> dict:
+        """
+        Works out everything the training process needs, as plain values it can be sent,
+        and creates the new model's folder.
+        If the config has a 'parentModel', it's used rather than the repository's current head model,
+        so a restarted job trains from the same model it did the first time.
+        """
         dataset = self.__config['dataset']
-        steps = self.__config['steps']
-        genEvery = self.__config['genEvery']
-        saveEvery = self.__config['saveEvery']
-        learningRate = self.__config['learningRate']
-
-        if self.__config['constructorArgs'] is None: aitextgenArgs = {}
-        else: aitextgenArgs = self.__config['constructorArgs']
-
-        # Find the most recent model
         repoFolderPath = self.__repoName
 
-        # Find dataset information
-        datasetFolderPath = join(repoFolderPath, 'datasets', dataset['pathName'])
-        datasetFilePath = join(datasetFolderPath, 'dataset')
-        datasetTokenizerFilePath = join(datasetFolderPath, 'aitextgen.tokenizer.json')
-        datasetMetadata: dict = dataset['meta']
+        if self.__config['constructorArgs'] is None: aitextgenArgs = {}
+        else: aitextgenArgs = dict(self.__config['constructorArgs'])
 
         modelsFolderPath = join(repoFolderPath, 'models')
 
+        # Find the most recent model
         self.__infoFilePath = join(repoFolderPath, 'info.json')
-        
-        if exists(self.__infoFilePath):
-            try:
-                self.__latestModel = getRepoHeadModel(repoFolderPath)
-            except JSONDecodeError as e:
-                self.errorOccurred.emit(e)
-                return
-            except IOError as e:
-                self.errorOccurred.emit(e)
-                return
+        if 'parentModel' in self.__config:
+            self.__latestModel = self.__config['parentModel']
+        elif exists(self.__infoFilePath):
+            self.__latestModel = getRepoHeadModel(repoFolderPath)
 
-        if '__useHeadModel' in aitextgenArgs and self.__latestModel is not None:
-            # There is a latest model, so let's use it as a base
-            latestModelPath = join(modelsFolderPath, self.__latestModel)
-            aitextgenArgs['model_folder'] = latestModelPath
-            print(f'Using head model {latestModelPath} as base')
+        if '__useHeadModel' in aitextgenArgs:
             del aitextgenArgs['__useHeadModel']
+            if self.__latestModel is not None:
+                # There is a latest model, so let's use it as a base
+                latestModelPath = join(modelsFolderPath, self.__latestModel)
+                aitextgenArgs['model_folder'] = latestModelPath
+                print(f'Using head model {latestModelPath} as base')
 
-        if len(aitextgenArgs) == 0:
-            # There are no arguments being passed to aitextgen.
-            # This means we want to create a model from scratch.
-            print('No base model provided, so training from scratch')
-            aitextgenArgs['config'] = GPT2Config()
-            aitextgenArgs['tokenizer_file'] = datasetTokenizerFilePath
+        # Copy the "latest" folder to a new folder
+        # yyyy-mm-ddThh-mm-ss, with a suffix if another job started training in the same second
+        makedirs(modelsFolderPath, exist_ok=True)
+        timestamp = datetime.strftime(datetime.now(), '%Y-%m-%dT%H-%M-%S')
+        suffix = 1
+        while True:
+            self.__modelName = timestamp if suffix == 1 else f'{timestamp}-{suffix}'
+            self.__fullModelPath = join(modelsFolderPath, self.__modelName)
+            try:
+                # Creating the folder claims the name, so two trainers can't both pick it
+                mkdir(self.__fullModelPath)
+                break
+            except FileExistsError:
+                suffix += 1
+
+        return {
+            'repoPath': repoFolderPath,
+            'datasetName': dataset['pathName'],
+            'tokenizerPath': join(repoFolderPath, 'datasets', dataset['pathName'], 'aitextgen.tokenizer.json'),
+            'lineByLine': dataset['meta'].get('lineByLine', False),
+            'aitextgenArgs': aitextgenArgs,
+            'modelPath': self.__fullModelPath,
+            'steps': self.__config['steps'],
+            'genEvery': self.__config['genEvery'],
+            'saveEvery': self.__config['saveEvery'],
+            'learningRate': self.__config['learningRate'],
+            'batchSize': self.batchSize(),
+            'gradientAccumulation': self.gradientAccumulation(),
+            'threads': self.__config.get('threads'),
+            'cores': self.__config.get('cores')
+        }
 
-        print(f'arguments to aitextgen constructor: {aitextgenArgs}')
+    def run(self):
+        self.__shouldStop = False
+        self.__currentStep = 0
+        self.__samples = {}
 
         try:
-            self.ai = aitextgen(**aitextgenArgs)
-        except Exception as e:
+            job = self.makeJob()
+        except (IOError, JSONDecodeError) as e:
             self.errorOccurred.emit(e)
             return
-
-        callbacks = {
-            'on_train_start': self.onTrainingStarted,
-            'on_train_end': self.onTrainingEnded,
-            'on_batch_end': self.onBatchEnded,
-            'on_sample_text_generated': self.onSampleTextGenerated,
-            'on_model_saved': self.onModelSaved
-        }
-
-        # Copy the "latest" folder to a new folder
-        # yyyy-mm-ddThh-mm-ss
-        self.__modelName = datetime.strftime(datetime.now(), '%Y-%m-%dT%H-%M-%S')
-        self.__fullModelPath = join(modelsFolderPath, self.__modelName)
-
-        trainArgs = {
-            'train_data': datasetFilePath,
-            'line_by_line': datasetMetadata.get('lineByLine', False),
-            'from_cache': False,
-            'num_steps': steps,
-            'generate_every': genEvery,
-            'save_every': saveEvery,
-            'learning_rate': learningRate,
-            'fp16': False,
-            'batch_size': 1,
-            'progress_bar_refresh_rate': 1,
-            'output_dir': self.__fullModelPath,
-            'callbacks': callbacks
+        self.modelFolderCreated.emit(self.__modelName)
+
+        # Samples are checked for memorization on their own thread as they come in
+        self.sampleChecker = SampleChecker(None, self.__repoName, job['datasetName'])
+        self.sampleChecker.samplesChecked.connect(self.samplesChecked)
+        # Logged on the checker's thread, so the last results are written even if this object is deleted before they'd arrive
+        self.sampleChecker.samplesChecked.connect(self.onSamplesChecked, Qt.ConnectionType.DirectConnection)
+        self.sampleChecker.start()
+
+        # Events come back over one pipe and stop requests go out over another,
+        # so this thread can wait on events while the UI sends a stop
+        events, childEvents = Pipe(duplex=False)
+        childControl, control = Pipe(duplex=False)
+        process = get_context('spawn').Process(target=runTraining, args=(job, childEvents, childControl), daemon=True)
+        process.start()
+        self.__process = process
+
+        # Only the process's copies should stay open, so its exiting shows up as the end of the pipe
+        childEvents.close()
+        childControl.close()
+        self.__control = control
+        if self.__shouldStop: control.send(('stop',))
+
+        handlers = {
+            'started': self.onTrainingStarted,
+            'batch': self.onBatchEnded,
+            'samples': self.onSampleTextGenerated,
+            'saved': self.onModelSaved,
+            'ended': self.onTrainingEnded
         }
 
-        print(f'arguments to train: {trainArgs}')
-
-        try:
-            self.ai.train(**trainArgs)
-        except Exception as e:
-            self.errorOccurred.emit(e)
+        error = None
+        while True:
+            try:
+                event = events.recv()
+            except EOFError:
+                error = 'The training process stopped unexpectedly.'
+                break
+
+            kind, args = event[0], event[1:]
+            if kind == 'finished': break
+            if kind == 'error':
+                error = args[0]
+                break
+            handlers[kind](*args)
+
+        process.join()
+        events.close()
+        control.close()
+        self.__control = None
+        self.__process = None
+
+        # Let the last samples finish being checked, so their results are saved too
+        self.sampleChecker.finish()
+        self.sampleChecker.wait()
+
+        if error is not None:
+            if process.exitcode not in (0, None): error += f' (exit code {process.exitcode})'
+            self.errorOccurred.emit(TrainingProcessError(error))
             return
 
         # Write hp.json with hyperparameters
         self.saveModelMetadata()
 
     def onTrainingStarted(self):
+        self.startTime = datetime.now()
         self.trainingStarted.emit()
 
     def onTrainingEnded(self):
@@ -189,29 +260,33 @@ class ATGTrainer(QThread):
             ).exec()
         self.trainingEnded.emit()
 
-    def onBatchEnded(self, steps, total, loss, avg_loss, trainer):
+    def onBatchEnded(self, steps, total, loss, avg_loss):
         # print(f"Step {steps}/{total} - loss {loss} and avg {avg_loss}")
         self.__currentStep = steps
         self.__avgLoss = avg_loss
-
-        currentTime = datetime.now()
-        elapsed = currentTime - self.startTime
-        row = [elapsed.total_seconds(), steps, loss, avg_loss]
-        self.__dataRows.append(row)
-
-        trainer.should_stop = self.__shouldStop
-
         self.batchEnded.emit(steps, total, loss, avg_loss)
 
-    def onSampleTextGenerated(self, texts):
+    def onSampleTextGenerated(self, steps, texts):
         if canDoNotifications:
             QMacNotification(
-                title=f'{self.currentStep()} steps reached',
+                title=f'{steps} steps reached',
                 body=f'Sample texts have been generated - average loss {self.__avgLoss:.2f}'
             ).exec()
 
-        self.__samples[str(self.currentStep())] = texts
-        self.sampleTextGenerated.emit(self.currentStep(), texts)
+        self.__samples[str(steps)] = texts
+        self.logSamples({'step': steps, 'samples': texts})
+        self.sampleChecker.addSamples(steps, texts)
+        self.sampleTextGenerated.emit(steps, texts)
+
+    def onSamplesChecked(self, steps, matches):
+        self.logSamples({'step': steps, 'sampleMatches': matches})
+
+    def logSamples(self, record: dict):
+        try:
+            appendModelSampleLog(self.__fullModelPath, record)
+        except IOError as e:
+            # Losing a sample shouldn't stop training
+            print(f'Could not save samples from step {record["step"]}: {e}')
 
     def onModelSaved(self, steps, total, dir):
         if canDoNotifications:
@@ -234,8 +309,9 @@ class ATGTrainer(QThread):
             'dataset': self.__config['dataset'].get('pathName', None),
             'parent': self.__latestModel,
             'learningRate': self.__config['learningRate'],
-            'steps': self.currentStep(),
-            'samples': self.trainingSamples()
+            'batchSize': self.batchSize(),
+            'gradientAccumulation': self.gradientAccumulation(),
+            'steps': self.currentStep()
             }
 
         try:
@@ -244,19 +320,13 @@ class ATGTrainer(QThread):
             self.errorOccurred.emit(e)
             return
 
-        # Save step data
-        stepFilePath = join(self.__fullModelPath, 'steps.csv')
-
-        try:
-            with open(stepFilePath, 'w', encoding='utf-8', newline='') as f:
-                csv.writer(f).writerows(self.__dataRows)
-        except IOError as e:
-            self.errorOccurred.emit(e)
-            return
+        invalidateCachedFile(hpFilePath)
+        updateCatalog(self.__repoName, 'models', self.__modelName)
 
         # Update info.json with new latest model
+        # (after the first save this model is already the latest, so there's nothing to write)
         newInfoJson = {'latest': self.__modelName}
-        if exists(self.__infoFilePath):
+        if exists(self.__infoFilePath) and getRepoHeadModel(self.__repoName) != self.__modelName:
             try:            
                 f = open(self.__infoFilePath, 'r', encoding='utf-8')
                 try:
@@ -269,6 +339,7 @@ class ATGTrainer(QThread):
                 f = open(self.__infoFilePath, 'w', encoding='utf-8')
                 dump(newInfoJson, f)
                 f.close()
+                invalidateCachedFile(self.__infoFilePath)
 
             except IOError as e:
                 self.errorOccurred.emit(e)
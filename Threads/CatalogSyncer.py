@@ -0,0 +1,32 @@
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+from ModelRepo import getCatalogChanges, getRepoMetadata, syncCatalog
+
+class CatalogSyncerSignals(QObject):
+    synced = pyqtSignal(int, dict, dict)
+    failed = pyqtSignal()
+
+class CatalogSyncer(QRunnable):
+    """
+    Syncs a repository's catalog on a QThreadPool thread, so a large or slow repository doesn't hold up the UI.
+    synced gives the latest change number, the changes after change number sinceChange
+    (as from getCatalogChanges()) and the repository's metadata. failed is sent instead if the sync fails.
+    """
+    def __init__(self, repoPath: str, sinceChange: int):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.repoPath = repoPath
+        self.sinceChange = sinceChange
+        self.signals = CatalogSyncerSignals()
+
+    def run(self):
+        try:
+            syncCatalog(self.repoPath)
+            latestChange, changes = getCatalogChanges(self.repoPath, self.sinceChange)
+            repoMetadata = getRepoMetadata(self.repoPath)
+        except Exception as e:
+            print(f'Could not sync the catalog of {self.repoPath}: {e}')
+            self.signals.failed.emit()
+            return
+
+        self.signals.synced.emit(latestChange, changes, repoMetadata)
@@ -5,6 +5,10 @@ from PyQt6.QtCore import QThread
 from datetime import datetime
 from json import dump
 
+from Matching.SuffixArray import writeSuffixArray
+from ModelRepo import updateCatalog
+from TokenCache import defaultBlockSize, loadTrainingTokenizer, writeTokenCache
+
 class BaseDatasetBuilder(QThread):
     def __init__(self, parent=None, repoName=None):
         super().__init__(parent)
@@ -44,16 +48,32 @@ class BaseDatasetBuilder(QThread):
         from aitextgen_dev.aitextgen.tokenizers import train_tokenizer
         train_tokenizer(self.thisDatasetFileDestPath, save_path=self.thisDatasetFolderPath)
 
+    def writeMatchIndex(self):
+        # Index the dataset for checking generated samples against it,
+        # so that generation doesn't have to do it every time.
+        # Only the suffix array is made now, since training checks its samples with it -
+        # the indexes for the other match modes are made the first time a generation uses them
+        writeSuffixArray(self.thisDatasetFileDestPath, join(self.thisDatasetFolderPath, 'matchindex.bin'))
+
+    def writeTokenCache(self):
+        # Encode the dataset for training now, so training a new model on it can start straight away
+        tokenizer = loadTrainingTokenizer(join(self.thisDatasetFolderPath, 'aitextgen.tokenizer.json'))
+        writeTokenCache(self.repoFolderPath, self.currentTimeStr, tokenizer, self.lineByLine(), defaultBlockSize)
+
     def writeMetadata(self, extraMetadata: dict):
         # Make meta json
         metaJson = {'title': self.title(), 'comment': self.comment(), 'lineByLine': self.lineByLine(), 'imported': self.currentTime.isoformat(timespec='seconds')} | extraMetadata
         metaJsonFilePath = join(self.thisDatasetFolderPath, 'meta.json')
         with open(metaJsonFilePath, 'w', encoding='utf-8') as f: dump(metaJson, f)
 
+        updateCatalog(self.repoFolderPath, 'datasets', self.currentTimeStr)
+
     def run(self):
         self.initialize()
         extraMetadata = self.createDataset()
         self.writeTokenizer()
+        self.writeTokenCache()
+        self.writeMatchIndex()
         self.writeMetadata(extraMetadata)
 
     def createDataset(self) -> dict:
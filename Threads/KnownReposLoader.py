@@ -0,0 +1,20 @@
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+from ModelRepo import getKnownRepos
+
+class KnownReposLoaderSignals(QObject):
+    reposLoaded = pyqtSignal(list)
+
+class KnownReposLoader(QRunnable):
+    """
+    Reads the metadata of every known repository on a QThreadPool thread,
+    so the repository list can show its saved snapshot in the meantime.
+    reposLoaded gives the repositories as from getKnownRepos().
+    """
+    def __init__(self):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.signals = KnownReposLoaderSignals()
+
+    def run(self):
+        self.signals.reposLoaded.emit(getKnownRepos())
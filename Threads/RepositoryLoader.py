@@ -0,0 +1,65 @@
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+from ModelRepo import getCatalogRows, getLatestCatalogChange, getRepoMetadata, syncCatalog
+
+class RepositoryLoaderSignals(QObject):
+    repoMetadataLoaded = pyqtSignal(dict)
+    catalogSynced = pyqtSignal(int)
+    rowsLoaded = pyqtSignal(str, list, bool)
+    finished = pyqtSignal()
+    failed = pyqtSignal(str)
+
+class RepositoryLoader(QRunnable):
+    """
+    Loads a repository's contents for the list views on a QThreadPool thread.
+    The catalog is synced first, then the first page of every list is sent,
+    so all the tabs show something straight away, then the rest follows in chunks.
+
+    rowsLoaded is (models, datasets or generated, rows, whether more are coming), with rows
+    as from getCatalogRows(). The views sort and filter the rows themselves.
+    If the repository can't be read, failed is sent with the reason instead of finished.
+    Call cancel() to stop it when a different repository is opened.
+    """
+    chunkSize = 200
+
+    tables = ['models', 'datasets', 'generated']
+
+    def __init__(self, repoPath: str):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.repoPath = repoPath
+        self.signals = RepositoryLoaderSignals()
+        self.__cancelled = False
+
+    def cancel(self): self.__cancelled = True
+    def isCancelled(self) -> bool: return self.__cancelled
+
+    def run(self):
+        try:
+            self.loadRows()
+        except Exception as e:
+            print(f'Could not load the repository at {self.repoPath}: {e}')
+            if not self.__cancelled: self.signals.failed.emit(str(e))
+            return
+
+        if not self.__cancelled: self.signals.finished.emit()
+
+    def loadRows(self):
+        self.signals.repoMetadataLoaded.emit(getRepoMetadata(self.repoPath))
+
+        syncCatalog(self.repoPath)
+        if self.__cancelled: return
+        self.signals.catalogSynced.emit(getLatestCatalogChange(self.repoPath))
+
+        offsets = {table: 0 for table in self.tables}
+        while len(offsets) > 0:
+            # One chunk of each list per pass, so no tab waits on another being finished
+            for table in list(offsets):
+                if self.__cancelled: return
+
+                rows = getCatalogRows(self.repoPath, table, self.chunkSize, offsets[table])
+                offsets[table] += len(rows)
+                hasMoreRows = len(rows) == self.chunkSize
+                self.signals.rowsLoaded.emit(table, rows, hasMoreRows)
+
+                if not hasMoreRows: del offsets[table]
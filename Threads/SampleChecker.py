@@ -0,0 +1,44 @@
+from queue import Queue
+from typing import List
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from ModelRepo import processGeneratedSamples
+
+class SampleChecker(QThread):
+    """
+    Checks the samples generated during training against the training dataset.
+    Samples are queued with addSamples() and checked one batch at a time on this
+    thread, so the training loop never waits on a check.
+    """
+    samplesChecked = pyqtSignal(int, list)
+
+    def __init__(self, parent=None, repoPath: str = None, datasetName: str = None):
+        super().__init__(parent)
+        self.__repoPath = repoPath
+        self.__datasetName = datasetName
+        self.__queue = Queue()
+
+    def addSamples(self, step: int, texts: List[str]):
+        self.__queue.put((step, texts))
+
+    def finish(self):
+        """
+        Stops the thread once every batch queued so far has been checked.
+        """
+        self.__queue.put(None)
+
+    def run(self):
+        while True:
+            batch = self.__queue.get()
+            if batch is None: return
+
+            step, texts = batch
+            try:
+                checked = processGeneratedSamples(self.__repoPath, texts, '', datasetNames=[self.__datasetName])
+            except Exception as e:
+                # A failed check shouldn't take the training session down with it
+                print(f'Could not check samples from step {step}: {e}')
+                continue
+
+            matches = [sample['datasetMatches'] for sample in checked]
+            self.samplesChecked.emit(step, matches)
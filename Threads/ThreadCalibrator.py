@@ -0,0 +1,23 @@
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from ThreadTuning import calibrateThreads, jobKinds
+
+class ThreadCalibrator(QThread):
+    """
+    Finds the fastest thread counts for each kind of job (see calibrateThreads()).
+    calibrated is (kind, [intra-op threads, inter-op threads]), once per kind.
+    progressed is (kinds done, combinations timed for the current kind, combinations in total for it).
+    """
+    calibrated = pyqtSignal(str, list)
+    progressed = pyqtSignal(int, int, int)
+    errorOccurred = pyqtSignal(Exception)
+
+    def run(self):
+        for i, kind in enumerate(jobKinds):
+            try:
+                threads = calibrateThreads(kind, lambda done, total: self.progressed.emit(i, done, total))
+            except Exception as e:
+                self.errorOccurred.emit(e)
+                return
+
+            self.calibrated.emit(kind, list(threads))
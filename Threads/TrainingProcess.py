@@ -0,0 +1,123 @@
+from datetime import datetime
+from multiprocessing.connection import Connection
+from os import makedirs
+from os.path import join
+from traceback import format_exc
+
+from StepLog import StepLogWriter
+from ThreadTuning import applyCoreAffinity, applyThreadSettings
+from TokenCache import loadTokenizedDataset
+
+def runTraining(job: dict, events: Connection, control: Connection):
+    """
+    Entry point of the training process started by ATGTrainer.
+    Training events are sent back over `events` as tuples:
+        ('started',)
+        ('batch', steps, total, loss, avgLoss)
+        ('samples', steps, texts)
+        ('saved', steps, total, modelPath) - after the model and step log are on disk
+        ('ended',)
+        ('finished',) or ('error', traceback text)
+    and ('stop',) can be sent over `control` to end training after the current step.
+    """
+    try:
+        TrainingProcess(job, events, control).run()
+        events.send(('finished',))
+    except Exception:
+        events.send(('error', format_exc()))
+    finally:
+        events.close()
+
+class TrainingProcess:
+    """
+    Runs aitextgen's training loop for one job (see ATGTrainer.makeJob() for what's in it).
+    This runs without Qt; everything the app needs to know goes through the events connection.
+    """
+    def __init__(self, job: dict, events: Connection, control: Connection):
+        self.job = job
+        self.events = events
+        self.control = control
+        self.shouldStop = False
+        self.currentStep = 0
+        self.startTime = datetime.now()
+        self.stepLog = None
+
+    def run(self):
+        from aitextgen_dev.aitextgen.utils import GPT2Config
+        from aitextgen_dev.aitextgen import aitextgen
+
+        job = self.job
+        applyCoreAffinity(job['cores'])
+        applyThreadSettings(job['threads'])
+
+        aitextgenArgs = dict(job['aitextgenArgs'])
+        if len(aitextgenArgs) == 0:
+            # There are no arguments being passed to aitextgen.
+            # This means we want to create a model from scratch.
+            print('No base model provided, so training from scratch')
+            aitextgenArgs['config'] = GPT2Config()
+            aitextgenArgs['tokenizer_file'] = job['tokenizerPath']
+
+        print(f'arguments to aitextgen constructor: {aitextgenArgs}')
+        self.ai = aitextgen(**aitextgenArgs)
+
+        # The dataset is encoded once per tokenizer and block size, then loaded from its token cache
+        trainData = loadTokenizedDataset(job['repoPath'], job['datasetName'], self.ai.tokenizer, job['lineByLine'], self.ai.model.config.n_positions)
+
+        trainArgs = {
+            'train_data': trainData,
+            'line_by_line': job['lineByLine'],
+            'num_steps': job['steps'],
+            'generate_every': job['genEvery'],
+            'save_every': job['saveEvery'],
+            'learning_rate': job['learningRate'],
+            'fp16': False,
+            'batch_size': job['batchSize'],
+            'gradient_accumulation_steps': job['gradientAccumulation'],
+            'progress_bar_refresh_rate': 1,
+            'output_dir': job['modelPath'],
+            'callbacks': {
+                'on_train_start': self.onTrainingStarted,
+                'on_train_end': self.onTrainingEnded,
+                'on_batch_end': self.onBatchEnded,
+                'on_sample_text_generated': self.onSampleTextGenerated,
+                'on_model_saved': self.onModelSaved
+            }
+        }
+
+        print(f'arguments to train: {trainArgs}')
+
+        # Steps are appended to the log as they happen, rather than all saved with the model
+        makedirs(job['modelPath'], exist_ok=True)
+        with StepLogWriter(join(job['modelPath'], 'steps.bin')) as self.stepLog:
+            self.ai.train(**trainArgs)
+
+    def checkForStop(self):
+        while self.control.poll():
+            if self.control.recv()[0] == 'stop': self.shouldStop = True
+
+    def onTrainingStarted(self):
+        self.startTime = datetime.now()
+        self.events.send(('started',))
+
+    def onTrainingEnded(self):
+        self.events.send(('ended',))
+
+    def onBatchEnded(self, steps, total, loss, avg_loss, trainer):
+        self.currentStep = steps
+
+        elapsed = datetime.now() - self.startTime
+        self.stepLog.append(elapsed.total_seconds(), steps, loss, avg_loss)
+
+        self.checkForStop()
+        trainer.should_stop = self.shouldStop
+
+        self.events.send(('batch', int(steps), int(total), float(loss), float(avg_loss)))
+
+    def onSampleTextGenerated(self, texts):
+        self.events.send(('samples', self.currentStep, list(texts)))
+
+    def onModelSaved(self, steps, total, dir):
+        # Steps are already in the log, so they only need to reach the disk along with the model
+        self.stepLog.sync()
+        self.events.send(('saved', int(steps), int(total), str(dir)))
@@ -0,0 +1,84 @@
+from hashlib import sha256
+from os import makedirs, remove, replace
+from os.path import basename, exists, join
+from uuid import uuid4
+
+from FileSystems import fileHash
+
+# The n_positions of the GPT2Config new models are trained with,
+# which is the block size datasets are encoded for when they're imported
+defaultBlockSize = 1024
+
+tokenCacheFolderName = 'tokencache'
+
+def loadTrainingTokenizer(tokenizerPath: str):
+    """
+    Loads a dataset's tokenizer the way aitextgen does for training,
+    so that it hashes the same as the trainer's.
+    """
+    from transformers import PreTrainedTokenizerFast
+    return PreTrainedTokenizerFast(tokenizer_file=tokenizerPath, bos_token='<|endoftext|>', eos_token='<|endoftext|>', unk_token='<|endoftext|>', pad_token='<|endoftext|>')
+
+def tokenizerHash(tokenizer) -> str:
+    """
+    Returns the SHA-256 of a tokenizer's serialized vocabulary and settings.
+    """
+    backend = getattr(tokenizer, 'backend_tokenizer', tokenizer)
+    return sha256(backend.to_str().encode('utf-8')).hexdigest()
+
+def tokenCachePath(repoPath: str, datasetName: str, tokenizer, lineByLine: bool, blockSize: int) -> str:
+    """
+    Returns where the encoded dataset for these settings is kept.
+    The name is a hash of the dataset's contents, the tokenizer, lineByLine and blockSize,
+    so changing any of them points somewhere else, and a dataset can have a cache for each
+    tokenizer it's trained with (e.g. its own, and a head model's).
+    """
+    datasetFolderPath = join(repoPath, 'datasets', datasetName)
+    datasetHash = fileHash(join(datasetFolderPath, 'dataset'))
+    key = sha256(f'{datasetHash}:{tokenizerHash(tokenizer)}:{bool(lineByLine)}:{blockSize}'.encode('utf-8')).hexdigest()
+    return join(datasetFolderPath, tokenCacheFolderName, f'{key}.tar.gz')
+
+def writeTokenCache(repoPath: str, datasetName: str, tokenizer, lineByLine: bool, blockSize: int):
+    """
+    Encodes a dataset and saves it for loadTokenizedDataset(). Returns the encoded TokenDataset.
+    """
+    from aitextgen_dev.aitextgen.TokenDataset import TokenDataset
+
+    cachePath = tokenCachePath(repoPath, datasetName, tokenizer, lineByLine, blockSize)
+    makedirs(join(repoPath, 'datasets', datasetName, tokenCacheFolderName), exist_ok=True)
+
+    # Saved under a temporary name first, so an interrupted save never looks like a valid cache.
+    # The name is unique, so jobs encoding the same dataset at once don't write over each other's files
+    key = basename(cachePath)[:-len('.tar.gz')]
+    tempPath = join(repoPath, 'datasets', datasetName, tokenCacheFolderName, f'{key}.{uuid4().hex}.incomplete')
+    try:
+        dataset = TokenDataset(
+            file_path=join(repoPath, 'datasets', datasetName, 'dataset'),
+            tokenizer=tokenizer,
+            line_by_line=lineByLine,
+            block_size=blockSize,
+            save_cache=True,
+            cache_destination=tempPath
+        )
+        replace(tempPath, cachePath)
+    finally:
+        if exists(tempPath): remove(tempPath)
+
+    return dataset
+
+def loadTokenizedDataset(repoPath: str, datasetName: str, tokenizer, lineByLine: bool, blockSize: int):
+    """
+    Returns a dataset encoded with `tokenizer`, as a TokenDataset ready to train on.
+    It's loaded from the dataset's token cache if there's one for these settings,
+    and otherwise encoded and saved there for next time.
+    """
+    from aitextgen_dev.aitextgen.TokenDataset import TokenDataset
+
+    cachePath = tokenCachePath(repoPath, datasetName, tokenizer, lineByLine, blockSize)
+    if exists(cachePath):
+        try:
+            return TokenDataset(file_path=cachePath, from_cache=True, block_size=blockSize)
+        except Exception as e:
+            print(f'Couldn\'t load token cache {cachePath}, so encoding the dataset again: {e}')
+
+    return writeTokenCache(repoPath, datasetName, tokenizer, lineByLine, blockSize)
@@ -0,0 +1,255 @@
+from datetime import datetime
+from json import dump, load
+from json.decoder import JSONDecodeError
+from os import replace
+from os.path import exists, isdir, join
+from uuid import uuid4
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from ModelRepo import deleteModel, getRepoHeadModel
+from Preferences import getMaxConcurrentTrainingJobs, getThreadSettings, setMaxConcurrentTrainingJobs
+from Threads.ATGTrainer import ATGTrainer
+from ThreadTuning import allocateCores, availableCores, fitThreadsToCores
+
+# The training queue, kept next to knownRepos.json so it survives the app closing
+trainingQueuePath = join('trainingQueue.json')
+
+# Statuses of jobs that have stopped for good
+finishedJobStatuses = ['finished', 'failed', 'stopped']
+
+class TrainingScheduler(QObject):
+    """
+    Runs queued training jobs, from any repository, a few at a time.
+    Each job is a dict with:
+        'id', 'repoPath', 'config' (the hyperparameters TrainingView makes),
+        'status' ('queued', 'running', 'stopping', 'finished', 'failed' or 'stopped'),
+        'added', 'started', 'ended' (ISO datetimes, or None), 'step', 'total' and 'error',
+        and once it has started, 'parentModel' (the head model it trains from) and 'modelName' (the model it's making).
+    Up to maxConcurrentJobs() jobs run at once, each in its own training process
+    pinned to cores no other running job holds (see ThreadTuning.allocateCores()).
+    Only one job runs for each repository at a time, counting training started outside the queue
+    (see addExternalTrainer()), so jobs don't train from each other's half-saved models.
+    The queue is saved whenever a job changes status. Jobs that were running when the app
+    closed are queued again the next time it opens. They start over from the same parent model,
+    and the model they'd partly made is deleted. Jobs that were stopping count as stopped.
+    """
+    jobsChanged = pyqtSignal()
+    jobProgressed = pyqtSignal(str, int, int)
+    jobFinished = pyqtSignal(str, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.__jobs = []
+        self.__trainers = {}
+        self.__cores = {}
+        self.__jobRepos = {}
+        self.__externalTrainers = {}
+        self.__maxConcurrentJobs = getMaxConcurrentTrainingJobs()
+
+        self.loadQueue()
+        self.schedule()
+
+    def jobs(self) -> list: return self.__jobs
+
+    def job(self, jobId: str) -> dict:
+        return next((job for job in self.__jobs if job['id'] == jobId), None)
+
+    def maxConcurrentJobs(self) -> int: return self.__maxConcurrentJobs
+
+    def setMaxConcurrentJobs(self, count: int):
+        """
+        Jobs that are already running keep their cores; the new limit applies as jobs start.
+        """
+        self.__maxConcurrentJobs = max(1, count)
+        setMaxConcurrentTrainingJobs(self.__maxConcurrentJobs)
+        self.schedule()
+
+    def loadQueue(self):
+        if not exists(trainingQueuePath): return
+
+        try:
+            with open(trainingQueuePath, 'r', encoding='utf-8') as f: self.__jobs = load(f)
+        except (IOError, JSONDecodeError) as e:
+            print(f'Error reading {trainingQueuePath}: {e}')
+            self.__jobs = []
+            return
+
+        for job in self.__jobs:
+            # A stopped job keeps what it had saved
+            if job['status'] == 'stopping':
+                job.update(status='stopped', ended=datetime.now().isoformat(timespec='seconds'))
+            if job['status'] != 'running': continue
+
+            # The job starts over, so the model it was making when the app closed would only be a stale copy
+            if job.get('modelName') is not None and isdir(job['repoPath']):
+                print(f'Deleting {job["modelName"]}, which training job {job["id"]} didn\'t finish')
+                deleteModel(job['repoPath'], job['modelName'])
+            job.update(status='queued', started=None, step=0, modelName=None)
+
+    def saveQueue(self):
+        # Written under a temporary name first, so a crash mid-write doesn't lose the queue
+        tempPath = f'{trainingQueuePath}.incomplete'
+        try:
+            with open(tempPath, 'w', encoding='utf-8') as f: dump(self.__jobs, f)
+            replace(tempPath, trainingQueuePath)
+        except IOError as e:
+            print(f'IO error: {e}')
+
+    def enqueue(self, repoPath: str, config: dict) -> str:
+        """
+        Adds a training job for a repository to the end of the queue, and returns its id.
+        """
+        job = {
+            'id': uuid4().hex,
+            'repoPath': repoPath,
+            'config': config,
+            'status': 'queued',
+            'added': datetime.now().isoformat(timespec='seconds'),
+            'started': None,
+            'ended': None,
+            'step': 0,
+            'total': config['steps'],
+            'error': None
+        }
+        self.__jobs.append(job)
+        self.saveQueue()
+        self.jobsChanged.emit()
+        self.schedule()
+        return job['id']
+
+    def cancel(self, jobId: str):
+        """
+        Removes a queued job, or stops a running one after its current step.
+        A stopped job keeps the model it's saved so far.
+        """
+        job = self.job(jobId)
+        if job is None: return
+
+        if job['status'] == 'queued':
+            self.__jobs.remove(job)
+        elif job['status'] == 'running':
+            job['status'] = 'stopping'
+            self.__trainers[jobId].triggerStop()
+        else:
+            return
+
+        self.saveQueue()
+        self.jobsChanged.emit()
+
+    def clearFinished(self):
+        self.__jobs = [job for job in self.__jobs if job['status'] not in finishedJobStatuses]
+        self.saveQueue()
+        self.jobsChanged.emit()
+
+    def isRepositoryTraining(self, repoPath: str) -> bool:
+        return repoPath in self.__jobRepos.values() or repoPath in self.__externalTrainers.values()
+
+    def addExternalTrainer(self, repoPath: str, trainer: ATGTrainer):
+        """
+        Tells the scheduler about training started outside the queue (e.g. from the training window),
+        so no queued job for the same repository starts until it's finished.
+        """
+        self.__externalTrainers[trainer] = repoPath
+        trainer.finished.connect(lambda: self.onExternalTrainerFinished(trainer))
+
+    def onExternalTrainerFinished(self, trainer: ATGTrainer):
+        self.__externalTrainers.pop(trainer, None)
+        self.schedule()
+
+    def schedule(self):
+        """
+        Starts queued jobs, oldest first, while fewer than maxConcurrentJobs() are running.
+        Jobs for a repository that's already training wait their turn.
+        """
+        for job in self.__jobs:
+            if len(self.__trainers) >= self.__maxConcurrentJobs: break
+            if job['status'] != 'queued' or self.isRepositoryTraining(job['repoPath']): continue
+            self.startJob(job)
+
+    def startJob(self, job: dict):
+        jobId = job['id']
+        if not isdir(job['repoPath']):
+            job.update(status='failed', error='The repository could not be found.', ended=datetime.now().isoformat(timespec='seconds'))
+            self.saveQueue()
+            self.jobsChanged.emit()
+            return
+
+        # Thread settings are read now rather than when the job was queued, so recalibrating applies to queued jobs,
+        # and a job running alongside others only gets its own cores
+        config = dict(job['config'])
+        config['threads'] = getThreadSettings('training')
+        if self.__maxConcurrentJobs > 1:
+            config['cores'] = allocateCores(self.__maxConcurrentJobs, list(self.__cores.values()))
+            config['threads'] = fitThreadsToCores(config['threads'], config['cores'])
+
+        # Resolved the first time the job starts, so a job started over trains from the same model,
+        # not from the one it had saved before it was interrupted
+        if 'parentModel' not in job: job['parentModel'] = getRepoHeadModel(job['repoPath'])
+        config['parentModel'] = job['parentModel']
+
+        trainer = ATGTrainer(self, job['repoPath'])
+        trainer.setConfig(config)
+        trainer.batchEnded.connect(lambda steps, total, loss, avgLoss: self.onBatchEnded(jobId, steps, total))
+        trainer.errorOccurred.connect(lambda e: self.onErrorOccurred(jobId, e))
+        trainer.modelFolderCreated.connect(lambda modelName: self.onModelFolderCreated(jobId, modelName))
+        trainer.finished.connect(lambda: self.onTrainerFinished(jobId))
+
+        self.__trainers[jobId] = trainer
+        # A job that isn't pinned uses every core
+        self.__cores[jobId] = config.get('cores') or availableCores()
+        self.__jobRepos[jobId] = job['repoPath']
+        job.update(status='running', started=datetime.now().isoformat(timespec='seconds'), step=0, error=None)
+        print(f'Starting training job {jobId} for {job["repoPath"]} on cores {config.get("cores", "(all)")}')
+        trainer.start()
+
+        self.saveQueue()
+        self.jobsChanged.emit()
+
+    def onModelFolderCreated(self, jobId: str, modelName: str):
+        job = self.job(jobId)
+        if job is None: return
+        job['modelName'] = modelName
+        self.saveQueue()
+
+    def onBatchEnded(self, jobId: str, steps: int, total: int):
+        job = self.job(jobId)
+        if job is None: return
+        job['step'], job['total'] = steps, total
+        self.jobProgressed.emit(jobId, steps, total)
+
+    def onErrorOccurred(self, jobId: str, e: Exception):
+        print(f'Training job {jobId} failed: {e}')
+        job = self.job(jobId)
+        if job is None: return
+        job.update(status='failed', error=str(e))
+
+    def onTrainerFinished(self, jobId: str):
+        trainer = self.__trainers.pop(jobId)
+        trainer.deleteLater()
+        del self.__cores[jobId]
+        del self.__jobRepos[jobId]
+
+        job = self.job(jobId)
+        if job is not None:
+            if job['status'] == 'stopping': job['status'] = 'stopped'
+            elif job['status'] == 'running': job['status'] = 'finished'
+            job['ended'] = datetime.now().isoformat(timespec='seconds')
+
+            self.saveQueue()
+            self.jobsChanged.emit()
+            self.jobFinished.emit(jobId, job['repoPath'])
+
+        self.schedule()
+
+    def hasRunningJobs(self) -> bool: return len(self.__trainers) > 0
+
+    def shutdown(self):
+        """
+        Ends the running jobs' training processes as the app quits.
+        They're saved as running, so they're queued again the next time the queue is loaded.
+        """
+        for trainer in self.__trainers.values():
+            trainer.blockSignals(True)
+            trainer.killProcess()
+            trainer.wait()
+        self.saveQueue()
@@ -0,0 +1,91 @@
+from typing import List
+from PyQt6.QtCore import QModelIndex, QPoint, QSortFilterProxyModel, Qt, pyqtSignal
+from PyQt6.QtWidgets import QLabel, QLineEdit, QTreeView, QVBoxLayout, QWidget
+
+from Views.CatalogTableModel import CatalogColumn, CatalogTableModel
+
+class CatalogListView(QWidget):
+    """
+    A sortable, filterable list of catalog rows.
+    Rows are only drawn as they scroll into view, and currentNameChanged gives the
+    name of the selected item so its full metadata can be fetched then.
+    """
+    currentNameChanged = pyqtSignal(str)
+
+    def __init__(self, parent=None, columns: List[CatalogColumn] = None, defaultSortColumn: int = 0):
+        super().__init__(parent)
+
+        self.model = CatalogTableModel(columns if columns is not None else [], self)
+
+        self.proxy = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.proxy.setSortRole(Qt.ItemDataRole.UserRole)
+        self.proxy.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.proxy.setFilterKeyColumn(-1)
+        self.proxy.setDynamicSortFilter(True)
+
+        self.filterBox = QLineEdit(self, placeholderText='Filter', clearButtonEnabled=True)
+        self.filterBox.textChanged.connect(self.proxy.setFilterFixedString)
+
+        self.view = QTreeView(self)
+        self.view.setModel(self.proxy)
+        self.view.setRootIsDecorated(False)
+        self.view.setAlternatingRowColors(True)
+        self.view.setUniformRowHeights(True)
+        self.view.setSortingEnabled(True)
+        self.view.sortByColumn(defaultSortColumn, Qt.SortOrder.DescendingOrder)
+        self.view.selectionModel().currentRowChanged.connect(self.onCurrentRowChanged)
+
+        # Shown in place of the list when the repository can't be read
+        self.unavailableLabel = QLabel(self, alignment=Qt.AlignmentFlag.AlignCenter, wordWrap=True)
+        self.unavailableLabel.setVisible(False)
+
+        self.ly = QVBoxLayout(self)
+        self.ly.setContentsMargins(0, 0, 0, 0)
+        self.ly.addWidget(self.filterBox)
+        self.ly.addWidget(self.view)
+        self.ly.addWidget(self.unavailableLabel)
+
+    def header(self): return self.view.header()
+
+    def nameForProxyIndex(self, index: QModelIndex) -> str:
+        if not index.isValid(): return None
+        return self.model.nameAt(self.proxy.mapToSource(index).row())
+
+    def currentName(self) -> str:
+        return self.nameForProxyIndex(self.view.currentIndex())
+
+    def nameAt(self, point: QPoint) -> str:
+        return self.nameForProxyIndex(self.view.indexAt(point))
+
+    def onCurrentRowChanged(self, current: QModelIndex, previous: QModelIndex):
+        name = self.nameForProxyIndex(current)
+        if name is not None: self.currentNameChanged.emit(name)
+
+    def clear(self):
+        self.model.clear()
+        self.setUnavailable(None)
+
+    def setUnavailable(self, message: str):
+        """
+        Replaces the list with `message`, or brings the list back if it's None.
+        """
+        unavailable = message is not None
+        self.unavailableLabel.setText(message or '')
+        self.unavailableLabel.setVisible(unavailable)
+        self.view.setVisible(not unavailable)
+        self.filterBox.setEnabled(not unavailable)
+
+    def appendRows(self, rows: List[tuple]):
+        self.model.appendRows(rows)
+
+    def applyChanges(self, rows: List[tuple], removed: List[str]):
+        self.model.applyChanges(rows, removed)
+
+        # The selected row's contents may have changed, so show it again
+        currentName = self.currentName()
+        if currentName is not None and currentName in [row.name for row in rows]:
+            self.currentNameChanged.emit(currentName)
+
+    def refreshDisplay(self):
+        self.model.refreshDisplay()
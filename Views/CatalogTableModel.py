@@ -0,0 +1,110 @@
+from typing import Any, Callable, List
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+class CatalogColumn:
+    """
+    One column of a CatalogTableModel.
+    display(row) gives the text shown, and sortValue(row) what the column is sorted by;
+    both are only called when a view asks for them.
+    """
+    def __init__(self, header: str, display: Callable[[tuple], str], sortValue: Callable[[tuple], Any] = None, decoration: Callable[[tuple], Any] = None):
+        self.header = header
+        self.display = display
+        self.sortValue = sortValue if sortValue is not None else display
+        self.decoration = decoration
+
+class CatalogTableModel(QAbstractTableModel):
+    """
+    Table of lightweight catalog rows (see getCatalogRows()), one per repository item.
+    Only each item's name and sortable columns are held; views fetch an item's full
+    metadata with getCatalogItem() when it's selected, so memory stays small however
+    many items there are.
+
+    Sort values are given for Qt.ItemDataRole.UserRole, so put this behind a
+    QSortFilterProxyModel with that as its sort role.
+    """
+    def __init__(self, columns: List[CatalogColumn], parent=None):
+        super().__init__(parent)
+        self.columns = columns
+        self.rows = []
+        self.rowIndices = {}
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid(): return None
+
+        row = self.rows[index.row()]
+        column = self.columns[index.column()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return column.display(row)
+        elif role == Qt.ItemDataRole.UserRole:
+            return column.sortValue(row)
+        elif role == Qt.ItemDataRole.DecorationRole and column.decoration is not None:
+            return column.decoration(row)
+        return None
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.columns[section].header
+        return None
+
+    def nameAt(self, row: int) -> str:
+        return self.rows[row].name
+
+    def rowForName(self, name: str) -> int:
+        return self.rowIndices.get(name, -1)
+
+    def clear(self):
+        self.beginResetModel()
+        self.rows = []
+        self.rowIndices = {}
+        self.endResetModel()
+
+    def appendRows(self, rows: List[tuple]):
+        # A row may already be here if a change came in while the list was loading
+        rows = [row for row in rows if row.name not in self.rowIndices]
+        if len(rows) == 0: return
+
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(rows) - 1)
+        for row in rows:
+            self.rowIndices[row.name] = len(self.rows)
+            self.rows.append(row)
+        self.endInsertRows()
+
+    def applyChanges(self, rows: List[tuple], removed: List[str]):
+        """
+        Removes the rows named in `removed`, updates the ones in `rows` that are already
+        here and adds the rest. Selections on the views are kept, since rows are never reset.
+        """
+        for name in removed:
+            index = self.rowForName(name)
+            if index < 0: continue
+
+            self.beginRemoveRows(QModelIndex(), index, index)
+            del self.rows[index]
+            self.endRemoveRows()
+            self.rowIndices = {row.name: i for i, row in enumerate(self.rows)}
+
+        newRows = []
+        for row in rows:
+            index = self.rowForName(row.name)
+            if index < 0:
+                newRows.append(row)
+                continue
+
+            self.rows[index] = row
+            self.dataChanged.emit(self.index(index, 0), self.index(index, len(self.columns) - 1))
+
+        self.appendRows(newRows)
+
+    def refreshDisplay(self):
+        """
+        Redraws every row, e.g. after the date format preference changes.
+        """
+        if len(self.rows) == 0: return
+        self.dataChanged.emit(self.index(0, 0), self.index(len(self.rows) - 1, len(self.columns) - 1))
@@ -2,7 +2,7 @@ from random import randint
 from typing import List
 from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QIcon
-from PyQt6.QtWidgets import QCheckBox, QDoubleSpinBox, QFormLayout, QLineEdit, QListWidget, QListWidgetItem, QPushButton, QSizePolicy, QSpinBox, QSplitter, QTextEdit, QWidget
+from PyQt6.QtWidgets import QCheckBox, QComboBox, QDoubleSpinBox, QFormLayout, QLineEdit, QListWidget, QListWidgetItem, QPushButton, QSizePolicy, QSpinBox, QSplitter, QTextEdit, QWidget
 from PyQtPlus.QtOnboarding import QWizardTitle
 
 class GeneratingHyperparameterSetupView(QWidget):
@@ -31,6 +31,25 @@ class GeneratingHyperparameterSetupView(QWidget):
         self.seedSpinner = QSpinBox(self, minimum=0, maximum=99999999, value=initialSeed)
 
         self.checkAgainstDatasetCheckbox = QCheckBox('Check against datasets', parent=self)
+        self.matchModeComboBox = QComboBox(self)
+        self.matchModeComboBox.addItem('Longest exact match', 'longest')
+        self.matchModeComboBox.addItem('Longest token match (ignores case and spacing)', 'tokens')
+        self.matchModeComboBox.addItem('Near-duplicates (MinHash)', 'nearDuplicate')
+        self.matchModeComboBox.addItem('All matching spans', 'allSpans')
+        self.minSpanLengthSpinner = QSpinBox(self, minimum=1, maximum=999999, value=16)
+        # More processes only pay off for large batches of samples, so one is the default
+        self.matchWorkersSpinner = QSpinBox(self, minimum=1, maximum=256, value=1)
+        self.matchModeComboBox.currentIndexChanged.connect(self.onMatchModeChanged)
+        self.checkAgainstDatasetCheckbox.toggled.connect(self.onMatchModeChanged)
+        for w in [self.matchModeComboBox, self.matchWorkersSpinner]:
+            self.checkAgainstDatasetCheckbox.toggled.connect(w.setEnabled)
+            w.setEnabled(self.checkAgainstDatasetCheckbox.isChecked())
+
+        self.streamResultsCheckbox = QCheckBox('Show each sample as soon as it\'s generated', parent=self)
+        self.streamBatchSizeSpinner = QSpinBox(self, minimum=1, maximum=999999, value=1)
+        self.streamResultsCheckbox.toggled.connect(self.streamBatchSizeSpinner.setEnabled)
+        self.streamBatchSizeSpinner.setEnabled(self.streamResultsCheckbox.isChecked())
+
         self.goButton = QPushButton('Generate', self, clicked=lambda: self.generationStarted.emit(self.getHyperparameters()))
 
         self.ly = QFormLayout(self)
@@ -44,11 +63,22 @@ class GeneratingHyperparameterSetupView(QWidget):
         self.ly.addRow('Top P:', self.topPSpinner)
         self.ly.addRow('Seed:', self.seedSpinner)
         self.ly.addWidget(self.checkAgainstDatasetCheckbox)
+        self.ly.addRow('Check for:', self.matchModeComboBox)
+        self.ly.addRow('Minimum span length:', self.minSpanLengthSpinner)
+        self.ly.addRow('Processes for checking:', self.matchWorkersSpinner)
+        self.ly.addWidget(self.streamResultsCheckbox)
+        self.ly.addRow('Samples per batch:', self.streamBatchSizeSpinner)
         self.ly.addRow(self.goButton)
 
         self.ly.setFieldGrowthPolicy(QFormLayout.FieldGrowthPolicy.AllNonFixedFieldsGrow)
         self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
 
+        self.onMatchModeChanged()
+
+    def onMatchModeChanged(self):
+        usesSpans = self.matchModeComboBox.currentData() == 'allSpans'
+        self.minSpanLengthSpinner.setEnabled(self.checkAgainstDatasetCheckbox.isChecked() and usesSpans)
+
     def getHyperparameters(self) -> dict:
         return {
             'prompt': self.promptBox.toPlainText(),
@@ -59,9 +89,30 @@ class GeneratingHyperparameterSetupView(QWidget):
             'topK': self.topKSpinner.value(),
             'topP': self.topPSpinner.value(),
             'seed': self.seedSpinner.value(),
-            'checkAgainstDatasets': self.checkAgainstDatasetCheckbox.isChecked()
+            'checkAgainstDatasets': self.checkAgainstDatasetCheckbox.isChecked(),
+            'matchWorkers': self.matchWorkersSpinner.value(),
+            'matchMode': self.matchModeComboBox.currentData(),
+            'minSpanLength': self.minSpanLengthSpinner.value(),
+            'streamResults': self.streamResultsCheckbox.isChecked(),
+            'streamBatchSize': self.streamBatchSizeSpinner.value()
         }
 
+def addSampleItem(listWidget: QListWidget, sample: dict) -> QListWidgetItem:
+    item = QListWidgetItem(listWidget)
+
+    textWithoutNewlines = sample['text'].replace('\n', '')
+    item.setText(textWithoutNewlines)
+    item.setData(Qt.ItemDataRole.UserRole, sample)
+
+    if sample.get('datasetMatches') is not None and len(sample.get('datasetMatches', [])) > 0:
+        topMatch = sorted(sample.get('datasetMatches', []), key=lambda x: x.get('ratio', 0), reverse=True)[0]
+        ratio = topMatch.get('ratio', 0)
+        if ratio >= 1.0:
+            item.setIcon(QIcon('Icons/Critical.svg'))
+        elif ratio > 0.5:
+            item.setIcon(QIcon('Icons/Warning.svg'))
+    return item
+
 class GeneratingInProgressView(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -70,8 +121,25 @@ class GeneratingInProgressView(QWidget):
         self.title.setSubtitle('This might take a little while.')
         self.title.setIcon('Icons/Generate.svg')
 
+        # Only used when samples are streamed in as they're generated
+        self.listOfItems = QListWidget(self)
+        self.listOfItems.setVisible(False)
+        self.listOfItems.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.MinimumExpanding)
+
         self.ly = QFormLayout(self)
         self.ly.addRow(self.title)
+        self.ly.addRow(self.listOfItems)
+
+        self.__total = 0
+
+    def setTotal(self, total: int):
+        self.__total = total
+        self.listOfItems.clear()
+
+    def addSample(self, index: int, sample: dict):
+        self.listOfItems.setVisible(True)
+        addSampleItem(self.listOfItems, sample)
+        self.title.setSubtitle(f'{index + 1} of {self.__total} samples generated and checked.')
 
 class ProcessingInProgressView(QWidget):
     def __init__(self, parent=None):
@@ -124,16 +192,8 @@ class GeneratingCompleteView(QWidget):
         self.listOfItems.clear()
         for i in self.__samples:
             i: dict
-            item = QListWidgetItem(self.listOfItems)
-
-            textWithoutNewlines = i['text'].replace('\n', '')
-            item.setText(textWithoutNewlines)
-            item.setData(Qt.ItemDataRole.UserRole, i)
-
-            if i.get('datasetMatches') is not None and len(i.get('datasetMatches', [])) > 0:
-                topMatch = sorted(i.get('datasetMatches', []), key=lambda x: x.get('ratio', 0), reverse=True)[0]
-                ratio = topMatch.get('ratio', 0)
-                if ratio >= 1.0:
-                    item.setIcon(QIcon('Icons/Critical.svg'))
-                elif ratio > 0.5:
-                    item.setIcon(QIcon('Icons/Warning.svg'))
\ No newline at end of file
+            addSampleItem(self.listOfItems, i)
+
+    def addSample(self, index: int, sample: dict):
+        self.__samples = self.__samples + [sample]
+        addSampleItem(self.listOfItems, sample)
\ No newline at end of file
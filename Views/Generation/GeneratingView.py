@@ -2,6 +2,7 @@ from typing import List
 from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QCloseEvent
 from PyQt6.QtWidgets import QDialog, QMessageBox, QVBoxLayout, QWidget
+from Preferences import getThreadSettings
 from Threads.ATGGenerator import ATGGenerator
 from Views.Generation.GeneratingHyperparameterSetupView import GeneratingCompleteView, GeneratingHyperparameterSetupView, GeneratingInProgressView, ProcessingInProgressView
 from PyQtPlus.QtOnboarding import QSwipingPage
@@ -36,12 +37,19 @@ class GeneratingView(QWidget):
         self.pageView.animationFinished.connect(self.emitGenerationStarted)
 
     def emitGenerationStarted(self):
-        self.generationStarted.emit(self.hpView.getHyperparameters())
+        hyperparameters = self.hpView.getHyperparameters()
+        self.progView.setTotal(hyperparameters['n'])
+        self.compView.setSamples([])
+        self.generationStarted.emit(hyperparameters)
         self.pageView.animationFinished.disconnect(self.emitGenerationStarted)
 
     def onProcessingStarted(self):
         self.pageView.slideInWgt(self.processView)
 
+    def onSampleProcessed(self, index: int, sample: dict):
+        self.progView.addSample(index, sample)
+        self.compView.addSample(index, sample)
+
     def onGenerationFinished(self, samples: List[str]):
         # Issue: this signal gets emitted before the animation finishes, which means
         # the "complete" slide in animation doesn't get played (there's no queue)
@@ -67,6 +75,8 @@ class GeneratingModal(QDialog):
         self.genThread = ATGGenerator(self, repoName=self.__repoName)
         self.genThread.processingStarted.connect(self.trainingView.onProcessingStarted)
         self.genThread.processingFinished.connect(self.trainingView.onGenerationFinished)
+        self.genThread.sampleProcessed.connect(self.trainingView.onSampleProcessed)
+        self.genThread.setThreads(getThreadSettings('generation'))
         self.genThread.setN(hyperparameters['n'])
         self.genThread.setPrompt(hyperparameters['prompt'])
         self.genThread.setMinLength(hyperparameters['minLength'])
@@ -76,6 +86,11 @@ class GeneratingModal(QDialog):
         self.genThread.setTopP(hyperparameters['topP'])
         self.genThread.setSeed(hyperparameters['seed'])
         self.genThread.setCheckAgainstDatasets(hyperparameters['checkAgainstDatasets'])
+        self.genThread.setMatchWorkers(hyperparameters['matchWorkers'])
+        self.genThread.setMatchMode(hyperparameters['matchMode'])
+        self.genThread.setMinSpanLength(hyperparameters['minSpanLength'])
+        self.genThread.setStreamResults(hyperparameters['streamResults'])
+        self.genThread.setStreamBatchSize(hyperparameters['streamBatchSize'])
         self.genThread.start()
 
     def closeEvent(self, event: QCloseEvent) -> None:
@@ -1,5 +1,10 @@
+from os import cpu_count
 from PyQt6.QtCore import QSettings, Qt, pyqtSignal
-from PyQt6.QtWidgets import QCheckBox, QComboBox, QFormLayout, QLabel, QMainWindow, QSizePolicy, QToolBar, QWidget
+from PyQt6.QtWidgets import QCheckBox, QComboBox, QFormLayout, QHBoxLayout, QLabel, QMainWindow, QMessageBox, QPushButton, QSizePolicy, QSpinBox, QToolBar, QWidget
+
+from Preferences import getThreadSettings, setThreadSettings
+from Threads.ThreadCalibrator import ThreadCalibrator
+from ThreadTuning import jobKinds
 
 """
 TODO:
@@ -30,9 +35,31 @@ class PreferencesView(QMainWindow):
 
         self.use24HourTimeCheckBox = QCheckBox("Use 24-hour time", toggled=self.onUse24HourTimeChanged)
 
+        # Thread counts for each kind of job, as (intra-op, inter-op) spinners; 0 leaves it to torch
+        self.threadSpinners = {}
+        for kind in jobKinds:
+            spinners = []
+            for tooltip in ['Threads used within each operation', 'Operations run at once']:
+                spinner = QSpinBox(minimum=0, maximum=(cpu_count() or 1) * 2, specialValueText="Auto", toolTip=tooltip)
+                spinner.valueChanged.connect(lambda _, kind=kind: self.onThreadsChanged(kind))
+                spinners.append(spinner)
+            self.threadSpinners[kind] = spinners
+
+        self.calibrateButton = QPushButton("Calibrate", clicked=self.calibrateThreads)
+        self.calibrationLabel = QLabel("Times a short benchmark to find the fastest settings for this computer.")
+        self.calibrationLabel.setWordWrap(True)
+        self.calibrator = None
+
         self.ly = QFormLayout()
         self.ly.addRow("Date format:", self.dateFormatComboBox)
         self.ly.addWidget(self.use24HourTimeCheckBox)
+        for kind, (intraOpSpinner, interOpSpinner) in self.threadSpinners.items():
+            threadsLy = QHBoxLayout()
+            threadsLy.addWidget(intraOpSpinner)
+            threadsLy.addWidget(QLabel("×"))
+            threadsLy.addWidget(interOpSpinner)
+            self.ly.addRow(f"{kind.capitalize()} threads:", threadsLy)
+        self.ly.addRow(self.calibrateButton, self.calibrationLabel)
 
         self.w = QWidget()
         self.w.setLayout(self.ly)
@@ -53,6 +80,37 @@ class PreferencesView(QMainWindow):
         self.settings.setValue("datetime/use24HourTime", self.use24HourTimeCheckBox.isChecked())
         self.prefsModified.emit()
 
+    def onThreadsChanged(self, kind: str):
+        intraOp, interOp = [spinner.value() for spinner in self.threadSpinners[kind]]
+        setThreadSettings(kind, (intraOp, interOp) if intraOp > 0 and interOp > 0 else None)
+
+    def calibrateThreads(self):
+        self.calibrateButton.setEnabled(False)
+        self.calibrationLabel.setText("Calibrating...")
+
+        self.calibrator = ThreadCalibrator(self)
+        self.calibrator.progressed.connect(lambda kindIndex, done, total: self.calibrationLabel.setText(f"Calibrating {jobKinds[kindIndex]}... ({done}/{total})"))
+        self.calibrator.calibrated.connect(self.onThreadsCalibrated)
+        self.calibrator.errorOccurred.connect(self.onCalibrationError)
+        self.calibrator.finished.connect(lambda: self.calibrateButton.setEnabled(True))
+        self.calibrator.start()
+
+    def onThreadsCalibrated(self, kind: str, threads: list):
+        setThreadSettings(kind, tuple(threads))
+        self.setThreadSpinnerValues(kind)
+        self.calibrationLabel.setText(f"Calibrated {kind}: {threads[0]} × {threads[1]} threads.")
+
+    def onCalibrationError(self, e: Exception):
+        self.calibrationLabel.setText("Calibration failed.")
+        QMessageBox.warning(self, "Calibration Failed", f"Couldn't time the calibration benchmark: {e}")
+
+    def setThreadSpinnerValues(self, kind: str):
+        threads = getThreadSettings(kind)
+        for spinner, value in zip(self.threadSpinners[kind], threads if threads is not None else (0, 0)):
+            spinner.blockSignals(True)
+            spinner.setValue(value)
+            spinner.blockSignals(False)
+
     def setDefaultValues(self):
         dateFormat = self.settings.value("datetime/dateFormat", "ddmmyy")
         use24HourTime = self.settings.value("datetime/use24HourTime", False)
@@ -66,3 +124,5 @@ class PreferencesView(QMainWindow):
         
         self.use24HourTimeCheckBox.setChecked(use24HourTime)
 
+        for kind in jobKinds: self.setThreadSpinnerValues(kind)
+
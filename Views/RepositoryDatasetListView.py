@@ -1,9 +1,11 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from PyQt6.QtCore import Qt, pyqtSignal
-from PyQt6.QtWidgets import QHeaderView, QSplitter, QTreeWidget, QTreeWidgetItem, QWidget
+from PyQt6.QtWidgets import QHeaderView, QSplitter
 
-from ModelRepo import getDatasetsInRepository
+from ModelRepo import getCatalogItem
 from Preferences import getDateTimeFormatString
+from Views.CatalogListView import CatalogListView
+from Views.CatalogTableModel import CatalogColumn
 from Views.RepositoryDatasetDetailView import RepositoryDatasetDetailView
 
 class RepositoryDatasetListView(QSplitter):
@@ -12,16 +14,19 @@ class RepositoryDatasetListView(QSplitter):
     def __init__(self, parent=None):
         super().__init__(parent)
 
-        self.list = QTreeWidget(self, currentItemChanged=self.onCurrentItemChanged)
-        self.list.setHeaderLabels(['Title', 'Line-by-line', 'Imported'])
-        self.list.setColumnCount(3)
-        self.list.setAlternatingRowColors(True)
-        self.list.setRootIsDecorated(False)
+        self.dateTimeFormat = getDateTimeFormatString()
+
+        self.list = CatalogListView(self, columns=[
+            CatalogColumn('Title', lambda row: row.title or 'Unnamed Dataset'),
+            CatalogColumn('Line-by-line', lambda row: str(bool(row.lineByLine)), lambda row: bool(row.lineByLine)),
+            CatalogColumn('Imported', lambda row: datetime.fromisoformat(row.imported).strftime(self.dateTimeFormat), lambda row: row.imported)
+        ], defaultSortColumn=2)
+        self.list.currentNameChanged.connect(self.onCurrentNameChanged)
 
         h = self.list.header()
         h.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        h.setSectionResizeMode(1, QHeaderView.ResizeMode.ResizeToContents)
         h.setSectionResizeMode(2, QHeaderView.ResizeMode.ResizeToContents)
-        h.setSectionResizeMode(3, QHeaderView.ResizeMode.ResizeToContents)
         h.setStretchLastSection(False)
 
         self.descStuff = RepositoryDatasetDetailView()
@@ -31,37 +36,29 @@ class RepositoryDatasetListView(QSplitter):
         self.addWidget(self.descStuff)
 
     def refreshContent(self):
-        self.populateList()
+        self.dateTimeFormat = getDateTimeFormatString()
+        self.list.refreshDisplay()
 
     def repository(self) -> str: return self.__currentRepo
 
     def loadRepository(self, repoName: str):
+        """
+        Switches to a repository. The list is filled in by appendRows() as it's loaded in the background.
+        """
         self.__currentRepo = repoName
-        self.populateList()
-        self.repositoryLoaded.emit(repoName)
-
-    def populateList(self):
         self.list.clear()
+        self.repositoryLoaded.emit(repoName)
 
-        for i in getDatasetsInRepository(self.repository()):
-            metadata = i.get('meta', {})
-
-            title = metadata.get('title', 'Unnamed Dataset')
-            lineByLine = metadata.get('lineByLine', False)
-            importedTime = datetime.fromisoformat(metadata.get('imported', '1970-01-01T00:00:00'))
-
-            item = QTreeWidgetItem(self.list, [
-                title,
-                str(lineByLine),
-                importedTime.strftime(getDateTimeFormatString())
-                ]
-                )
-
-            item.setData(0, Qt.ItemDataRole.UserRole, i)
+    def appendRows(self, rows: list, hasMoreRows: bool):
+        self.list.appendRows(rows)
 
+    def setUnavailable(self, message: str):
+        self.list.setUnavailable(message)
 
-    def onCurrentItemChanged(self, current: QTreeWidgetItem, prev: QTreeWidgetItem):
-        if current is None:
-            return
+    def applyChanges(self, rows: list, removed: list):
+        self.list.applyChanges(rows, removed)
 
-        self.descStuff.setData(self.__currentRepo, current.data(0, Qt.ItemDataRole.UserRole))
+    def onCurrentNameChanged(self, name: str):
+        data = getCatalogItem(self.__currentRepo, 'datasets', name)
+        if data is None: return
+        self.descStuff.setData(self.__currentRepo, data)
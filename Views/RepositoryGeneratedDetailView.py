@@ -2,9 +2,9 @@ from datetime import datetime
 from difflib import SequenceMatcher
 from typing import Iterable, List, Union
 from PyQt6.QtCore import QMimeData, QSize, Qt
-from PyQt6.QtGui import QColor, QColorConstants, QIcon
+from PyQt6.QtGui import QColor, QColorConstants, QIcon, QTextCharFormat, QTextCursor
 from PyQt6.QtWidgets import QFrame, QGridLayout, QHeaderView, QLabel, QListWidget, QListWidgetItem, QSizePolicy, QSplitter, QTabWidget, QTextEdit, QTreeWidget, QTreeWidgetItem, QVBoxLayout, QWidget
-from ModelRepo import getDatasetMetadata
+from ModelRepo import getDatasetMetadata, getGeneratedTexts, matchScoreText
 from Preferences import getDateTimeFormatString
 from Views.Colors import COLOR_BLUE, COLOR_PURPLE, COLOR_RED, COLOR_YELLOW
 from Views.LabeledValueView import LabeledValueView
@@ -67,7 +67,7 @@ class RepositoryGeneratedDetailView(QWidget):
     def setData(self, data: dict):
         genDate = datetime.fromisoformat(data.get('meta', {}).get('datetime', '1970-01-01T00:00:00'))
         self.titleLabel.setText(genDate.strftime(getDateTimeFormatString()))
-        self.setSamples(data.get('texts', []))
+        self.setSamples(getGeneratedTexts(self.__repoName, data.get('path')))
         self.hpView.setData(data)
         self.sampleDetail.setPrompt(data.get('meta', {}).get('prompt', ''))
 
@@ -124,9 +124,10 @@ class RepositoryGeneratedDetailVertSplitterView(QSplitter):
 
         # Create tree view on bottom
         self.originalityTreeView = QTreeWidget(self)
-        cols = ['%', 'Match', 'Dataset']
+        cols = ['Score', 'Match', 'Dataset']
         self.originalityTreeView.setHeaderLabels(cols)
         self.originalityTreeView.setColumnCount(len(cols))
+        self.originalityTreeView.headerItem().setToolTip(0, 'How much of the sample the longest match makes up,\nhow much of it every matching span covers (all spans mode),\nor how similar the closest dataset text is (near duplicates mode)')
         self.originalityTreeView.setAlternatingRowColors(True)
         self.originalityTreeView.setRootIsDecorated(False)
         h = self.originalityTreeView.header()
@@ -154,14 +155,14 @@ class RepositoryGeneratedDetailVertSplitterView(QSplitter):
 
         self.originalityTreeView.clear()
         if sample.get('datasetMatches', None) is None: return
+
+        hasSpans = False
         for match in sorted(sample.get('datasetMatches', []), key=lambda a: a.get('ratio', 0), reverse=True):
             match: dict
             matchItem = QTreeWidgetItem(self.originalityTreeView)
 
             # Get the matched text
-            i = match.get('genTextMatchIndex', 0) + len(self.__prompt)
-            l = match.get('size', 0)
-            matchText = sample.get('text', '')[i:i+l].strip()
+            matchText = self.getMatchText(sample, match)
 
             # Get the name of the dataset
             datasetId = match.get('dataset')
@@ -171,10 +172,34 @@ class RepositoryGeneratedDetailVertSplitterView(QSplitter):
                 datasetMeta = getDatasetMetadata(self.__repoName, datasetId)
                 datasetName = datasetMeta.get('title', '')
 
-            matchItem.setText(0, f'''{match.get('ratio', 0) * 100:.01f}%''')
+            matchItem.setText(0, matchScoreText(match))
             matchItem.setText(1, matchText)
             matchItem.setText(2, datasetName)
-            
+
+            # When every matching span was found, list them under the dataset
+            # and highlight them in the text
+            for span in match.get('spans', []):
+                hasSpans = True
+                spanItem = QTreeWidgetItem(matchItem)
+                spanItem.setText(0, f'{span.get("size", 0)} chars')
+                spanItem.setText(1, self.getMatchText(sample, span))
+                self.highlightSpan(span)
+
+        self.originalityTreeView.setRootIsDecorated(hasSpans)
+
+    def getMatchText(self, sample: dict, match: dict) -> str:
+        i = match.get('genTextMatchIndex', 0) + len(self.__prompt)
+        l = match.get('size', 0)
+        return sample.get('text', '')[i:i+l].strip()
+
+    def highlightSpan(self, span: dict):
+        cursor = QTextCursor(self.rawTextEdit.document())
+        cursor.setPosition(span.get('genTextMatchIndex', 0) + len(self.__prompt))
+        cursor.setPosition(cursor.position() + span.get('size', 0), QTextCursor.MoveMode.KeepAnchor)
+
+        highlightFormat = QTextCharFormat()
+        highlightFormat.setBackground(QColor(250, 200, 80, 120))
+        cursor.mergeCharFormat(highlightFormat)
 
 
 class RepositoryGeneratedDetailHyperparamsView(QWidget):
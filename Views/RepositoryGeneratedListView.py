@@ -1,10 +1,12 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from PyQt6.QtCore import QPoint, Qt, pyqtSignal
 from PyQt6.QtGui import QAction
-from PyQt6.QtWidgets import QHeaderView, QMenu, QMessageBox, QSplitter, QTreeWidget, QTreeWidgetItem, QWidget
+from PyQt6.QtWidgets import QHeaderView, QMenu, QMessageBox, QSplitter
 
-from ModelRepo import deleteTexts, getDatasetsInRepository, getGeneratedTextsInRepository
+from ModelRepo import deleteTexts, getCatalogItem
 from Preferences import getDateTimeFormatString
+from Views.CatalogListView import CatalogListView
+from Views.CatalogTableModel import CatalogColumn
 from Views.RepositoryGeneratedDetailView import RepositoryGeneratedDetailView
 
 class RepositoryGeneratedListView(QSplitter):
@@ -14,20 +16,27 @@ class RepositoryGeneratedListView(QSplitter):
     def __init__(self, parent=None):
         super().__init__(parent)
 
-        self.list = QTreeWidget(self, currentItemChanged=self.onCurrentItemChanged)
-        self.list.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        self.list.customContextMenuRequested.connect(self.onContextMenuRequested)
+        self.dateTimeFormat = getDateTimeFormatString()
 
-        columns = ['Generation Date', '# Samples', 'Min Length', 'Max Length', 'Temperature']
-        self.list.setHeaderLabels(columns)
-        self.list.setColumnCount(len(columns))
-        self.list.setAlternatingRowColors(True)
-        self.list.setRootIsDecorated(False)
+        # Older sets may be missing some settings, which are shown as --- and sorted below any value
+        optional = lambda value: '---' if value is None else str(value)
+        optionalSort = lambda value: -1 if value is None else value
+
+        self.list = CatalogListView(self, columns=[
+            CatalogColumn('Generation Date', lambda row: datetime.fromisoformat(row.datetime).strftime(self.dateTimeFormat), lambda row: row.datetime),
+            CatalogColumn('# Samples', lambda row: optional(row.n), lambda row: optionalSort(row.n)),
+            CatalogColumn('Min Length', lambda row: optional(row.minLength), lambda row: optionalSort(row.minLength)),
+            CatalogColumn('Max Length', lambda row: optional(row.maxLength), lambda row: optionalSort(row.maxLength)),
+            CatalogColumn('Temperature', lambda row: optional(row.temperature), lambda row: optionalSort(row.temperature))
+        ], defaultSortColumn=0)
+        self.list.currentNameChanged.connect(self.onCurrentNameChanged)
+        self.list.view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.list.view.customContextMenuRequested.connect(self.onContextMenuRequested)
 
         h = self.list.header()
         h.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
 
-        for i in range(1, len(columns)): h.setSectionResizeMode(i, QHeaderView.ResizeMode.ResizeToContents)
+        for i in range(1, 5): h.setSectionResizeMode(i, QHeaderView.ResizeMode.ResizeToContents)
         h.setStretchLastSection(False)
 
         self.descStuff = RepositoryGeneratedDetailView(self.repository(), parent=self)
@@ -42,46 +51,37 @@ class RepositoryGeneratedListView(QSplitter):
         self.itemContextMenu.addAction(self.deleteTextsAction)
 
     def refreshContent(self):
-        self.populateList()
+        self.dateTimeFormat = getDateTimeFormatString()
+        self.list.refreshDisplay()
 
     def repository(self) -> str: return self.__currentRepo
 
     def loadRepository(self, repoName: str):
+        """
+        Switches to a repository. The list is filled in by appendRows() as it's loaded in the background.
+        """
         self.__currentRepo = repoName
-        self.populateList()
+        self.list.clear()
         self.repositoryLoaded.emit(repoName)
 
         self.descStuff.setRepository(repoName)
 
-    def populateList(self):
-        self.list.clear()
+    def appendRows(self, rows: list, hasMoreRows: bool):
+        self.list.appendRows(rows)
+
+    def setUnavailable(self, message: str):
+        self.list.setUnavailable(message)
 
-        for i in getGeneratedTextsInRepository(self.repository()):
-            metadata = i.get('meta', {})
-
-            genDate = datetime.fromisoformat(metadata.get('datetime', '1970-01-01T00:00:00'))
-            n = metadata.get('n', '---')
-            minLength = metadata.get('minLength', '---')
-            maxLength = metadata.get('maxLength', '---')
-            temperature = metadata.get('temperature', '---')
-
-            item = QTreeWidgetItem(self.list, [
-                genDate.strftime(getDateTimeFormatString()),
-                str(n),
-                str(minLength),
-                str(maxLength),
-                str(temperature)
-                ]
-                )
-            item.setData(0, Qt.ItemDataRole.UserRole, i)
+    def applyChanges(self, rows: list, removed: list):
+        self.list.applyChanges(rows, removed)
 
     def onContextMenuRequested(self, point: QPoint):
-        item = self.list.itemAt(point)
-        if item is not None:
-            self.itemContextMenu.exec(self.list.mapToGlobal(point))
+        if self.list.nameAt(point) is not None:
+            self.itemContextMenu.exec(self.list.view.viewport().mapToGlobal(point))
 
     def tryDeleteTexts(self):
-        pathToTexts = self.list.currentItem().data(0, Qt.ItemDataRole.UserRole)['path']
+        pathToTexts = self.list.currentName()
+        if pathToTexts is None: return
 
         b = QMessageBox(self)
         b.setText(f'Are you sure you want to delete this set of generated texts?')
@@ -93,8 +93,9 @@ class RepositoryGeneratedListView(QSplitter):
 
         if b.exec() == QMessageBox.StandardButton.Yes:
             deleteTexts(self.__currentRepo, pathToTexts)
-            self.refreshContent()
+            self.list.applyChanges([], [pathToTexts])
 
-    def onCurrentItemChanged(self, current: QTreeWidgetItem, prev: QTreeWidgetItem):
-        if current is None: return
-        self.descStuff.setData(current.data(0, Qt.ItemDataRole.UserRole))
+    def onCurrentNameChanged(self, name: str):
+        data = getCatalogItem(self.__currentRepo, 'generated', name)
+        if data is None: return
+        self.descStuff.setData(data)
@@ -1,8 +1,9 @@
-from PyQt6.QtCore import QPoint, Qt, pyqtSignal
+from PyQt6.QtCore import QPoint, Qt, QThreadPool, pyqtSignal
 from PyQt6.QtGui import QAction, QIcon
 from PyQt6.QtWidgets import QFileDialog, QInputDialog, QMenu, QMessageBox, QTreeWidget, QTreeWidgetItem
 
-from ModelRepo import addKnownRepo, getKnownRepos, removeRepo, renameRepo
+from ModelRepo import addKnownRepo, getKnownReposSnapshot, removeRepo, renameRepo
+from Threads.KnownReposLoader import KnownReposLoader
 
 class RepositoryListView(QTreeWidget):
     currentRepositoryChanged = pyqtSignal(str)
@@ -12,6 +13,9 @@ class RepositoryListView(QTreeWidget):
         self.setHeaderHidden(True)
         self.setRootIsDecorated(False)
         self.itemDoubleClicked.connect(self.onItemDoubleClicked)
+        self.reposLoader = None
+        self.repoIcon = QIcon('./Icons/Robot.svg')
+        self.missingRepoIcon = QIcon('./Icons/Warning.svg')
         self.populateList()
 
         # set up actions
@@ -34,11 +38,33 @@ class RepositoryListView(QTreeWidget):
         self.customContextMenuRequested.connect(self.onContextMenuRequested)
 
     def populateList(self):
+        """
+        Shows the repositories as they were last seen, then checks each one in the background
+        and updates the list, marking any that can't be reached.
+        """
+        self.showRepos(getKnownReposSnapshot())
+
+        loader = KnownReposLoader()
+        loader.signals.reposLoaded.connect(lambda repos: self.showRepos(repos) if loader is self.reposLoader else None)
+        self.reposLoader = loader
+        QThreadPool.globalInstance().start(loader)
+
+    def showRepos(self, repos: list):
+        currentItem = self.currentItem()
+        currentPath = currentItem.data(0, Qt.ItemDataRole.UserRole).get('path') if currentItem is not None else None
+
         self.clear()
-        for repo in getKnownRepos():
+        for repo in repos:
             newItem = QTreeWidgetItem(self, [repo.get('title', 'Untitled Repository')])
-            newItem.setIcon(0, QIcon('./Icons/Robot.svg'))
             newItem.setData(0, Qt.ItemDataRole.UserRole, repo)
+            if repo.get('missing', False):
+                newItem.setIcon(0, self.missingRepoIcon)
+                newItem.setToolTip(0, f'Couldn\'t find this repository at {repo["path"]}')
+            else:
+                newItem.setIcon(0, self.repoIcon)
+                newItem.setToolTip(0, repo['path'])
+
+            if repo['path'] == currentPath: self.setCurrentItem(newItem)
 
     def addRepository(self):
         folderName = QFileDialog.getExistingDirectory(self, 'Add Repository', '.')
@@ -95,5 +121,9 @@ class RepositoryListView(QTreeWidget):
         if repoData is None or not isinstance(repoData, dict): return
 
         print(f'repo data selected: {repoData}')
+        if repoData.get('missing', False):
+            QMessageBox.warning(self, 'Repository Not Found', f'''Couldn't find the repository at {repoData.get('path')}. It may have been moved, or be on a drive that isn't connected.''')
+            return
+
         repoPath = repoData.get('path')
         self.currentRepositoryChanged.emit(repoPath)
@@ -1,8 +1,8 @@
 from PyQt6.QtCharts import QChart, QChartView, QLineSeries
 from PyQt6.QtCore import QPointF, QSize, Qt
-from PyQt6.QtGui import QColor, QColorConstants, QPen
+from PyQt6.QtGui import QColor, QColorConstants, QIcon, QPen
 from PyQt6.QtWidgets import QFrame, QGridLayout, QLabel, QSizePolicy, QSplitter, QTextEdit, QTreeWidget, QTreeWidgetItem, QVBoxLayout, QWidget
-from ModelRepo import getDurationString, getModelStepData
+from ModelRepo import getDurationString, getModelSamples, getModelStepData
 from Preferences import getDateTimeFormatString
 from Views.Colors import COLOR_BLUE, COLOR_GREEN, COLOR_PURPLE, COLOR_RED, COLOR_YELLOW
 from Views.LabeledValueView import LabeledValueView
@@ -75,18 +75,18 @@ class RepositoryModelDetailView(QWidget):
         self.avgLossSeries.clear()
         stepData = getModelStepData(repoName, data['filePath'])
 
-        if stepData is not None:
-            for i in stepData:
-                elapsed, steps, loss, avgLoss = i
+        if stepData is not None and len(stepData.step) > 0:
+            self.xAxis.setRange(0, data['steps'])
+            self.yAxis.setRange(0, max(max(stepData.loss), self.yAxis.max()))
 
-                self.xAxis.setRange(0, data['steps'])
-                self.yAxis.setRange(0, max(loss, self.yAxis.max()))
+            # One replace() per series rather than a redraw per point
+            self.lossSeries.replace([QPointF(step, loss) for step, loss in zip(stepData.step, stepData.loss)])
+            self.avgLossSeries.replace([QPointF(step, avgLoss) for step, avgLoss in zip(stepData.step, stepData.avgLoss)])
 
-                self.lossSeries << QPointF(steps, loss)
-                self.avgLossSeries << QPointF(steps, avgLoss)
+            data['avgLoss'] = stepData.avgLoss[-1]
 
-            data['avgLoss'] = stepData[-1][3]
-        self.modelStats.setData(data)
+        samples, sampleMatches = getModelSamples(repoName, data['filePath'])
+        self.modelStats.setData(data, samples, sampleMatches)
 
 
 
@@ -103,6 +103,7 @@ class RepositoryModelDetailStatsView(QWidget):
 
         self.outputTreeView = QTreeWidget(self, currentItemChanged=self.onSelectedOutputChanged)
         self.outputTreeView.setHeaderHidden(True)
+        self.outputTreeView.setColumnCount(2)
 
         self.outputTextView = QTextEdit(self)
         self.outputTextView.setReadOnly(True)
@@ -133,7 +134,7 @@ class RepositoryModelDetailStatsView(QWidget):
         self.ly.addWidget(line, self.row, 0, 1, 2)
         self.row += 1
 
-    def setData(self, data: dict):
+    def setData(self, data: dict, samples: dict, sampleMatches: dict):
         durationString = '---'
         if data.get('duration') is not None:
             durationString = getDurationString(timedelta(seconds=data.get('duration')))
@@ -145,16 +146,40 @@ class RepositoryModelDetailStatsView(QWidget):
         # Set up tree for viewing samples
         self.outputTreeView.clear()
 
-        keys = [int(key) for key in data.get('samples', {}).keys()]
+        keys = [int(key) for key in samples.keys()]
         for key in sorted(keys):
             sampleGroupName = str(key)
-            sampleGroup = data.get('samples', {}).get(sampleGroupName)
+            sampleGroup = samples.get(sampleGroupName)
             topLevelItem = QTreeWidgetItem([sampleGroupName])
             for text in sampleGroup:
                 subItem = QTreeWidgetItem(topLevelItem, [text.replace('\n', '')])
                 subItem.setData(0, Qt.ItemDataRole.UserRole, text)
             self.outputTreeView.addTopLevelItem(topLevelItem)
 
+            # Steps whose samples hadn't been checked yet when training stopped have no matches saved
+            if sampleGroupName in sampleMatches: self.showSampleMatches(topLevelItem, sampleMatches[sampleGroupName])
+
+        self.outputTreeView.resizeColumnToContents(1)
+
+    def showSampleMatches(self, item: QTreeWidgetItem, matches: list):
+        """
+        Shows how much of each of a step's samples was found in the training dataset, as the training view does.
+        """
+        ratios = []
+        for i, sampleMatches in enumerate(matches):
+            ratio = max([match.get('ratio', 0) for match in sampleMatches], default=0)
+            ratios.append(ratio)
+
+            subItem = item.child(i)
+            if subItem is None: continue
+            subItem.setText(1, f'{ratio:.0%}')
+            if ratio >= 1.0:
+                subItem.setIcon(0, QIcon('Icons/Critical.svg'))
+            elif ratio > 0.5:
+                subItem.setIcon(0, QIcon('Icons/Warning.svg'))
+
+        item.setText(1, f'{max(ratios, default=0):.0%}')
+
     def onSelectedOutputChanged(self, current: QTreeWidgetItem, previous: QTreeWidgetItem):
         if current is None: return
         data = current.data(0, Qt.ItemDataRole.UserRole)
@@ -1,9 +1,11 @@
 from datetime import datetime, timedelta
 from PyQt6.QtCore import QMargins, Qt, pyqtSignal
 from PyQt6.QtGui import QColor, QColorConstants, QIcon, QPainter, QPen, QPixmap
-from PyQt6.QtWidgets import QHeaderView, QSplitter, QTreeWidget, QTreeWidgetItem, QWidget
+from PyQt6.QtWidgets import QHeaderView, QSplitter, QWidget
 
-from ModelRepo import getDatasetMetadata, getDurationString, getModelsInRepository, getRepoMetadata
+from ModelRepo import getCatalogItem, getDatasetMetadataMap, getDurationString, getRepoMetadata
+from Views.CatalogListView import CatalogListView
+from Views.CatalogTableModel import CatalogColumn
 from Views.RepositoryModelDetailView import RepositoryModelDetailView
 from Preferences import getDateTimeFormatString
 
@@ -13,12 +15,21 @@ class RepositoryModelHistoryView(QSplitter):
     def __init__(self, parent=None):
         super().__init__(parent)
 
-        self.list = QTreeWidget(self)
-        self.list.setHeaderLabels(['Title', 'Trained', 'Dataset', 'Duration', 'Learning Rate', 'Steps'])
-        self.list.setColumnCount(6)
-        self.list.setAlternatingRowColors(True)
-        self.list.setRootIsDecorated(False)
-        self.list.currentItemChanged.connect(self.onCurrentItemChanged)
+        self.headModel = None
+        self.datasetMetadata = {}
+        self.dateTimeFormat = getDateTimeFormatString()
+        self.headIcon = self.makeIcon(100, 0.1, True)
+        self.blankIcon = self.makeIcon(100, 0.1, False)
+
+        self.list = CatalogListView(self, columns=[
+            CatalogColumn('Title', lambda row: row.title or 'Unnamed Model', decoration=lambda row: self.headIcon if row.name == self.headModel else self.blankIcon), # TODO: let the user name models
+            CatalogColumn('Trained', lambda row: datetime.fromisoformat(row.datetime).strftime(self.dateTimeFormat), lambda row: row.datetime),
+            CatalogColumn('Dataset', lambda row: self.datasetMetadata.get(row.dataset, {}).get('title', 'Unknown')),
+            CatalogColumn('Duration', lambda row: getDurationString(timedelta(seconds=row.duration)) if row.duration is not None else '', lambda row: row.duration),
+            CatalogColumn('Learning Rate', lambda row: str(row.learningRate), lambda row: row.learningRate),
+            CatalogColumn('Steps', lambda row: str(row.steps), lambda row: row.steps)
+        ], defaultSortColumn=1)
+        self.list.currentNameChanged.connect(self.onCurrentNameChanged)
 
         h = self.list.header()
         h.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
@@ -35,47 +46,45 @@ class RepositoryModelHistoryView(QSplitter):
         self.addWidget(self.list)
         self.addWidget(self.descStuff)
 
-    def onCurrentItemChanged(self, current: QTreeWidgetItem, prev: QTreeWidgetItem):
-        if current is None: return
-        self.descStuff.setData(self.__currentRepo, current.data(0, Qt.ItemDataRole.UserRole))
+    def onCurrentNameChanged(self, name: str):
+        # Rows only hold what the list shows, so the model's full metadata is fetched now
+        data = getCatalogItem(self.__currentRepo, 'models', name)
+        if data is None: return
+        self.descStuff.setData(self.__currentRepo, data)
 
     def refreshContent(self):
-        self.populateList()
+        self.headModel = getRepoMetadata(self.repository()).get('latest')
+        self.datasetMetadata = getDatasetMetadataMap(self.repository())
+        self.dateTimeFormat = getDateTimeFormatString()
+        self.list.refreshDisplay()
 
     def repository(self) -> str: return self.__currentRepo
 
     def loadRepository(self, repoName: str):
+        """
+        Switches to a repository. The list is filled in by appendRows() as it's loaded in the background.
+        """
         self.__currentRepo = repoName
-        self.populateList()
-        self.repositoryLoaded.emit(repoName)
-
-    def populateList(self):
+        self.headModel = None
+        self.datasetMetadata = {}
         self.list.clear()
+        self.repositoryLoaded.emit(repoName)
 
-        # get head
-        headModel = getRepoMetadata(self.repository()).get('latest')
-
-        for i in getModelsInRepository(self.repository()):
-            modelTime = datetime.fromisoformat(i.get('datetime', '1970-01-01T00:00:00'))
-            datasetName = getDatasetMetadata(self.repository(), i.get('dataset')).get('title', 'Unknown')
-
-            durationString = ''
-            if i.get('duration', None) is not None:
-                durationString = getDurationString(timedelta(seconds=i.get('duration')))
+    def appendRows(self, rows: list, hasMoreRows: bool):
+        # One lookup table for every row, rather than searching the datasets per model
+        self.datasetMetadata = getDatasetMetadataMap(self.repository())
+        self.list.appendRows(rows)
 
-            item = QTreeWidgetItem(self.list, [
-                i.get('name', 'Unnamed Model'), # TODO: let the user name models
-                modelTime.strftime(getDateTimeFormatString()),
-                datasetName,
-                durationString,
-                str(i.get('learningRate', None)),
-                str(i.get('steps', None))
-                ]
-                )
+    def setUnavailable(self, message: str):
+        self.list.setUnavailable(message)
 
-            item.setData(0, Qt.ItemDataRole.UserRole, i)
+    def applyChanges(self, rows: list, removed: list):
+        self.datasetMetadata = getDatasetMetadataMap(self.repository())
+        self.list.applyChanges(rows, removed)
 
-            item.setIcon(0, self.makeIcon(100, 0.1, i.get('filePath') == headModel))
+    def setHeadModel(self, headModel: str):
+        self.headModel = headModel
+        self.list.refreshDisplay()
 
     def makeIcon(self, size: int, padding: float, head: bool = False) -> QIcon:
         pm = QPixmap(size, size)
@@ -12,10 +12,13 @@ class TrainingHyperparameterSetupView(QWidget):
     - total steps
     - steps per generate
     - steps per save
+    - batch size
+    - gradient accumulation steps
     - source dataset
     """
     goBack = pyqtSignal()
     proceed = pyqtSignal()
+    enqueue = pyqtSignal()
 
     def __init__(self, parent=None, repoName=None):
         super().__init__(parent)
@@ -30,6 +33,11 @@ class TrainingHyperparameterSetupView(QWidget):
         self.stepsPerGenSpinner = QSpinBox(self, minimum=0, maximum=999999, value=5)
         self.stepsPerSaveSpinner = QSpinBox(self, minimum=0, maximum=999999, value=5)
 
+        # Bigger batches keep more cores busy at the cost of memory;
+        # accumulating gradients over several batches gets the effect of a bigger batch without the memory
+        self.batchSizeSpinner = QSpinBox(self, minimum=1, maximum=1024, value=1)
+        self.gradientAccumulationSpinner = QSpinBox(self, minimum=1, maximum=1024, value=1)
+
         self.learningRateValidator = QDoubleValidator(0.0, 100.0, 5)
         self.learningRateValidator.setNotation(QDoubleValidator.Notation.ScientificNotation)
         self.sourceDatasetPicker = DatasetSelectionView(self, repoName=repoName)
@@ -40,10 +48,12 @@ class TrainingHyperparameterSetupView(QWidget):
         self.learningRateBox.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
 
         self.backButton = QPushButton('Back', self, clicked=self.goBack)
+        self.queueButton = QPushButton('Add to Queue', self, clicked=self.enqueue)
         self.goButton = QPushButton('Start Training', self, clicked=self.proceed)
 
         self.btnLy = QHBoxLayout()
         self.btnLy.addWidget(self.backButton)
+        self.btnLy.addWidget(self.queueButton)
         self.btnLy.addWidget(self.goButton)
 
         self.formLy = QFormLayout()
@@ -54,6 +64,8 @@ class TrainingHyperparameterSetupView(QWidget):
         self.formLy.addRow('Generate samples every:', self.stepsPerGenSpinner)
         self.formLy.addRow('Save model every:', self.stepsPerSaveSpinner)
         self.formLy.addRow('Learning rate:', self.learningRateBox)
+        self.formLy.addRow('Batch size:', self.batchSizeSpinner)
+        self.formLy.addRow('Gradient accumulation steps:', self.gradientAccumulationSpinner)
         
         self.ly = QVBoxLayout(self)
 
@@ -70,6 +82,7 @@ class TrainingHyperparameterSetupView(QWidget):
         if dataset == '': dataset = None
         print(f'Dataset: \"{dataset}\"')
         self.goButton.setEnabled(dataset is not None)
+        self.queueButton.setEnabled(dataset is not None)
 
     def getHyperparameters(self) -> dict:
         return {
@@ -78,5 +91,7 @@ class TrainingHyperparameterSetupView(QWidget):
             'steps': self.totalStepsSpinner.value(),
             'genEvery': self.stepsPerGenSpinner.value(),
             'saveEvery': self.stepsPerSaveSpinner.value(),
-            'learningRate': float(self.learningRateBox.text())
+            'learningRate': float(self.learningRateBox.text()),
+            'batchSize': self.batchSizeSpinner.value(),
+            'gradientAccumulation': self.gradientAccumulationSpinner.value()
         }
\ No newline at end of file
@@ -98,6 +98,9 @@ class TrainingInProgressView(QWidget):
     def onSamplesGenerated(self, step, texts):
         self.trainingInfo.onSamplesGenerated(step, texts)
 
+    def onSamplesChecked(self, step, matches):
+        self.trainingInfo.onSamplesChecked(step, matches)
+
     def onBatchEnded(self, steps, total, loss, avg_loss):
         self.trainingInfo.onBatchEnded(steps, total, loss, avg_loss)
         self.xAxis.setRange(0, total)
@@ -1,7 +1,9 @@
 from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QColor
+from PyQt6.QtGui import QColor, QIcon
 from PyQt6.QtWidgets import QFrame, QGridLayout, QPlainTextEdit, QSizePolicy, QSplitter, QTreeView, QTreeWidget, QTreeWidgetItem, QWidget
+from collections import deque
 from datetime import timedelta
+from time import monotonic
 from Threads.ATGTrainer import ATGTrainer
 
 from ModelRepo import getDurationString
@@ -11,6 +13,9 @@ from Views.Colors import *
 
 SMOOTHING_FACTOR = 0.005
 
+# How many recent steps the samples/sec readout is measured over
+THROUGHPUT_WINDOW = 20
+
 class TrainingInformationView(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -29,8 +34,14 @@ class TrainingInformationView(QWidget):
         self.stepsToGenTextLabel = LabeledValueView("Next Samples", "---", COLOR_BLUE)
         self.stepsToSaveModelLabel = LabeledValueView("Next Save", "---", COLOR_BLUE)
 
+        self.samplesPerSecondLabel = LabeledValueView("Samples/sec", "-.--", COLOR_RED)
+        self.batchLabel = LabeledValueView("Batch", "---", COLOR_RED)
+        self.recentSteps = deque(maxlen=THROUGHPUT_WINDOW)
+
         self.outputTreeView = QTreeWidget(self, currentItemChanged=self.onSelectedOutputChanged)
         self.outputTreeView.setHeaderHidden(True)
+        self.outputTreeView.setColumnCount(2)
+        self.sampleItems = {}
 
         self.outputTextView = QPlainTextEdit(self)
         self.outputTextView.setReadOnly(True)
@@ -50,6 +61,8 @@ class TrainingInformationView(QWidget):
         self.addDivider()
         self.addRow(self.avgLossLabel, self.currentLossLabel)
         self.addDivider()
+        self.addRow(self.samplesPerSecondLabel, self.batchLabel)
+        self.addDivider()
         self.ly.addWidget(self.outputSplitter, self.currentGridRow, 0, 1, 2)
         self.ly.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeading)
 
@@ -61,6 +74,13 @@ class TrainingInformationView(QWidget):
 
     def setTrainer(self, trainer: ATGTrainer):
         self.trainer = trainer
+        self.recentSteps.clear()
+
+        # Shown as batch size × gradient accumulation steps
+        if trainer.gradientAccumulation() > 1:
+            self.batchLabel.setValue(f'{trainer.batchSize()}×{trainer.gradientAccumulation()}')
+        else:
+            self.batchLabel.setValue(str(trainer.batchSize()))
 
     def addRow(self, widget1: QWidget, widget2: QWidget):
         self.ly.addWidget(widget1, self.currentGridRow, 0, Qt.AlignmentFlag.AlignTop)
@@ -88,6 +108,14 @@ class TrainingInformationView(QWidget):
         self.avgLossLabel.setValue(f'{avg_loss:.2f}')
         self.currentLossLabel.setValue(f'{loss:.2f}')
 
+        # Measured over the last few steps, so it follows changes in speed
+        self.recentSteps.append((monotonic(), steps))
+        firstTime, firstStep = self.recentSteps[0]
+        lastTime, lastStep = self.recentSteps[-1]
+        if lastTime > firstTime and lastStep > firstStep:
+            samplesPerSecond = (lastStep - firstStep) * self.trainer.samplesPerStep() / (lastTime - firstTime)
+            self.samplesPerSecondLabel.setValue(f'{samplesPerSecond:.2f}')
+
     def onSamplesGenerated(self, step, texts):
         item = QTreeWidgetItem([f'{step}'])
         for i in texts:
@@ -96,6 +124,31 @@ class TrainingInformationView(QWidget):
             subItem.setData(0, Qt.ItemDataRole.UserRole, i)
 
         self.outputTreeView.addTopLevelItem(item)
+        self.sampleItems[step] = item
+
+    def onSamplesChecked(self, step, matches):
+        """
+        Shows how much of each sample was found in the training dataset,
+        once the background check for that step has finished.
+        """
+        item = self.sampleItems.get(step)
+        if item is None: return
+
+        ratios = []
+        for i, sampleMatches in enumerate(matches):
+            ratio = max([match.get('ratio', 0) for match in sampleMatches], default=0)
+            ratios.append(ratio)
+
+            subItem = item.child(i)
+            if subItem is None: continue
+            subItem.setText(1, f'{ratio:.0%}')
+            if ratio >= 1.0:
+                subItem.setIcon(0, QIcon('Icons/Critical.svg'))
+            elif ratio > 0.5:
+                subItem.setIcon(0, QIcon('Icons/Warning.svg'))
+
+        item.setText(1, f'{max(ratios, default=0):.0%}')
+        self.outputTreeView.resizeColumnToContents(1)
 
     def onSelectedOutputChanged(self, current: QTreeWidgetItem, previous: QTreeWidgetItem):
         data = current.data(0, Qt.ItemDataRole.UserRole)
@@ -2,6 +2,7 @@ from logging import error
 from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QCloseEvent
 from PyQt6.QtWidgets import QDialog, QMessageBox, QPushButton, QVBoxLayout, QWidget
+from Preferences import getThreadSettings
 from Threads.ATGTrainer import ATGTrainer
 from Views.Training.TrainingFreshModelView import SelectHuggingFaceRepoView, TrainingFreshModelGPT2SizeView, TrainingFreshModelView
 from Views.Training.TrainingHyperparameterSetupView import TrainingHyperparameterSetupView
@@ -12,6 +13,7 @@ from traceback import format_exception
 
 class TrainingView(QWidget):
     trainingStarted = pyqtSignal(dict)
+    trainingQueued = pyqtSignal(dict)
 
     def __init__(self, parent=None, repoName=None):
         super().__init__(parent)
@@ -42,6 +44,7 @@ class TrainingView(QWidget):
 
         self.hpSetupView.goBack.connect(self.showIntroPage)
         self.hpSetupView.proceed.connect(self.startTraining)
+        self.hpSetupView.enqueue.connect(self.queueTraining)
 
         self.ly = QVBoxLayout(self)
         self.ly.addWidget(self.pageView)
@@ -60,25 +63,35 @@ class TrainingView(QWidget):
         self.__config = config
         self.pageView.slideInWgt(self.hpSetupView)
         
+    def getHyperparameters(self) -> dict:
+        hp = self.hpSetupView.getHyperparameters()
+        hp['constructorArgs'] = self.__config
+        hp['threads'] = getThreadSettings('training')
+        return hp
+
     def startTraining(self):
         self.pageView.slideInWgt(self.trainingInProgressView)
 
         # TODO: make this a smooth signal/slot thingy
-        hp = self.hpSetupView.getHyperparameters()
-        hp['constructorArgs'] = self.__config
+        hp = self.getHyperparameters()
         self.trainingInProgressView.setHyperparameters(hp)
         self.trainingStarted.emit(hp)
 
+    def queueTraining(self):
+        self.trainingQueued.emit(self.getHyperparameters())
+
     def onStopTriggered(self):
         self.trainingInProgressView.onStopTriggered()
 
 
 class TrainingModal(QDialog):
-    def __init__(self, parent=None, repoName=None):
+    def __init__(self, parent=None, repoName=None, scheduler=None):
         super().__init__(parent)
         print(f'going to train for {repoName}')
         self.trainingView = TrainingView(self, repoName=repoName)
         self.trainingView.trainingStarted.connect(self.doTraining)
+        self.trainingView.trainingQueued.connect(self.queueTraining)
+        self.trainingView.hpSetupView.queueButton.setVisible(scheduler is not None)
         self.trainingView.trainingInProgressView.doneButton.clicked.connect(self.accept)
         
         self.ly = QVBoxLayout(self)
@@ -86,23 +99,44 @@ class TrainingModal(QDialog):
         self.ly.addWidget(self.trainingView)
 
         self.__repoName = repoName
+        self.__scheduler = scheduler
 
         self.trainThread = None
 
+    def queueTraining(self, hp: dict):
+        # The scheduler runs the job once a slot is free, so there's nothing to keep this open for
+        print(f'queue training with hps={hp}')
+        self.__scheduler.enqueue(self.__repoName, hp)
+        self.accept()
+
     def doTraining(self, hp: dict):
+        # Only one training session runs per repository, so it can't pick up another's half-saved model as its base
+        if self.__scheduler is not None and self.__scheduler.isRepositoryTraining(self.__repoName):
+            busyBox = QMessageBox(self)
+            busyBox.setText('This repository is already training.')
+            busyBox.setInformativeText('Only one training session can run for a repository at a time. Would you like to add this one to the training queue instead?')
+            busyBox.setIcon(QMessageBox.Icon.Information)
+            busyBox.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+            busyBox.setDefaultButton(QMessageBox.StandardButton.Yes)
+
+            if busyBox.exec() == QMessageBox.StandardButton.Yes: self.queueTraining(hp)
+            else: self.trainingView.pageView.slideInWgt(self.trainingView.hpSetupView)
+            return
+
         print(f'train with hps={hp}')
         self.trainThread = ATGTrainer(self, self.__repoName)
-        self.trainingView.trainingInProgressView.trainingInfo.setTrainer(self.trainThread)
-        
         self.trainThread.setConfig(hp)
+        self.trainingView.trainingInProgressView.trainingInfo.setTrainer(self.trainThread)
 
         self.trainThread.trainingStarted.connect(self.trainingView.trainingInProgressView.onTrainingStarted)
         self.trainThread.trainingEnded.connect(self.trainingView.trainingInProgressView.onTrainingEnded)
         self.trainThread.batchEnded.connect(self.trainingView.trainingInProgressView.onBatchEnded)
         self.trainThread.sampleTextGenerated.connect(self.trainingView.trainingInProgressView.onSamplesGenerated)
+        self.trainThread.samplesChecked.connect(self.trainingView.trainingInProgressView.onSamplesChecked)
         self.trainThread.timePassed.connect(self.trainingView.trainingInProgressView.trainingInfo.onTimePassed)
         self.trainThread.errorOccurred.connect(self.onErrorOccurred)
         self.trainThread.stopTriggered.connect(self.onStopTriggered)
+        if self.__scheduler is not None: self.__scheduler.addExternalTrainer(self.__repoName, self.trainThread)
         self.trainThread.start()
 
     def closeEvent(self, event: QCloseEvent) -> None:
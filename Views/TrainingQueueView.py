@@ -0,0 +1,108 @@
+from datetime import datetime
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QHBoxLayout, QHeaderView, QLabel, QPushButton, QSpinBox, QTreeWidget, QTreeWidgetItem, QVBoxLayout, QWidget
+
+from ModelRepo import getRepoMetadata
+from Preferences import getDateTimeFormatString
+from TrainingScheduler import TrainingScheduler, finishedJobStatuses
+
+statusNames = {
+    'queued': 'Queued',
+    'running': 'Running',
+    'stopping': 'Stopping...',
+    'finished': 'Finished',
+    'failed': 'Failed',
+    'stopped': 'Stopped'
+}
+
+class TrainingQueueView(QWidget):
+    """
+    Shows the training queue: jobs waiting to run, running and finished, across all repositories.
+    """
+    def __init__(self, parent=None, scheduler: TrainingScheduler = None):
+        super().__init__(parent)
+        self.scheduler = scheduler
+        self.items = {}
+        self.repoTitles = {}
+
+        self.list = QTreeWidget(self)
+        self.list.setRootIsDecorated(False)
+        self.list.setHeaderLabels(['Title', 'Repository', 'Dataset', 'Status', 'Progress', 'Added'])
+        self.list.currentItemChanged.connect(self.updateButtons)
+
+        h = self.list.header()
+        h.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        for column in range(1, 6): h.setSectionResizeMode(column, QHeaderView.ResizeMode.ResizeToContents)
+        h.setStretchLastSection(False)
+
+        # How many jobs run at once; each gets an equal share of the cores
+        self.concurrencySpinner = QSpinBox(self, minimum=1, maximum=64, value=scheduler.maxConcurrentJobs())
+        self.concurrencySpinner.valueChanged.connect(scheduler.setMaxConcurrentJobs)
+
+        self.cancelButton = QPushButton('Cancel', self, clicked=self.cancelJob, enabled=False)
+        self.clearFinishedButton = QPushButton('Clear Finished', self, clicked=scheduler.clearFinished)
+
+        self.btnLy = QHBoxLayout()
+        self.btnLy.addWidget(QLabel('Jobs at once:', self))
+        self.btnLy.addWidget(self.concurrencySpinner)
+        self.btnLy.addStretch()
+        self.btnLy.addWidget(self.cancelButton)
+        self.btnLy.addWidget(self.clearFinishedButton)
+
+        self.ly = QVBoxLayout(self)
+        self.ly.addWidget(self.list)
+        self.ly.addLayout(self.btnLy)
+
+        scheduler.jobsChanged.connect(self.populateList)
+        scheduler.jobProgressed.connect(self.onJobProgressed)
+        self.populateList()
+
+    def populateList(self):
+        currentItem = self.list.currentItem()
+        currentId = currentItem.data(0, Qt.ItemDataRole.UserRole) if currentItem is not None else None
+        dateTimeFormat = getDateTimeFormatString()
+
+        self.list.clear()
+        self.items = {}
+        for job in self.scheduler.jobs():
+            config = job['config']
+            item = QTreeWidgetItem(self.list, [
+                config.get('title', 'Unnamed Model'),
+                self.repoTitle(job['repoPath']),
+                config['dataset']['meta'].get('title', 'Unknown'),
+                statusNames.get(job['status'], job['status']),
+                f'{job["step"]}/{job["total"]}',
+                datetime.fromisoformat(job['added']).strftime(dateTimeFormat)
+            ])
+            item.setData(0, Qt.ItemDataRole.UserRole, job['id'])
+            item.setToolTip(1, job['repoPath'])
+            if job['error'] is not None: item.setToolTip(3, job['error'])
+            self.items[job['id']] = item
+
+        if currentId in self.items: self.list.setCurrentItem(self.items[currentId])
+        self.updateButtons()
+
+    def repoTitle(self, repoPath: str) -> str:
+        # Repositories may be on slow storage, so each one's info.json is only read the first time it's shown
+        if repoPath not in self.repoTitles:
+            self.repoTitles[repoPath] = getRepoMetadata(repoPath).get('title', 'Untitled Repository')
+        return self.repoTitles[repoPath]
+
+    def onJobProgressed(self, jobId: str, steps: int, total: int):
+        item = self.items.get(jobId)
+        if item is not None: item.setText(4, f'{steps}/{total}')
+
+    def currentJob(self) -> dict:
+        item = self.list.currentItem()
+        if item is None: return None
+        return self.scheduler.job(item.data(0, Qt.ItemDataRole.UserRole))
+
+    def updateButtons(self):
+        job = self.currentJob()
+        self.cancelButton.setEnabled(job is not None and job['status'] in ['queued', 'running'])
+        self.cancelButton.setText('Stop' if job is not None and job['status'] == 'running' else 'Cancel')
+        self.clearFinishedButton.setEnabled(any(job['status'] in finishedJobStatuses for job in self.scheduler.jobs()))
+
+    def cancelJob(self):
+        job = self.currentJob()
+        if job is not None: self.scheduler.cancel(job['id'])